@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+スクレイパーの一覧・スケジュール解析のベンチマーク（保存済みHTMLを使用）
+
+  python3 bench_salonboard_parse.py [HTML ...]
+
+既定は salonboard_schedule.html / schedule_sample.html / salonboard_page.html。
+- オフライン：BeautifulSoupで抽出 → parse_reserve_rows / parse_schedule の所要時間
+- playwright があれば：page.set_content したページで
+  旧方式（要素ハンドルごとの呼び出し）と page.evaluate 1回の所要時間・往復回数を比較し、結果が一致するか確認
+"""
+import json
+import sys
+import time
+from datetime import datetime
+
+from utils.salonboard_parse import (LIST_EXTRACT_JS, SCHEDULE_EXTRACT_JS, extract_list_html,
+                                    extract_schedule_html, parse_reserve_rows, parse_schedule)
+
+DEFAULT_FILES = ['salonboard_schedule.html', 'schedule_sample.html', 'salonboard_page.html']
+DATE = datetime(2025, 12, 16)
+DATE_STR = DATE.strftime('%Y%m%d')
+REPEAT = 20
+
+
+class CountingPage:
+    """ページ／要素ハンドルへの呼び出し回数（＝CDP往復）を数える"""
+
+    def __init__(self, target, counter):
+        self._target = target
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self._counter[0] += 1
+            result = attr(*args, **kwargs)
+            if isinstance(result, list):
+                return [CountingPage(r, self._counter) for r in result]
+            if result is not None and hasattr(result, 'query_selector'):
+                return CountingPage(result, self._counter)
+            return result
+        return call
+
+
+def legacy_list(page):
+    """旧 scrape_date_range の一覧処理（要素ハンドル版）"""
+    import re
+    table = None
+    for t in page.query_selector_all("table"):
+        if t.query_selector("th#comingDate"):
+            table = t
+            break
+    if not table:
+        return []
+    bookings = []
+    for row in table.query_selector_all('tbody tr'):
+        cells = row.query_selector_all('td')
+        if len(cells) < 4:
+            continue
+        if "受付待ち" not in cells[1].text_content().strip():
+            continue
+        link = cells[2].query_selector("a[href*='reserveId=']")
+        if not link:
+            continue
+        id_match = re.search(r'reserveId=([A-Z]{2}\d+)', link.get_attribute('href'))
+        if not id_match:
+            continue
+        name_elem = cells[2].query_selector("p.wordBreak")
+        customer_name = name_elem.text_content().strip() if name_elem else ""
+        customer_name = re.sub(r'[★☆♪♡⭐️🦁]', '', customer_name).strip()
+        time_match = re.search(r'(\d{1,2}:\d{2})', cells[0].text_content().strip())
+        time_only = time_match.group(1) if time_match else "00:00"
+        staff_text = cells[3].text_content().strip()
+        bookings.append({
+            'booking_id': id_match.group(1),
+            'customer_name': customer_name,
+            'visit_datetime': f"{DATE.strftime('%Y-%m-%d')} {time_only}:00",
+            'staff': re.sub(r'^[\(（]指[\)）]', '', staff_text).strip(),
+            'is_designated': staff_text.startswith('(指)') or staff_text.startswith('（指）'),
+        })
+    return bookings
+
+
+def legacy_schedule(page):
+    """旧 scrape_date_range の空き枠処理（要素ハンドル版）"""
+    import re
+    from utils.slot_engine import free_intervals, slot_dicts, staff_hours
+    staff_list = []
+    for opt in page.query_selector_all('#stockNameList option'):
+        value = opt.get_attribute('value') or ''
+        if value.startswith('STAFF_'):
+            staff_list.append({'id': value.split('_')[1], 'name': opt.inner_text()})
+    slots = []
+    for idx, row in enumerate(page.query_selector_all('.jscScheduleMainTableStaff .scheduleMainTableLine')):
+        if idx >= len(staff_list):
+            break
+        time_list = row.query_selector_all('.scheduleTime')
+        start_hour = None
+        if time_list:
+            try:
+                start_hour = int(time_list[0].inner_text().split(':')[0])
+            except ValueError:
+                pass
+        booked = []
+        for res in row.query_selector_all('.scheduleReservation, .scheduleToDo'):
+            zone = res.query_selector('.scheduleTimeZoneSetting')
+            if zone:
+                try:
+                    times = json.loads(zone.inner_text())
+                    s, e = times[0].split(':'), times[1].split(':')
+                    booked.append((int(s[0]) * 60 + int(s[1]), int(e[0]) * 60 + int(e[1])))
+                except (ValueError, IndexError):
+                    pass
+        is_day_off = row.query_selector('.isDayOff') is not None
+        if not is_day_off:
+            for todo in row.query_selector_all('.scheduleToDo'):
+                style = todo.get_attribute('style') or ''
+                width_match = re.search(r'width:\s*(\d+)', style)
+                if (not style or 'left' not in style or 'width' not in style
+                        or (width_match and int(width_match.group(1)) >= 1000)):
+                    is_day_off = True
+                    break
+        open_min, close_min = staff_hours(staff_list[idx]['id'], start_hour * 60 if start_hour is not None else None)
+        slots.append({
+            'date': DATE_STR,
+            'staff_id': staff_list[idx]['id'],
+            'staff_name': staff_list[idx]['name'],
+            'is_day_off': is_day_off,
+            'slots': [] if is_day_off else slot_dicts(free_intervals(booked, open_min, close_min)),
+        })
+    return slots
+
+
+def timed(fn, repeat=REPEAT):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat * 1000
+
+
+def bench_offline(name, html):
+    rows, list_ms = timed(lambda: parse_reserve_rows(extract_list_html(html), DATE))
+    slots, sched_ms = timed(lambda: parse_schedule(extract_schedule_html(html), DATE_STR))
+    print(f"[OFFLINE] {name}: 予約{len(rows)}件 {list_ms:.1f}ms / スタッフ{len(slots)}人 {sched_ms:.1f}ms", flush=True)
+    for s in slots:
+        print(f"          {s['staff_name']} 休日={s['is_day_off']} 空き={[(x['start'], x['end']) for x in s['slots']]}", flush=True)
+
+
+def bench_browser(files):
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        print("[BROWSER] playwright がないためスキップ", flush=True)
+        return
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = browser.new_page()
+        for name, html in files:
+            page.set_content(html, wait_until='domcontentloaded')
+            for label, legacy, js, parse in (
+                ('一覧', legacy_list, LIST_EXTRACT_JS, lambda d: parse_reserve_rows(d, DATE)),
+                ('スケジュール', legacy_schedule, SCHEDULE_EXTRACT_JS, lambda d: parse_schedule(d, DATE_STR)),
+            ):
+                counter = [0]
+                old, old_ms = timed(lambda: legacy(CountingPage(page, counter)), repeat=3)
+                old_calls = counter[0] // 3
+                new, new_ms = timed(lambda: parse(page.evaluate(js)), repeat=3)
+                print(f"[BROWSER] {name} {label}: 旧 {old_ms:.1f}ms/{old_calls}往復 → "
+                      f"新 {new_ms:.1f}ms/1往復 一致={old == new}", flush=True)
+        browser.close()
+
+
+def main(paths):
+    files = []
+    for path in paths or DEFAULT_FILES:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            files.append((path, f.read()))
+    for name, html in files:
+        bench_offline(name, html)
+    bench_browser(files)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+アプリ起動時間のベンチマーク（gunicorn のワーカー起動・再起動ごとにかかる時間）
+
+  python3 bench_startup.py [回数] [比較するgit ref ...]
+
+新しいPythonプロセスで auth_notification_system を import して最初のリクエスト（GET /login）を返すまでを
+指定回数（既定5回）測り、中央値を表示する。
+- import: アプリ組み立て（Blueprint登録）まで / first: 最初のリクエスト / process: プロセス起動から終了まで
+- threads: import 直後のスレッド数（スケジューラー等を import 時に起動していると増える）
+- heavy: import 時に読み込まれた重い依存
+比較する ref（例: HEAD~1）は git archive で一時ディレクトリに展開して同じ条件で測る。
+外部には接続しない（Supabaseは到達しないアドレス、TEST_MODE=true、SQLite・送信キューは一時ディレクトリ）。
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPEAT = 5
+HEAVY_MODULES = ['playwright', 'bs4', 'apscheduler', 'googleapiclient', 'schedule']
+
+CHILD = """
+import json, sys, threading, time
+t0 = time.perf_counter()
+import auth_notification_system as m
+t1 = time.perf_counter()
+threads = threading.active_count()
+status = m.app.test_client().get('/login').status_code
+t2 = time.perf_counter()
+print('@@' + json.dumps({
+    'import_ms': (t1 - t0) * 1000,
+    'first_ms': (t2 - t1) * 1000,
+    'threads': threads,
+    'modules': len(sys.modules),
+    'status': status,
+    'heavy': [name for name in %r if name in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def run_once(tree, workdir):
+    env = dict(os.environ,
+               SUPABASE_URL='http://127.0.0.1:9', SUPABASE_KEY='bench', TEST_MODE='true',
+               ABSENCE_DB=os.path.join(workdir, 'absences.db'), TASK_DB=os.path.join(workdir, 'tasks.db'),
+               LINE_OUTBOX_FILE=os.path.join(workdir, 'line_outbox.json'),
+               LINE_WEBHOOK_INBOX_FILE=os.path.join(workdir, 'line_webhook_inbox.json'))
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-c', CHILD], cwd=tree, env=env, capture_output=True, text=True, timeout=120)
+    process_ms = (time.perf_counter() - started) * 1000
+    lines = [l for l in proc.stdout.splitlines() if l.startswith('@@')]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f'{tree}: 起動失敗\n{proc.stderr[-2000:]}')
+    result = json.loads(lines[-1][2:])
+    result['process_ms'] = process_ms
+    return result
+
+
+def measure(label, tree, repeat):
+    # 1回目は .pyc の作成を含むので捨てる
+    with tempfile.TemporaryDirectory() as workdir:
+        run_once(tree, workdir)
+        runs = [run_once(tree, workdir) for _ in range(repeat)]
+    summary = {key: statistics.median(r[key] for r in runs)
+               for key in ('import_ms', 'first_ms', 'process_ms', 'threads', 'modules')}
+    summary['heavy'] = runs[-1]['heavy']
+    summary['status'] = runs[-1]['status']
+    print(f"{label:<14} import {summary['import_ms']:7.1f}ms  first {summary['first_ms']:6.1f}ms  "
+          f"process {summary['process_ms']:7.1f}ms  threads {summary['threads']:3.0f}  "
+          f"modules {summary['modules']:5.0f}  GET /login={summary['status']}  "
+          f"heavy={','.join(summary['heavy']) or '-'}", flush=True)
+    return summary
+
+
+def export_ref(ref, dest):
+    archive = subprocess.run(['git', 'archive', ref], capture_output=True, check=True).stdout
+    subprocess.run(['tar', '-x', '-C', dest], input=archive, check=True)
+
+
+def main(args):
+    repeat = int(args[0]) if args and args[0].isdigit() else REPEAT
+    refs = args[1:] if args and args[0].isdigit() else args
+    here = os.path.dirname(os.path.abspath(__file__))
+    print(f"[BENCH] {repeat}回の中央値（Python {sys.version.split()[0]}）", flush=True)
+    results = {'working tree': measure('working tree', here, repeat)}
+    for ref in refs:
+        with tempfile.TemporaryDirectory() as tree:
+            export_ref(ref, tree)
+            results[ref] = measure(ref, tree, repeat)
+    base = results['working tree']
+    for ref in refs:
+        other = results[ref]
+        print(f"[BENCH] {ref} → working tree: import {other['import_ms']:.1f} → {base['import_ms']:.1f}ms "
+              f"({(base['import_ms'] / other['import_ms'] - 1) * 100:+.0f}%)、"
+              f"process {other['process_ms']:.1f} → {base['process_ms']:.1f}ms", flush=True)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,20 +1,14 @@
 #!/usr/bin/env python3
 """予約キャンセル処理スクリプト"""
 import os
+import re
 import sys
-import json
-import requests
 from datetime import datetime
+from utils.line_sender import get_line_dispatcher, queue_line_message, queue_line_multicast
+from utils.supabase_client import supabase
+# ブラウザ・Cookie・仮想ディスプレイはプール側で管理（アプリ本体からimportしても副作用なし）
+from utils.browser_pool import BrowserPool, save_cookies
 
-
-# Xvfb仮想ディスプレイ起動（Railway用）
-try:
-    from pyvirtualdisplay import Display
-    display = Display(visible=0, size=(1920, 1080))
-    display.start()
-    print("[OK] Xvfb仮想ディスプレイ起動", flush=True)
-except Exception as e:
-    print(f"[WARN] Xvfb起動スキップ: {e}", flush=True)
 def login_to_salonboard(page):
     """SalonBoardにログイン"""
     login_id = os.environ.get('SALONBOARD_LOGIN_ID', 'CD18317')
@@ -58,20 +52,15 @@ def login_to_salonboard(page):
         return False
 
 
-def cancel_booking(booking_id, line_user_id):
-    """SalonBoardで予約をキャンセル"""
-    from playwright.sync_api import sync_playwright
-    
-    SUPABASE_URL = os.environ.get('SUPABASE_URL')
-    SUPABASE_KEY = os.environ.get('SUPABASE_KEY')
+def cancel_booking(booking_id, line_user_id, pool=None):
+    """SalonBoardで予約をキャンセル（pool を渡すと常駐ブラウザのページを借りる）"""
     LINE_BOT_TOKEN = os.environ.get('LINE_CHANNEL_ACCESS_TOKEN')
     
     print(f'[キャンセル処理開始] booking_id={booking_id}, line_user_id={line_user_id}', flush=True)
     
     try:
         # 予約情報を取得
-        headers = {'apikey': SUPABASE_KEY, 'Authorization': f'Bearer {SUPABASE_KEY}'}
-        res = requests.get(f'{SUPABASE_URL}/rest/v1/8weeks_bookings?booking_id=eq.{booking_id}', headers=headers)
+        res = supabase.get(f'8weeks_bookings?booking_id=eq.{booking_id}')
         bookings = res.json()
         if not bookings:
             print(f'[キャンセルエラー] 予約が見つかりません: {booking_id}', flush=True)
@@ -87,231 +76,208 @@ def cancel_booking(booking_id, line_user_id):
         cancel_success = False
         print(f'[SalonBoardキャンセル開始] booking_id={booking_id}, visit_datetime={visit_datetime}', flush=True)
         
-        try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=False, args=['--disable-blink-features=AutomationControlled', '--no-sandbox', '--disable-dev-shm-usage'])
-                context = browser.new_context()
-                
-                # Cookie読み込み
-                cookie_file = os.path.join(os.path.dirname(__file__), 'session_cookies.json')
-                try:
-                    with open(cookie_file, 'r') as f:
-                        cookies = json.load(f)
-                    context.add_cookies(cookies)
-                    print(f'[OK] クッキー読み込み: {len(cookies)}個', flush=True)
-                except Exception as e:
-                    print(f'[WARN] クッキー読み込み失敗: {e}', flush=True)
-                
-                page = context.new_page()
-                visit_date = visit_datetime[:10].replace('/', '').replace('-', '')
-                url = f'https://salonboard.com/KLP/schedule/salonSchedule/?date={visit_date}'
-                print(f'[SalonBoard] アクセス: {url}', flush=True)
-                
-                try:
+        def cancel_on_page(page):
+            cancel_success = False
+            visit_date = visit_datetime[:10].replace('/', '').replace('-', '')
+            url = f'https://salonboard.com/KLP/schedule/salonSchedule/?date={visit_date}'
+            print(f'[SalonBoard] アクセス: {url}', flush=True)
+            
+            try:
+                page.goto(url, timeout=120000)
+            except Exception as e:
+                print(f'[SalonBoard] 初回アクセスエラー: {e}', flush=True)
+            
+            # ログインページにリダイレクトされたか確認
+            if 'login' in page.url.lower() or 'エラー' in page.title():
+                print('[SalonBoard] セッション切れ、再ログイン実行', flush=True)
+                if login_to_salonboard(page):
+                    # ログイン成功後、Cookie保存（プールの他レーンも次回コンテキスト作成時に使う）
+                    saved = save_cookies(page.context)
+                    print(f'[OK] 新しいCookie保存: {saved}個', flush=True)
+                    
+                    # 再度予約ページへ
                     page.goto(url, timeout=120000)
-                except Exception as e:
-                    print(f'[SalonBoard] 初回アクセスエラー: {e}', flush=True)
-                
-                # ログインページにリダイレクトされたか確認
-                if 'login' in page.url.lower() or 'エラー' in page.title():
-                    print('[SalonBoard] セッション切れ、再ログイン実行', flush=True)
-                    if login_to_salonboard(page):
-                        # ログイン成功後、Cookie保存
-                        new_cookies = context.cookies()
-                        with open(cookie_file, 'w') as f:
-                            json.dump(new_cookies, f)
-                        print(f'[OK] 新しいCookie保存: {len(new_cookies)}個', flush=True)
-                        
-                        # 再度予約ページへ
-                        page.goto(url, timeout=120000)
-                    else:
-                        print('[ERROR] ログイン失敗', flush=True)
-                        browser.close()
-                        raise Exception('ログイン失敗')
-                
-                # 予約要素が表示されるまで待つ
+                else:
+                    print('[ERROR] ログイン失敗', flush=True)
+                    raise Exception('ログイン失敗')
+            
+            # 予約要素が表示されるまで待つ
+            try:
+                page.wait_for_selector('.scheduleReservation', timeout=30000)
+                print('[OK] 予約要素を検出', flush=True)
+            except:
+                print('[ERROR] 予約要素が見つかりません', flush=True)
+            
+            # 予約セルを検索
+            normalized_name = customer_name.replace('　', ' ').strip()
+            print(f'[SalonBoardキャンセル] 検索: 顧客名={normalized_name}', flush=True)
+            
+            all_reservations = page.query_selector_all('div.scheduleReservation')
+            print(f'[SalonBoardキャンセル] 予約セル数: {len(all_reservations)}', flush=True)
+            
+            # 予約時間を抽出（HH:MM形式）
+            visit_time = visit_datetime[11:16] if len(visit_datetime) >= 16 else ''
+            
+            reserve_element = None
+            name_matched_elements = []
+            
+            for el in all_reservations:
+                # 予約セルのonclick/data属性/HTMLからbooking_idを確認
+                onclick = el.get_attribute('onclick') or ''
+                data_id = el.get_attribute('data-reservation-id') or el.get_attribute('data-id') or ''
                 try:
-                    page.wait_for_selector('.scheduleReservation', timeout=30000)
-                    print('[OK] 予約要素を検出', flush=True)
+                    el_html = el.evaluate('e => e.outerHTML')[:500]
                 except:
-                    print('[ERROR] 予約要素が見つかりません', flush=True)
-                
-                # 予約セルを検索
-                normalized_name = customer_name.replace('　', ' ').strip()
-                print(f'[SalonBoardキャンセル] 検索: 顧客名={normalized_name}', flush=True)
-                
-                all_reservations = page.query_selector_all('div.scheduleReservation')
-                print(f'[SalonBoardキャンセル] 予約セル数: {len(all_reservations)}', flush=True)
+                    el_html = ''
                 
-                # 予約時間を抽出（HH:MM形式）
-                visit_time = visit_datetime[11:16] if len(visit_datetime) >= 16 else ''
+                if booking_id in onclick or booking_id in data_id or booking_id in el_html:
+                    reserve_element = el
+                    print(f'[OK] 予約セル発見（booking_id一致）: {booking_id}', flush=True)
+                    break
                 
-                reserve_element = None
-                name_matched_elements = []
-                
-                for el in all_reservations:
-                    # 予約セルのonclick/data属性/HTMLからbooking_idを確認
-                    onclick = el.get_attribute('onclick') or ''
-                    data_id = el.get_attribute('data-reservation-id') or el.get_attribute('data-id') or ''
-                    try:
-                        el_html = el.evaluate('e => e.outerHTML')[:500]
-                    except:
-                        el_html = ''
+                # 顧客名で候補を収集
+                title_el = el.query_selector('li.scheduleReserveName')
+                if title_el:
+                    title_text = title_el.get_attribute('title') or ''
+                    title_name = title_text.replace('★', '').replace('様', '').replace('　', ' ').strip()
+                    if normalized_name == title_name:
+                        name_matched_elements.append(el)
+            
+            # booking_idで見つからない場合、時間で絞り込み
+            if not reserve_element and name_matched_elements:
+                for el in name_matched_elements:
+                    # 予約セルの時間を取得
+                    time_el = el.query_selector('.scheduleReserveTime, .time, [class*=time]')
+                    el_time = ''
+                    if time_el:
+                        el_time = time_el.text_content().strip()
+                    else:
+                        el_text = el.text_content()[:50]
+                        time_match = re.search(r'(\d{1,2}:\d{2})', el_text)
+                        if time_match:
+                            el_time = time_match.group(1)
                     
-                    if booking_id in onclick or booking_id in data_id or booking_id in el_html:
+                    if visit_time and visit_time in el_time:
                         reserve_element = el
-                        print(f'[OK] 予約セル発見（booking_id一致）: {booking_id}', flush=True)
+                        print(f'[OK] 予約セル発見（名前+時間一致）: {normalized_name} {visit_time}', flush=True)
                         break
-                    
-                    # 顧客名で候補を収集
-                    title_el = el.query_selector('li.scheduleReserveName')
-                    if title_el:
-                        title_text = title_el.get_attribute('title') or ''
-                        title_name = title_text.replace('★', '').replace('様', '').replace('　', ' ').strip()
-                        if normalized_name == title_name:
-                            name_matched_elements.append(el)
                 
-                # booking_idで見つからない場合、時間で絞り込み
-                if not reserve_element and name_matched_elements:
-                    for el in name_matched_elements:
-                        # 予約セルの時間を取得
-                        time_el = el.query_selector('.scheduleReserveTime, .time, [class*=time]')
-                        el_time = ''
-                        if time_el:
-                            el_time = time_el.text_content().strip()
-                        else:
-                            el_text = el.text_content()[:50]
-                            time_match = re.search(r'(\d{1,2}:\d{2})', el_text)
-                            if time_match:
-                                el_time = time_match.group(1)
-                        
-                        if visit_time and visit_time in el_time:
-                            reserve_element = el
-                            print(f'[OK] 予約セル発見（名前+時間一致）: {normalized_name} {visit_time}', flush=True)
-                            break
-                    
-                    # 時間でも絞れない場合は最初の候補を使用
-                    if not reserve_element:
-                        reserve_element = name_matched_elements[0]
-                        print(f'[WARN] 予約セル発見（名前のみ一致）: {normalized_name}', flush=True)
+                # 時間でも絞れない場合は最初の候補を使用
+                if not reserve_element:
+                    reserve_element = name_matched_elements[0]
+                    print(f'[WARN] 予約セル発見（名前のみ一致）: {normalized_name}', flush=True)
+            
+            if reserve_element:
+                reserve_element.click()
+                print('[OK] 予約セルをクリック', flush=True)
+                page.wait_for_timeout(1000)
+                # モーダル検出
+                modal = page.query_selector(".jscReserveDetailArea, .reserveDetailArea, .modalArea, [class*=modal], [class*=dialog]")
+                if modal:
+                    pass
+                else:
+                    pass
+                page.wait_for_timeout(3000)
+                
+                # 現在のURL確認
                 
-                if reserve_element:
-                    reserve_element.click()
-                    print('[OK] 予約セルをクリック', flush=True)
-                    page.wait_for_timeout(1000)
-                    # モーダル検出
-                    modal = page.query_selector(".jscReserveDetailArea, .reserveDetailArea, .modalArea, [class*=modal], [class*=dialog]")
-                    if modal:
+                # キャンセルボタンを探してクリック
+                # デバッグ: モーダル内の要素確認
+                modal_elements = page.query_selector_all("a, button")
+                # キャンセルテキストを含む全要素を出力
+                cancel_locators = page.locator("text=キャンセル").all()
+                for i, loc in enumerate(cancel_locators):
+                    try:
+                        cls = loc.get_attribute("class") or ""
+                        tag = loc.evaluate("e => e.tagName")
+                        parent_cls = loc.evaluate("e => e.parentElement?.className || ")
+                    except Exception as e:
                         pass
-                    else:
+                for el in modal_elements[:30]:
+                    try:
+                        txt = el.inner_text() or ""
+                        cls = el.get_attribute("class") or ""
+                        if "キャンセル" in txt or "cancel" in cls.lower():
+                            pass
+                        href = el.get_attribute("href") or ""
+                        onclick = el.get_attribute("onclick") or ""
+                    except:
                         pass
-                    page.wait_for_timeout(3000)
+                cancel_btn = page.locator('a:has-text("キャンセル")').first
+                if cancel_btn:
+                    print('[OK] キャンセルボタン発見', flush=True)
+                    cancel_btn.click()
+                    page.wait_for_timeout(5000)
                     
-                    # 現在のURL確認
+                    # 確認ダイアログのOKボタン
+                    page.wait_for_timeout(5000)
                     
-                    # キャンセルボタンを探してクリック
-                    # デバッグ: モーダル内の要素確認
-                    modal_elements = page.query_selector_all("a, button")
-                    # キャンセルテキストを含む全要素を出力
-                    cancel_locators = page.locator("text=キャンセル").all()
-                    for i, loc in enumerate(cancel_locators):
-                        try:
-                            cls = loc.get_attribute("class") or ""
-                            tag = loc.evaluate("e => e.tagName")
-                            parent_cls = loc.evaluate("e => e.parentElement?.className || ")
-                        except Exception as e:
-                            pass
-                    for el in modal_elements[:30]:
+                    # ダイアログ内のボタンを探す
+                    yes_btn = page.locator('button:has-text("はい"), a:has-text("はい")').first
+                    
+                    if not yes_btn:
+                        # alertダイアログの場合
                         try:
-                            txt = el.inner_text() or ""
-                            cls = el.get_attribute("class") or ""
-                            if "キャンセル" in txt or "cancel" in cls.lower():
-                                pass
-                            href = el.get_attribute("href") or ""
-                            onclick = el.get_attribute("onclick") or ""
+                            page.on('dialog', lambda dialog: dialog.accept())
                         except:
                             pass
-                    cancel_btn = page.locator('a:has-text("キャンセル")').first
-                    if cancel_btn:
-                        print('[OK] キャンセルボタン発見', flush=True)
-                        cancel_btn.click()
-                        page.wait_for_timeout(5000)
-                        
-                        # 確認ダイアログのOKボタン
-                        page.wait_for_timeout(5000)
-                        
-                        # ダイアログ内のボタンを探す
-                        yes_btn = page.locator('button:has-text("はい"), a:has-text("はい")').first
                         
-                        if not yes_btn:
-                            # alertダイアログの場合
+                        # 全ボタンを確認
+                        all_btns = page.query_selector_all('button, input[type="button"], input[type="submit"], a.btn')
+                        for btn in all_btns:
                             try:
-                                page.on('dialog', lambda dialog: dialog.accept())
+                                txt = btn.inner_text() or btn.get_attribute('value') or ''
                             except:
                                 pass
-                            
-                            # 全ボタンを確認
-                            all_btns = page.query_selector_all('button, input[type="button"], input[type="submit"], a.btn')
-                            for btn in all_btns:
-                                try:
-                                    txt = btn.inner_text() or btn.get_attribute('value') or ''
-                                except:
-                                    pass
-                        
-                        if yes_btn:
-                            print('[OK] 確認ボタン発見', flush=True)
-                            yes_btn.click()
-                            page.wait_for_timeout(5000)
-                            cancel_success = True
-                            print(f'[SalonBoardキャンセル成功] {booking_id}', flush=True)
-                        else:
-                            print('[ERROR] 確認ボタンが見つかりません', flush=True)
+                    
+                    if yes_btn:
+                        print('[OK] 確認ボタン発見', flush=True)
+                        yes_btn.click()
+                        page.wait_for_timeout(5000)
+                        cancel_success = True
+                        print(f'[SalonBoardキャンセル成功] {booking_id}', flush=True)
                     else:
-                        print('[ERROR] キャンセルボタンが見つかりません', flush=True)
-                        # ページ内容をデバッグ
-                        try:
-                            html = page.content()[:2000]
-                        except:
-                            pass
+                        print('[ERROR] 確認ボタンが見つかりません', flush=True)
                 else:
-                    print(f'[ERROR] 予約要素が見つかりません: {booking_id}', flush=True)
-                
-                browser.close()
+                    print('[ERROR] キャンセルボタンが見つかりません', flush=True)
+                    # ページ内容をデバッグ
+                    try:
+                        html = page.content()[:2000]
+                    except:
+                        pass
+            else:
+                print(f'[ERROR] 予約要素が見つかりません: {booking_id}', flush=True)
+            
+            return cancel_success
+        
+        own_pool = pool is None
+        if own_pool:
+            pool = BrowserPool(size=1, name='cancel')
+        try:
+            cancel_success = pool.run(cancel_on_page, label=f'cancel:{booking_id}')
         except Exception as e:
             print(f'[SalonBoardキャンセルエラー] {e}', flush=True)
+        finally:
+            if own_pool:
+                pool.shutdown()
         
         # 8weeks_bookingsから削除
         if cancel_success:
-            requests.delete(f'{SUPABASE_URL}/rest/v1/8weeks_bookings?booking_id=eq.{booking_id}', headers=headers)
-        
-        # 通知送信
-        def send_line_message(user_id, message):
-            url = 'https://api.line.me/v2/bot/message/push'
-            headers = {
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {LINE_BOT_TOKEN}'
-            }
-            data = {'to': user_id, 'messages': [{'type': 'text', 'text': message}]}
-            requests.post(url, headers=headers, json=data)
+            supabase.remove('8weeks_bookings', f'booking_id=eq.{booking_id}')
         
+        # 通知送信（ディスパッチャに積むだけ。送信・再送はディスパッチャのワーカーが行う）
         status_text = "キャンセル完了" if cancel_success else "キャンセル依頼（手動対応必要）"
         message = f'[{status_text}]\nお客様：{customer_name}\n日時：{visit_datetime}\nメニュー：{menu}\nスタッフ：{staff}'
         
         # スタッフに通知
-        for staff_id in ['U9022782f05526cf7632902acaed0cb08', 'U1d1dfe1993f1857327678e37b607187a']:
-            try:
-                send_line_message(staff_id, message)
-                print(f'[キャンセル通知送信] {staff_id}', flush=True)
-            except Exception as e:
-                print(f'[キャンセル通知エラー] {staff_id}: {e}', flush=True)
+        staff_ids = ['U9022782f05526cf7632902acaed0cb08', 'U1d1dfe1993f1857327678e37b607187a']
+        message_id = queue_line_multicast(staff_ids, message, LINE_BOT_TOKEN)
+        print(f'[キャンセル通知登録] {message_id}', flush=True)
         
         # 顧客にも通知（成功時のみ）
         if line_user_id and cancel_success:
-            try:
-                customer_msg = f'予約をキャンセルしました。\n\n日時：{visit_datetime}\nメニュー：{menu}\n\nまたのご予約お待ちしております。'
-                send_line_message(line_user_id, customer_msg)
-            except Exception as e:
-                print(f'[顧客通知エラー] {e}', flush=True)
+            customer_msg = f'予約をキャンセルしました。\n\n日時：{visit_datetime}\nメニュー：{menu}\n\nまたのご予約お待ちしております。'
+            queue_line_message(line_user_id, customer_msg, LINE_BOT_TOKEN)
         
         print(f'[キャンセル処理完了] {customer_name} {visit_datetime} success={cancel_success}', flush=True)
         return cancel_success
@@ -331,5 +297,7 @@ if __name__ == '__main__':
             import time
             time.sleep(30)
             cancel_booking(booking_id, line_user_id)
+        # 登録したLINE通知を送り終えてから終了する
+        get_line_dispatcher().drain(timeout=60)
     else:
         print('Usage: python3 cancel_booking.py <booking_id> <line_user_id>', flush=True)
\ No newline at end of file
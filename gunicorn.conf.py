@@ -0,0 +1,26 @@
+"""gunicorn 設定（Dockerfile の -c gunicorn.conf.py で読み込む）"""
+
+
+def post_worker_init(worker):
+    """ワーカーがアプリを読み込んだ後にスケジューラーを起動（import 時には起動しない）
+
+    TASK_WORKER=inline の時はタスクワーカーもこのプロセスのスレッドで動かす。
+    LINEの送信待ち・Webhookの未処理分もここで復元して再開する。
+    """
+    from routes.cron_routes import start_schedulers
+    from routes.webhook_routes import get_line_webhook_queue
+    from utils.line_sender import get_line_dispatcher
+    from utils.salonboard_tasks import TASK_WORKER, start_task_worker
+    get_line_dispatcher()
+    get_line_webhook_queue()
+    start_schedulers()
+    if TASK_WORKER == 'inline':
+        start_task_worker()
+
+
+def worker_exit(server, worker):
+    """ワーカー終了時にリーダー権を手放す（次のワーカーがすぐ引き継げるように）"""
+    from routes.cron_routes import stop_schedulers
+    from utils.salonboard_tasks import stop_task_worker
+    stop_schedulers()
+    stop_task_worker()
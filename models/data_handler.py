@@ -0,0 +1,192 @@
+"""顧客マッピング・メッセージ文面・欠勤申請の読み書き"""
+import json
+from datetime import datetime
+
+from utils.absence_store import AbsenceStore
+from utils.customer_index import load_customer_index
+from utils.supabase_client import supabase
+from utils.table_cache import table_cache, cached_select
+
+MAPPING_FILE = 'customer_mapping.json'
+ABSENCE_FILE = 'absence_log.json'
+MESSAGES_FILE = 'messages.json'
+
+
+def clean_customer_name(text):
+    """名前を正規化（スペース除去、★除去、余計な文字除去）"""
+    import re
+    # 改行以降を除去（予約IDなど）
+    name = text.split("\n")[0].strip()
+    # 除去パターン
+    remove_patterns = [
+        r"★+",
+        r"です[。\.]*$",
+        r"でーす[。\.]*$",
+        r"よろしく.*$",
+        r"お願い.*$",
+        r"初めまして.*$",
+        r"はじめまして.*$",
+        r"こんにちは.*$",
+        r"こんばんは.*$",
+        r"おはよう.*$",
+        r"[。、\.!！\?？]+$",
+    ]
+    for pattern in remove_patterns:
+        name = re.sub(pattern, "", name)
+    # スペース除去（半角・全角両方）
+    name = re.sub(r"[\s　]+", "", name)
+    return name.strip()
+
+
+def load_messages():
+    """メッセージをSupabaseから読み込む（TTLキャッシュ経由）"""
+    try:
+        entry = cached_select('message_templates', 'message_templates?select=key,message')
+        if entry is not None:
+            return {t['key']: t['message'] for t in entry.value}
+    except Exception as e:
+        print(f"[ERROR] load_messages: {e}")
+    # フォールバック
+    return {
+        "absence_request": "{staff_name}が本日欠勤となりました。",
+        "substitute_confirmed": "{substitute_name}が出勤してくれることになりました。",
+        "absence_confirmed": "欠勤申請を受け付けました。"
+    }
+
+
+def save_messages(messages):
+    """メッセージをJSONファイルとSupabase（message_templates）に保存"""
+    with open(MESSAGES_FILE, 'w', encoding='utf-8') as f:
+        json.dump(messages, f, ensure_ascii=False, indent=4)
+    try:
+        rows = [{'key': k, 'message': v} for k, v in messages.items() if v is not None]
+        res = supabase.upsert('message_templates', rows, on_conflict='key')
+        if res.status_code not in [200, 201, 204]:
+            print(f"[ERROR] save_messages: {res.status_code} - {res.text[:100]}")
+    except Exception as e:
+        print(f"[ERROR] save_messages: {e}")
+    table_cache.invalidate('message_templates')
+
+
+def load_mapping():
+    try:
+        response = supabase.get('customers?select=*')
+        
+        if response.status_code == 200:
+            result = {}
+            for row in response.json():
+                result[row['name']] = {
+                    'user_id': row['line_user_id'],
+                    'registered_at': row['registered_at']
+                }
+            return result
+        return {}
+    except Exception as e:
+        print(f"Supabase読み込みエラー: {e}")
+        return {}
+
+
+def find_phone_from_bookings(name):
+    """8weeks_bookingsから電話番号と正規化名を検索（照合インデックスで名前完全一致）"""
+    try:
+        index = load_customer_index()
+        booking = index.booking_by_name(name) if index else None
+        if booking:
+            return booking.get('phone'), booking.get('customer_number'), booking.get('customer_name', '')
+        return None, None, None
+    except Exception as e:
+        print(f"電話番号検索エラー: {e}")
+        return None, None, None
+
+
+def save_mapping(customer_name, user_id):
+    customer_name = clean_customer_name(customer_name)
+    try:
+        # 既存チェック
+        check_response = supabase.get(f'customers?line_user_id=eq.{user_id}')
+        
+        if check_response.status_code == 200:
+            existing_data = check_response.json()
+            if len(existing_data) == 0:
+                # 電話番号を検索（8weeks_bookingsから）
+                phone, customer_number, normalized_name = find_phone_from_bookings(customer_name)
+                
+                # マッチした場合は正規化名を使用、しなくても仮登録
+                if normalized_name:
+                    customer_name = normalized_name
+                    print(f"✓ {customer_name} は8weeks_bookingsにマッチ")
+                else:
+                    print(f"○ {customer_name} は8weeks_bookingsに未マッチ、仮登録（電話番号は後で補完）")
+                    phone = None
+                    customer_number = None
+                
+                # 空文字をNoneに変換
+                if phone == '':
+                    phone = None
+                
+                # 電話番号で既存顧客を検索（重複防止）
+                if phone:
+                    phone_check = supabase.get(f'customers?phone=eq.{phone}&select=id,line_user_id')
+                    if phone_check.status_code == 200 and phone_check.json():
+                        existing_by_phone = phone_check.json()[0]
+                        if not existing_by_phone.get('line_user_id'):
+                            # LINE IDを更新
+                            supabase.update('customers', f"id=eq.{existing_by_phone['id']}", {'line_user_id': user_id, 'name': customer_name})
+                            table_cache.invalidate('customers')
+                            print(f"✓ {customer_name} 既存顧客にLINE ID紐付け")
+                            return True
+                        else:
+                            print(f"✓ {customer_name} 既に別LINE IDで登録済み")
+                            return True
+                
+                # 新規登録
+                data = {
+                    'name': customer_name,
+                    'line_user_id': user_id,
+                    'registered_at': datetime.now().isoformat(),
+                    'phone': phone,
+                    'customer_number': customer_number
+                }
+                insert_response = supabase.insert('customers', data)
+                if insert_response.status_code == 201:
+                    table_cache.invalidate('customers')
+                    print(f"✓ {customer_name} をSupabaseに登録")
+                    backup_customers()
+                    return True
+            else:
+                # 既存ユーザーの名前が空なら更新
+                existing_name = existing_data[0].get('name', '')
+                if not existing_name or existing_name == '':
+                    phone, customer_number, normalized_name = find_phone_from_bookings(customer_name)
+                    if normalized_name:
+                        customer_name = normalized_name
+                    update_response = supabase.update('customers', f'line_user_id=eq.{user_id}', {'name': customer_name})
+                    if update_response.status_code in [200, 204]:
+                        table_cache.invalidate('customers')
+                        print(f"✓ 既存ユーザーの名前を更新: {customer_name}")
+                        return True
+                print(f"✓ 既存ユーザー: {existing_name} (更新スキップ)")
+                return True
+    except Exception as e:
+        print(f"Supabase保存エラー: {e}")
+    return False
+
+
+# 欠勤申請（初回起動時に absence_log.json から移行）
+absence_store = AbsenceStore(legacy_file=ABSENCE_FILE)
+
+
+def backup_customers():
+    """顧客データをバックアップ"""
+    try:
+        mapping = load_mapping()
+        backup_file = f'backup_customers_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
+        with open(backup_file, 'w', encoding='utf-8') as f:
+            json.dump(mapping, f, ensure_ascii=False, indent=2)
+        print(f"✓ バックアップ作成: {backup_file}")
+    except Exception as e:
+        print(f"バックアップエラー: {e}")
+
+
+def save_absence(staff_name, reason, details, alternative_date, absence_date=None):
+    return absence_store.add(staff_name, reason, details, alternative_date, absence_date)
@@ -1,70 +1,424 @@
-from flask import Blueprint, render_template, request, redirect, url_for, make_response
-from utils.auth import admin_required
-from models.data_handler import load_messages, save_messages, load_mapping, load_absences
+"""管理画面（欠勤承認・スタッフ・メッセージ・顧客一覧・エクスポート）と状態確認API"""
 from datetime import datetime
-import csv
-from io import StringIO
-from collections import defaultdict
 
-bp = Blueprint('admin_routes', __name__)
+import requests
+from flask import (Blueprint, Response, flash, jsonify, redirect, render_template, request, stream_with_context,
+                   url_for)
+
+from models.data_handler import absence_store, load_mapping, load_messages, save_mapping, save_messages
+from utils.auth import admin_required, get_full_name
+from utils.customer_index import load_customer_index, name_key
+from utils.customer_search import customer_page
+from utils.export_stream import FORMATS as EXPORT_FORMATS, keyset_rows, csv_stream, ndjson_stream
+from utils.jobs import JobRegistry
+from utils.line_sender import LINE_BOT_TOKEN_STAFF, get_line_dispatcher, queue_line_multicast
+from utils.salonboard_tasks import browser_pool, slot_refresh_queue
+from utils.supabase_client import supabase
+from utils.table_cache import table_cache
+
+bp = Blueprint('admin', __name__)
+
+
+ABSENCE_PAGE_SIZE = 100
+
+
+@bp.route('/admin/absences')
+@admin_required
+def admin_absences():
+    pending = absence_store.list(status='pending', newest_first=False, limit=ABSENCE_PAGE_SIZE)
+    
+    return render_template('admin_absences.html', pending=pending, job_id=request.args.get('job'))
+
+
+def notify_absence_customers(job, absence_date):
+    """欠勤日の予約客にLINE通知（ジョブとして裏で実行）"""
+    # 該当日の予約顧客を8weeks_bookingsから取得
+    job.update('bookings')
+    response = supabase.get(f"8weeks_bookings?visit_datetime=like.{absence_date}*&select=customer_name,phone,visit_datetime,menu")
+    if response.status_code != 200:
+        raise RuntimeError(f"予約取得失敗: {response.status_code}")
+    bookings = response.json()
+    job.update('match', bookings=len(bookings))
+
+    # 予約の正規化名 × customers のハッシュ結合（同じ顧客の複数予約は1人として数える）
+    index = load_customer_index() if bookings else None
+    if bookings and index is None:
+        raise RuntimeError("顧客インデックスの読み込みに失敗")
+    customers = {}
+    unmatched = 0
+    for name in {name_key(b.get('customer_name')) for b in bookings}:
+        cust = index.customer_by_name(name, with_line=True)
+        if cust:
+            customers[cust['line_user_id']] = cust
+        else:
+            unmatched += 1
+
+    # テストモード: 神原良祐とtest沙織のみに送信
+    TEST_IDS = ["U9022782f05526cf7632902acaed0cb08", "U1d1dfe1993f1857327678e37b607187a"]  # 神原良祐, test沙織
+    recipients = []
+    for line_user_id, cust in customers.items():
+        cust_name = cust.get('name', '').replace(' ', '')
+        if line_user_id in TEST_IDS:
+            recipients.append(line_user_id)
+            print(f"[欠勤通知-テスト] {cust_name}様に送信登録", flush=True)
+        else:
+            print(f"[欠勤通知-スキップ] {cust_name}様（テスト対象外）", flush=True)
+    job.update('send', matched=len(customers), unmatched=unmatched, recipients=len(recipients))
+
+    # 同じ文面なのでまとめてmulticast
+    status = None
+    if recipients:
+        message = f"【重要】ご予約日程変更のお願い\n\n{absence_date}のご予約について、担当スタッフの都合により日程変更をお願いしたくご連絡いたしました。\n\n大変申し訳ございませんが、ご都合の良い日時をお知らせください。\n\neyelashsalon HAL"
+        message_id = queue_line_multicast(recipients, message, LINE_BOT_TOKEN_STAFF)
+        job.update(message_id=message_id)
+        status = get_line_dispatcher().wait(message_id, timeout=120)
+    job.update('done', send_status=status)
+    return {'matched': len(customers), 'recipients': len(recipients), 'send_status': status}
+
+
+absence_jobs = JobRegistry()
+
+
+@bp.route('/admin/approve_absence', methods=['POST'])
+@admin_required
+def approve_absence():
+    absence_id = request.form.get('absence_id')
+    # pending の行だけ承認されるので、二重送信でも通知ジョブは1回
+    target_absence = absence_store.approve(absence_id)
+    
+    if target_absence:
+        # 顧客への通知は裏で実行し、進捗は欠勤承認画面で表示する
+        absence_date = target_absence.get('absence_date')
+        job_id = absence_jobs.start('absence_notify', f"{target_absence.get('staff_name')} {absence_date} 欠勤の顧客通知",
+                                    notify_absence_customers, absence_date)
+        flash('承認完了。顧客へのLINE通知を開始しました。', 'success')
+        return redirect(f'/admin/absences?job={job_id}')
+    
+    return redirect('/admin/absences')
+
+
+@bp.route('/api/jobs/<job_id>', methods=['GET'])
+@admin_required
+def api_job_status(job_id):
+    """裏処理ジョブの進捗（queued / running / done / failed）"""
+    job = absence_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'not found'}), 404
+    return jsonify(job)
+
+
+@bp.route('/admin/staff')
+@admin_required
+def admin_staff():
+    """スタッフマスタ管理画面"""
+    try:
+        res = supabase.get('salon_staff?select=*&order=id')
+        staff_list = res.json() if res.status_code == 200 else []
+    except:
+        staff_list = []
+    
+    return render_template('admin_staff.html', staff_list=staff_list)
+
+
+@bp.route('/admin/staff/add', methods=['POST'])
+@admin_required
+def admin_staff_add():
+    """スタッフ追加"""
+    name = request.form.get('name')
+    line_id = request.form.get('line_id') or None
+    
+    try:
+        data = {'name': name, 'line_id': line_id, 'active': True}
+        supabase.insert('salon_staff', data)
+        table_cache.invalidate('salon_staff')
+        flash(f'{name}を追加しました', 'success')
+    except Exception as e:
+        flash(f'エラー: {str(e)}', 'error')
+    
+    return redirect('/admin/staff')
+
+
+@bp.route('/admin/staff/toggle', methods=['POST'])
+@admin_required
+def admin_staff_toggle():
+    """スタッフ有効/無効切替"""
+    staff_id = request.form.get('staff_id')
+    active = request.form.get('active') == 'true'
+    
+    try:
+        supabase.update('salon_staff', f'id=eq.{staff_id}', {'active': active}, prefer='return=minimal')
+        table_cache.invalidate('salon_staff')
+        flash('更新しました', 'success')
+    except Exception as e:
+        flash(f'エラー: {str(e)}', 'error')
+    
+    return redirect('/admin/staff')
+
 
 @bp.route('/admin')
 @admin_required
 def admin():
-    messages = load_messages()
+    # メッセージを動的に読み込む
+    MESSAGES = load_messages()
+    
+    # 統計情報を計算
     mapping = load_mapping()
     customer_count = len(mapping)
-    absences = load_absences()
-    total_absences = len(absences)
-    current_month = datetime.now().strftime("%Y-%m")
-    monthly_absences = sum(1 for a in absences if a.get("submitted_at", "").startswith(current_month))
+    
+    total_absences = absence_store.count()
+    
+    # 今月の欠勤申請数
+    monthly_absences = absence_store.count(month=datetime.now().strftime("%Y-%m"))
+    
     success = request.args.get('success')
-    return render_template('admin.html', messages=messages, success=success, customer_count=customer_count, monthly_absences=monthly_absences, total_absences=total_absences)
+    return render_template('admin.html', messages=MESSAGES, success=success, 
+                                 customer_count=customer_count, monthly_absences=monthly_absences, 
+                                 total_absences=total_absences)
 
-@bp.route('/update', methods=['POST'])
-@admin_required
-def update():
-    messages = {'absence_request': request.form.get('absence_request'), 'substitute_confirmed': request.form.get('substitute_confirmed'), 'absence_confirmed': request.form.get('absence_confirmed')}
-    save_messages(messages)
-    return redirect(url_for('admin_routes.admin', success='true'))
 
 @bp.route('/customers')
 @admin_required
 def customer_list():
-    mapping = load_mapping()
-    return render_template('customers.html', mapping=mapping)
+    # 1ページ分だけ取得（検索・続きの読み込みは /api/customers）
+    q = request.args.get('q', '')
+    try:
+        page = customer_page(q=q, index=load_customer_index() if q else None)
+    except Exception as e:
+        print(f"[CUSTOMERS] {e}", flush=True)
+        page = {'rows': [], 'next': None, 'total': None}
+    
+    return render_template('customers.html', page=page, q=q)
+
+
+@bp.route('/api/customers', methods=['GET'])
+@admin_required
+def api_customers():
+    """顧客一覧の1ページ（?q=検索語&after=カーソル）"""
+    try:
+        q = request.args.get('q')
+        return jsonify(customer_page(q=q, after=request.args.get('after'), index=load_customer_index() if q else None))
+    except Exception as e:
+        print(f"[CUSTOMERS] {e}", flush=True)
+        return jsonify({'error': str(e)}), 502
+
 
 @bp.route('/absences')
 @admin_required
 def absence_list():
-    absences = load_absences()
-    def get_full_name(staff_id):
-        from utils.auth import load_staff
-        staff_data = load_staff()
-        return staff_data.get(staff_id, {}).get('full_name', staff_id)
-    grouped_absences = defaultdict(list)
-    for absence in absences:
-        month_key = absence['submitted_at'][:7]
-        grouped_absences[month_key].append(absence)
-    return render_template('absences.html', grouped_absences=dict(sorted(grouped_absences.items(), reverse=True)), get_full_name=get_full_name)
+    # 月ごとの件数だけ集計し、行は選択中の月の1ページ分だけ取得
+    months = absence_store.months()
+    total = sum(count for _, count in months)
+    current_month = request.args.get('month') or datetime.now().strftime('%Y-%m')
+    page = max(1, request.args.get('page', 1, type=int))
+    month_absences = absence_store.list(month=current_month, limit=ABSENCE_PAGE_SIZE,
+                                        offset=(page - 1) * ABSENCE_PAGE_SIZE)
+    month_total = dict(months).get(current_month, 0)
+    pages = max(1, -(-month_total // ABSENCE_PAGE_SIZE))
+    
+    return render_template('absences.html', months=months, total=total, month_absences=month_absences,
+                                   current_month=current_month, page=page, pages=pages, get_full_name=get_full_name)
 
-@bp.route('/export/absences')
+
+@bp.route('/update', methods=['POST'])
 @admin_required
-def export_absences():
-    absences = load_absences()
-    si = StringIO()
-    writer = csv.writer(si)
-    writer.writerow(['スタッフ名', '欠勤理由', '状況説明', '代替可能日時', '申請日時'])
-    for absence in absences:
-        writer.writerow([absence.get('staff_name', ''), absence.get('reason', ''), absence.get('details', ''), absence.get('alternative_date', ''), absence.get('submitted_at', '')[:19].replace('T', ' ')])
-    output = si.getvalue()
-    si.close()
-    response = make_response(output)
-    response.headers['Content-Type'] = 'text/csv; charset=utf-8-sig'
-    response.headers['Content-Disposition'] = f'attachment; filename=absences_{datetime.now().strftime("%Y%m%d")}.csv'
-    return response
+def update():
+    absence_msg = request.form.get('absence_request')
+    substitute_msg = request.form.get('substitute_confirmed')
+    absence_conf_msg = request.form.get('absence_confirmed')
+    
+    # JSONファイルとして保存（改行もそのまま保存される）
+    messages = {
+        "absence_request": absence_msg,
+        "substitute_confirmed": substitute_msg,
+        "absence_confirmed": absence_conf_msg
+    }
+    save_messages(messages)
+    
+    return redirect(url_for('admin.admin', success='1'))
+
 
-@bp.route('/scrape')
+@bp.route("/api/scrape-hotpepper", methods=["POST"])
+@admin_required
+def scrape_hotpepper():
+    """ホットペッパーから顧客情報をスクレイピング"""
+    from bs4 import BeautifulSoup
+    try:
+        data = request.json
+        url = data.get("url")
+        
+        if not url:
+            return jsonify({"success": False, "error": "URLが必要です"}), 400
+        
+        # 実際のページを取得
+        response = requests.get(url, headers={
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        })
+        soup = BeautifulSoup(response.text, 'html.parser')
+        
+        customers = []
+        new_count = 0
+        
+        # ホットペッパーの予約情報を抽出
+        for elem in soup.find_all(['span', 'div', 'td'], class_=['customer', 'name', 'reservation']):
+            name = elem.get_text().strip()
+            if name and len(name) >= 2 and len(name) <= 20:
+                mapping = load_mapping()
+                if name not in mapping:
+                    temp_id = f"pending_{datetime.now().timestamp()}"
+                    save_mapping(name, temp_id)
+                    customers.append({"name": name, "status": "新規登録"})
+                    new_count += 1
+                else:
+                    customers.append({"name": name, "status": "登録済み"})
+        
+        return jsonify({
+            "success": True, 
+            "customers": customers, 
+            "count": len(customers),
+            "new_count": new_count,
+            "message": f"合計{len(customers)}件（新規{new_count}件）を取得しました"
+        })
+        
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route("/admin/scrape")
 @admin_required
 def scrape_page():
+    """スクレイピング管理画面"""
     return render_template('scrape.html')
+
+
+def stream_export(rows, name, columns=None, labels=None):
+    """行のジェネレータをそのままCSV/NDJSONで返す（?format=csv|ndjson、既定はcsv）"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f'format は {"/".join(EXPORT_FORMATS)} のいずれか'}), 400
+    mimetype, ext = EXPORT_FORMATS[fmt]
+    body = csv_stream(rows, columns, labels) if fmt == 'csv' else ndjson_stream(rows)
+    response = Response(stream_with_context(body), content_type=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={name}_{datetime.now().strftime("%Y%m%d")}.{ext}'
+    return response
+
+
+@bp.route('/export/absences')
+@admin_required
+def export_absences():
+    """欠勤履歴をCSV/NDJSONでエクスポート（?month=YYYY-MM で月指定）"""
+    month = request.args.get('month') or None
+    if request.args.get('format') == 'ndjson':
+        return stream_export(absence_store.iter_rows(month), 'absences')
+    rows = (
+        {
+            'staff_name': a.get('staff_name', ''),
+            'reason': a.get('reason', ''),
+            'details': a.get('details', ''),
+            'alternative_date': a.get('alternative_date', ''),
+            'submitted_at': (a.get('submitted_at') or '')[:19].replace('T', ' '),
+        }
+        for a in absence_store.iter_rows(month)
+    )
+    return stream_export(rows, 'absences',
+                         columns=['staff_name', 'reason', 'details', 'alternative_date', 'submitted_at'],
+                         labels=['スタッフ名', '欠勤理由', '状況説明', '代替可能日時', '申請日時'])
+
+
+@bp.route('/export/customers')
+@admin_required
+def export_customers():
+    """顧客一覧をCSV/NDJSONでエクスポート"""
+    return stream_export(keyset_rows('customers', 'id,name,phone,customer_number,line_user_id,registered_at'),
+                         'customers', columns=['id', 'name', 'phone', 'customer_number', 'line_user_id', 'registered_at'])
+
+
+@bp.route('/export/bookings')
+@admin_required
+def export_bookings():
+    """8weeks_bookings をCSV/NDJSONでエクスポート（booking_id順）"""
+    return stream_export(keyset_rows('8weeks_bookings', key='booking_id'), 'bookings')
+
+
+@bp.route('/export/reminder_logs')
+@admin_required
+def export_reminder_logs():
+    """reminder_logs をCSV/NDJSONでエクスポート（?since=YYYY-MM-DD で送信日以降に絞り込み）"""
+    since = request.args.get('since')
+    filters = f'sent_at=gte.{since}T00:00:00' if since else None
+    return stream_export(keyset_rows('reminder_logs', filters=filters), 'reminder_logs')
+
+
+@bp.route('/api/browser_pool_status', methods=['GET'])
+@admin_required
+def api_browser_pool_status():
+    """ブラウザプールのリース待ち時間・稼働率"""
+    return jsonify(browser_pool.metrics())
+
+
+@bp.route('/api/line_dispatcher_status', methods=['GET'])
+@admin_required
+def api_line_dispatcher_status():
+    """LINE送信キューの件数・送信数・再送数"""
+    return jsonify(get_line_dispatcher().snapshot())
+
+
+@bp.route('/api/line_messages/<message_id>', methods=['GET'])
+@admin_required
+def api_line_message_status(message_id):
+    """登録したLINE送信の状態（queued / sending / retrying / sent / failed）"""
+    status = get_line_dispatcher().status(message_id)
+    if status is None:
+        return jsonify({'error': 'not found'}), 404
+    return jsonify(status)
+
+
+# ========== CSVインポート機能 ==========
+@bp.route('/api/import-customers', methods=['POST'])
+def api_import_customers():
+    """サロンボードのCSVから顧客情報をインポート"""
+    import csv
+    import io
+    
+    if 'file' not in request.files:
+        return jsonify({'error': 'ファイルがありません'}), 400
+    
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'error': 'ファイルが選択されていません'}), 400
+    
+    try:
+        stream = io.StringIO(file.stream.read().decode('utf-8-sig'))
+        reader = csv.DictReader(stream)
+        
+        updated = 0
+        for row in reader:
+            phone = row.get('電話番号', '').replace('-', '').replace(' ', '')
+            name = row.get('顧客名', '') or row.get('お客様名', '') or row.get('名前', '')
+            
+            if phone and name:
+                # 電話番号でcustomersを検索して名前を更新
+                res = supabase.get(f'customers?phone=eq.{phone}&select=id')
+                customers = res.json()
+                
+                if customers:
+                    # 既存顧客の名前を更新
+                    supabase.update('customers', f'phone=eq.{phone}', {'name': name})
+                    updated += 1
+        
+        return jsonify({'success': True, 'updated': updated})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/cache_status', methods=['GET'])
+@admin_required
+def api_cache_status():
+    """テーブルキャッシュのヒット/ミス数を確認"""
+    return jsonify(table_cache.stats())
+
+
+@bp.route('/api/slot_refresh_status', methods=['GET'])
+@admin_required
+def api_slot_refresh_status():
+    """空き枠再取得キューの状態"""
+    return jsonify(slot_refresh_queue.status())
@@ -0,0 +1,485 @@
+"""定期実行・外部cronから呼ぶエンドポイント（スクレイピング・リマインド・補完・バックアップ）
+
+スケジューラーは import では起動しない。gunicorn の post_worker_init（gunicorn.conf.py）か
+直接起動時に start_schedulers() を呼ぶ。
+"""
+import os
+import threading
+from datetime import datetime
+
+import requests
+from flask import Blueprint, jsonify, request
+
+from utils.auth import admin_required
+from utils.browser_pool import COOKIE_FILE
+from utils.customer_index import load_customer_index
+from utils.line_sender import LINE_BOT_TOKEN_STAFF, queue_line_multicast, send_line_message
+from utils.menu_index import MenuIndex, PRICE_KEYWORDS
+from utils.reminders import run_reminders
+from utils.salonboard_jobs import enqueue_cookie_refresh, enqueue_phone_fill, enqueue_scrape
+from utils.salonboard_tasks import SALONBOARD, invalidate_caches, task_queue, task_secret_valid
+from utils.scheduler import LeaderScheduler
+from utils.supabase_client import supabase
+from utils.table_cache import table_cache
+
+bp = Blueprint('cron', __name__)
+
+# 毎時スクレイピング（scrape_hourly）を定期実行するか（既定は登録のみで実行しない）
+ENABLE_SCRAPE_SCHEDULE = os.getenv('ENABLE_SCRAPE_SCHEDULE', 'false').lower() == 'true'
+
+
+@bp.route('/health_check', methods=['GET'])
+def health_check():
+    """環境確認用"""
+    import sys
+    return jsonify({
+        'status': 'ok',
+        'python_version': sys.version,
+        'salonboard_id_set': bool(os.getenv('SALONBOARD_LOGIN_ID')),
+        'salonboard_pwd_set': bool(os.getenv('SALONBOARD_LOGIN_PASSWORD')),
+        'timestamp': datetime.now().isoformat()
+    })
+
+
+def check_null_phone_customers():
+    """24時間以上電話番号NULLの顧客を神原良祐に通知"""
+    try:
+        from datetime import datetime, timedelta
+        res = supabase.get("customers?phone=is.null&select=name,registered_at")
+        null_customers = res.json()
+        now = datetime.now()
+        old_nulls = []
+        for c in null_customers:
+            reg_at = c.get("registered_at", "")
+            if reg_at:
+                reg_time = datetime.fromisoformat(reg_at.replace("Z", "+00:00").replace("+00:00", ""))
+                if (now - reg_time).total_seconds() > 86400:
+                    old_nulls.append(c.get("name", "不明"))
+        if old_nulls:
+            message = f"⚠️ 電話番号未取得（24時間以上）:\n" + "\n".join([f"・{name}" for name in old_nulls])
+            send_line_message("U9022782f05526cf7632902acaed0cb08", message, LINE_BOT_TOKEN_STAFF)
+            print(f"[NULL通知] {len(old_nulls)}件通知")
+        else:
+            print("[NULL通知] 該当なし")
+    except Exception as e:
+        print(f"[NULL通知エラー] {e}")
+
+
+# ===== Cookie自動更新（3時実行） =====
+def refresh_salonboard_cookie():
+    """SalonBoardへの再ログイン・Cookie保存をタスクキューに登録（実行はタスクワーカー）"""
+    task_id, created = enqueue_cookie_refresh()
+    print(f"[Cookie更新] タスク登録: #{task_id}")
+    return {"success": True, "task_id": task_id, "created": created}
+
+
+@bp.route("/api/cron/refresh-cookie", methods=["POST"])
+def cron_refresh_cookie():
+    """Cookie更新エンドポイント"""
+    result = refresh_salonboard_cookie()
+    return jsonify(result)
+
+
+def update_menu_prices():
+    """salonboard_menus の金額を salon_menus から更新して更新件数を返す"""
+    import re
+    
+    def get_salonboard_menus():
+        return supabase.select('salonboard_menus', 'select=id,name,duration,price&order=id.asc')
+
+    def get_salon_menus():
+        return supabase.select('salon_menus', 'select=name,price')
+
+    def extract_price(price_str):
+        if not price_str:
+            return 0
+        match = re.search(r'[\d,]+', str(price_str).replace(',', ''))
+        return int(match.group().replace(',', '')) if match else 0
+
+    def find_matching_price(menu_name, index):
+        # キーワード優先 → 名前の相互部分一致（MenuIndexで一括照合）
+        sm = index.match(menu_name, keyword_first=True)
+        return extract_price(sm.get('price', '')) if sm else 0
+
+    salonboard_menus = get_salonboard_menus()
+    salon_index = MenuIndex(get_salon_menus(), keywords=PRICE_KEYWORDS, clean=True)
+    updated = 0
+    
+    for menu in salonboard_menus:
+        menu_id = menu['id']
+        menu_name = menu['name']
+        current_price = menu.get('price') or 0
+        new_price = find_matching_price(menu_name, salon_index)
+        
+        if new_price > 0 and new_price != current_price:
+            res = supabase.update('salonboard_menus', f'id=eq.{menu_id}', {'price': new_price})
+            if res.status_code == 204:
+                updated += 1
+    
+    if updated:
+        table_cache.invalidate('salonboard_menus')
+    return updated
+
+
+@bp.route('/api/cron/update-menu-prices', methods=['POST'])
+def cron_update_menu_prices():
+    """毎日3時にsalonboard_menusの金額を更新（定期実行用）"""
+    try:
+        return jsonify({'success': True, 'updated': update_menu_prices()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/scrape_today', methods=['GET', 'POST'])
+def api_scrape_today():
+    """当日予約から電話番号を取得してcustomersに追加"""
+    try:
+        import subprocess
+        result = subprocess.run(
+            ['python3', 'scrape_today.py'],
+            capture_output=True,
+            text=True,
+            timeout=300
+        )
+        return jsonify({
+            'success': result.returncode == 0,
+            'stdout': result.stdout,
+            'stderr': result.stderr
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/api/reminder_send', methods=['GET'])
+def api_reminder_send():
+    """リマインド本番送信（全員）"""
+    results = send_reminder_notifications(test_mode=True)
+    return jsonify({"success": True, "results": results})
+
+
+@bp.route('/api/reminder_send_7days', methods=['GET'])
+def api_reminder_send_7days():
+    """7日前リマインド本番送信（全員）"""
+    results = send_reminder_notifications(test_mode=False, target_days=[7])
+    return jsonify({"success": True, "results": results})
+
+
+@bp.route('/api/reminder_send_3days', methods=['GET'])
+def api_reminder_send_3days():
+    """3日前リマインド本番送信（全員）"""
+    results = send_reminder_notifications(test_mode=False, target_days=[3])
+    return jsonify({"success": True, "results": results})
+
+
+def send_reminder_notifications(test_mode=True, target_days=None, force_recipient=None, dry_run=False):
+    """3日後・7日後の予約にリマインド通知を送信（utils.reminders のパイプライン）"""
+    return run_reminders(send_line_message, test_mode=test_mode, target_days=target_days,
+                         force_recipient=force_recipient, dry_run=dry_run, notify=queue_line_multicast)
+
+
+# ========== 8週間予約スクレイピング ==========
+@bp.route('/api/scrape_8weeks', methods=['GET', 'POST'])
+def scrape_8weeks():
+    """8週間分の予約をスクレイピングしてbookingsテーブルに保存"""
+    from datetime import datetime, timedelta, timezone
+    from playwright.sync_api import sync_playwright
+    import re
+    import json
+    import re
+    
+    JST = timezone(timedelta(hours=9))
+    today = datetime.now(JST)
+    
+    results = {"total": 0, "updated": 0, "errors": []}
+    
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=False)
+            context = browser.new_context()
+            
+            # クッキー読み込み
+            cookie_file = COOKIE_FILE
+            if os.path.exists(cookie_file):
+                with open(cookie_file, 'r') as f:
+                    cookies = json.load(f)
+                    context.add_cookies(cookies)
+            
+            page = context.new_page()
+            
+            # 8週間分（56日）をループ
+            for day_offset in range(56):
+                target_date = today + timedelta(days=day_offset)
+                date_str = target_date.strftime("%Y%m%d")
+                url = f"https://salonboard.com/KLP/reserve/reserveList/?search_date={date_str}"
+                
+                try:
+                    page.goto(url, timeout=30000, wait_until="domcontentloaded")
+                    page.wait_for_timeout(2000)
+                    
+                    # ログインチェック
+                    if 'login' in page.url.lower():
+                        results["errors"].append(f"ログイン必要: {date_str}")
+                        break
+                    
+                    # 予約データ抽出
+                    rows = page.query_selector_all('tr.rsv')
+                    
+                    for row in rows:
+                        try:
+                            time_el = row.query_selector('td.time')
+                            name_el = row.query_selector('td.name a')
+                            phone_el = row.query_selector('td.phone')
+                            menu_el = row.query_selector('td.menu')
+                            staff_el = row.query_selector('td.staff')
+                            
+                            visit_time = time_el.inner_text().strip() if time_el else ''
+                            customer_name = name_el.inner_text().strip() if name_el else ''
+                            phone = phone_el.inner_text().strip() if phone_el else ''
+                            menu = menu_el.inner_text().strip() if menu_el else ''
+                            staff = staff_el.inner_text().strip() if staff_el else ''
+                            
+                            if not customer_name:
+                                continue
+                            
+                            # booking_id生成（重複防止用）
+                            booking_id = f"{date_str}_{visit_time}_{phone}".replace(" ", "").replace(":", "")
+                            
+                            data = {
+                                'booking_id': booking_id,
+                                'customer_name': customer_name.replace('★', '').strip(),
+                                'phone': re.sub(r'[^\d]', '', phone),
+                                'visit_datetime': f"{target_date.strftime('%m/%d')}{visit_time}",
+                                'menu': menu,
+                                'staff': staff,
+                                'status': 'confirmed',
+                                'booking_source': 'salonboard'
+                            }
+                            
+                            # Upsert
+                            res = supabase.upsert('bookings', data)
+                            
+                            if res.status_code in [200, 201]:
+                                results["updated"] += 1
+                            
+                            results["total"] += 1
+                            
+                        except Exception as e:
+                            continue
+                    
+                except Exception as e:
+                    results["errors"].append(f"{date_str}: {str(e)}")
+                    continue
+            
+            browser.close()
+    
+    except Exception as e:
+        results["errors"].append(str(e))
+    
+    return jsonify(results)
+
+
+@bp.route('/api/scrape_8weeks_v2', methods=['GET', 'POST'])
+def api_scrape_8weeks_v2():
+    """8週間分の予約をスクレイピング（バックグラウンド実行）"""
+    import threading
+    import subprocess
+    
+    def run_scrape():
+        subprocess.run(['python3', 'scrape_8weeks_v2.py'], capture_output=True, text=True)
+    
+    thread = threading.Thread(target=run_scrape)
+    thread.start()
+    
+    return jsonify({'success': True, 'message': 'スクレイピング開始（バックグラウンド実行中）'})
+
+
+@bp.route('/api/tasks', methods=['GET'])
+def api_tasks():
+    """タスクキューの状態（待機中・実行中の件数と直近のタスク、?kind= ?status= で絞り込み）"""
+    limit = min(request.args.get('limit', 50, type=int), 200)
+    return jsonify({
+        'salonboard_busy': task_queue.busy(SALONBOARD),
+        'active': task_queue.counts(),
+        'tasks': task_queue.recent(kind=request.args.get('kind'), status=request.args.get('status'), limit=limit),
+    })
+
+
+@bp.route('/api/tasks/<int:task_id>', methods=['GET'])
+def api_task(task_id):
+    """タスク1件の状態"""
+    task = task_queue.get(task_id)
+    if task is None:
+        return jsonify({'error': 'not found'}), 404
+    return jsonify(task)
+
+
+@bp.route('/api/tasks/<int:task_id>/cancel', methods=['POST'])
+@admin_required
+def api_task_cancel(task_id):
+    """待機中のタスクを取り消す（実行中のものは取り消せない）"""
+    if not task_queue.cancel(task_id):
+        return jsonify({'success': False, 'message': '待機中のタスクではありません'}), 409
+    return jsonify({'success': True})
+
+
+@bp.route('/api/scrape_8weeks_v4', methods=['GET', 'POST'])
+def api_scrape_8weeks_v4():
+    """8週間分の予約をスクレイピング（タスクキューに登録、同じ条件の二重登録はしない）"""
+    try:
+        days_limit = int(request.args.get('days_limit', '56'))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'days_limit は整数で指定してください'}), 400
+    task_id, created = enqueue_scrape(days_limit, full=request.args.get('full') == '1')
+    if not created:
+        return jsonify({'success': False, 'task_id': task_id, 'message': '既に実行中です。しばらくお待ちください。'}), 429
+    return jsonify({'success': True, 'task_id': task_id, 'message': 'スクレイピング開始（バックグラウンド実行中）'})
+
+
+def fill_customer_phones():
+    """電話番号がNULLの顧客を8weeks_bookingsから補完して更新件数を返す"""
+    # 電話番号がNULLの顧客を取得
+    res = supabase.get('customers?phone=is.null&select=id,name,line_user_id')
+    null_phone_customers = res.json() if res.status_code == 200 else []
+    
+    # 8weeks_bookingsは照合インデックスで1回だけ読み込む
+    index = load_customer_index() if null_phone_customers else None
+    updated_count = 0
+    for c in null_phone_customers:
+        name = c.get('name', '')
+        if not name or name in ['NULL', 'saorin', 'HAL本店1']:
+            continue
+        
+        # 名前で8weeks_bookingsから電話番号を検索
+        b = index.booking_by_name(name, with_phone=True) if index else None
+        if b:
+            # 電話番号を更新
+            supabase.update('customers', f"id=eq.{c['id']}", {'phone': b['phone']})
+            print(f"[電話番号補完] {name} → {b['phone']}")
+            updated_count += 1
+    
+    if updated_count:
+        table_cache.invalidate('customers')
+    return updated_count
+
+
+@bp.route('/api/cron/fill-customer-phones', methods=['POST'])
+def cron_fill_customer_phones():
+    """電話番号がNULLの顧客を8weeks_bookingsから補完"""
+    return jsonify({'success': True, 'updated': fill_customer_phones()})
+
+
+@bp.route('/api/cron/invalidate-cache', methods=['POST'])
+def cron_invalidate_cache():
+    """別プロセス（外部のタスクワーカー）からのキャッシュ破棄用（X-Task-Secret 必須）"""
+    if not task_secret_valid(request.headers.get('X-Task-Secret')):
+        return jsonify({'success': False, 'message': 'forbidden'}), 403
+    table = request.args.get('table') or None
+    if table:
+        invalidate_caches([table])
+    else:
+        table_cache.invalidate(None)
+    return jsonify({'success': True, 'table': table})
+
+
+def backup_customers_table():
+    """customersをcustomers_backupに上書きして件数を返す"""
+    customers = supabase.get("customers?select=*").json()
+    supabase.remove("customers_backup", "id=neq.00000000-0000-0000-0000-000000000000")
+    for c in customers:
+        c["backup_at"] = datetime.now().isoformat()
+        supabase.insert("customers_backup", c)
+    print(f"[BACKUP] {len(customers)}件バックアップ完了")
+    return len(customers)
+
+
+@bp.route("/api/cron/backup-customers", methods=["POST"])
+def cron_backup_customers():
+    """customersをcustomers_backupに上書き"""
+    try:
+        return jsonify({"success": True, "count": backup_customers_table()}), 200
+    except Exception as e:
+        print(f"[BACKUP] エラー: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route('/api/cron/fill-phone-from-salonboard', methods=['POST'])
+def cron_fill_phone_from_salonboard():
+    """電話番号が空のBE予約をSalonBoardから補完（タスクキューに登録）"""
+    task_id, _ = enqueue_phone_fill()
+    return jsonify({'status': 'queued', 'task_id': task_id}), 200
+
+
+# ===== 定期実行（APScheduler） =====
+def self_health_check():
+    """自己ヘルスチェック、異常時にLINE通知"""
+    KAMBARA_LINE_ID = "U9022782f05526cf7632902acaed0cb08"
+    try:
+        res = requests.get("https://salon-absence-system-production.up.railway.app/health_check", timeout=10)
+        if res.status_code != 200:
+            send_line_message(KAMBARA_LINE_ID, f"⚠️ Railway異常: ステータス {res.status_code}")
+    except Exception:
+        # 自分自身がダウンしてる場合はここに来ない
+        pass
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def build_scheduler():
+    """定期ジョブを登録した LeaderScheduler（起動はしない）"""
+    from apscheduler.triggers.cron import CronTrigger
+    from apscheduler.triggers.interval import IntervalTrigger
+
+    scheduler = LeaderScheduler()
+    # リマインド自動送信（毎朝9:00 JST）・電話番号NULL通知（9:10 JST）
+    scheduler.add_job('daily_reminder', '毎朝9時リマインド送信（テスト）',
+                      lambda: send_reminder_notifications(test_mode=True),
+                      CronTrigger(hour=0, minute=0, timezone='UTC'), timeout=1800, misfire_grace=3600)
+    scheduler.add_job('daily_null_phone_check', '毎朝9時10分電話番号NULL通知', check_null_phone_customers,
+                      CronTrigger(hour=0, minute=10, timezone='UTC'), timeout=300, misfire_grace=3600)
+    # 深夜の日次処理（JST 3:00〜3:25）
+    scheduler.add_job('daily_cookie_refresh', '毎日3時Cookie更新（タスク登録）', refresh_salonboard_cookie,
+                      CronTrigger(hour=18, minute=0, timezone='UTC'), timeout=60, misfire_grace=3600)
+    scheduler.add_job('daily_fill_phone_salonboard', '毎日3時SalonBoard電話番号補完（タスク登録）', enqueue_phone_fill,
+                      CronTrigger(hour=18, minute=5, timezone='UTC'), timeout=60, misfire_grace=3600)
+    scheduler.add_job('daily_menu_sync', '毎日3時メニュー金額同期', update_menu_prices,
+                      CronTrigger(hour=18, minute=15, timezone='UTC'), timeout=600, misfire_grace=3600)
+    scheduler.add_job('daily_fill_phones', '毎日3時半電話番号補完', fill_customer_phones,
+                      CronTrigger(hour=18, minute=20, timezone='UTC'), timeout=600, misfire_grace=3600)
+    scheduler.add_job('daily_backup_customers', '毎日3時25分顧客バックアップ', backup_customers_table,
+                      CronTrigger(hour=18, minute=25, timezone='UTC'), timeout=600, misfire_grace=3600)
+    # スクレイピング：1時間ごと（7-23時JST = UTC 22-14時）。ENABLE_SCRAPE_SCHEDULE=true の時だけ定期実行
+    scheduler.add_job('scrape_hourly', '毎時スクレイピング（10日分、タスク登録）', lambda: enqueue_scrape(10),
+                      CronTrigger(hour='22-23,0-14', minute=0, timezone='UTC'), timeout=60, misfire_grace=600,
+                      enabled=ENABLE_SCRAPE_SCHEDULE)
+    # ヘルスチェック監視（5分ごと）
+    scheduler.add_job('health_check', '5分ごとヘルスチェック', self_health_check,
+                      IntervalTrigger(minutes=5), timeout=30, misfire_grace=60)
+    return scheduler
+
+
+def start_schedulers():
+    """定期ジョブのリーダー選出を開始（各ワーカーで呼んでよい。実行するのはリーダーだけ）"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = build_scheduler()
+            _scheduler.start()
+        return _scheduler
+
+
+def stop_schedulers():
+    """スケジューラーを止めてリーダー権を手放す（ワーカー終了時）"""
+    with _scheduler_lock:
+        if _scheduler is not None:
+            _scheduler.stop()
+
+
+@bp.route('/api/scheduler_status', methods=['GET'])
+def api_scheduler_status():
+    """定期ジョブの状態（リーダー・次回実行・直近の実行結果）"""
+    if _scheduler is None:
+        return jsonify({'started': False})
+    return jsonify({'started': True, **_scheduler.status(),
+                    'recent_runs': _scheduler.store.recent(job_id=request.args.get('job'), limit=50)})
@@ -0,0 +1,705 @@
+"""動作確認用のテスト・デバッグエンドポイント（ENABLE_DEBUG_ROUTES=true の時だけ登録）"""
+import json
+import os
+import threading
+from datetime import datetime
+
+from flask import Blueprint, jsonify, request
+
+from routes.cron_routes import send_reminder_notifications
+from utils.auth import admin_required, login_required
+from utils.browser_pool import COOKIE_FILE
+
+bp = Blueprint('debug', __name__)
+
+
+@bp.route('/admin/test_http_detailed')
+@login_required
+@admin_required
+def test_http_detailed():
+    import requests
+    import time
+    
+    results = []
+    
+    # ========================================
+    # Test 1: 基本的なHTTPリクエスト（タイムアウト60秒）
+    # ========================================
+    results.append("<h2>Test 1: 基本HTTPリクエスト（タイムアウト60秒）</h2>")
+    try:
+        start = time.time()
+        response = requests.get(
+            'https://salonboard.com/login/',
+            timeout=180,  # ← 120秒から60秒に変更
+            allow_redirects=True
+        )
+        elapsed = time.time() - start
+        results.append(f"✅ <strong>成功</strong>")
+        results.append(f"   ステータスコード: {response.status_code}")
+        results.append(f"   所要時間: {elapsed:.3f}秒")
+        results.append(f"   レスポンスサイズ: {len(response.content)} bytes")
+    except requests.exceptions.Timeout:
+        elapsed = time.time() - start
+        results.append(f"❌ <strong>失敗</strong>: タイムアウト（60秒）")
+        results.append(f"   実際の経過時間: {elapsed:.3f}秒")
+    except Exception as e:
+        results.append(f"❌ <strong>失敗</strong>: {str(e)}")
+    
+    # ========================================
+    # Test 2: User-Agent追加
+    # ========================================
+    results.append("<h2>Test 2: User-Agent追加</h2>")
+    try:
+        start = time.time()
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+        }
+        response = requests.get(
+            'https://salonboard.com/login/',
+            headers=headers,
+            timeout=180,  # ← 120秒から60秒に変更
+            allow_redirects=True
+        )
+        elapsed = time.time() - start
+        results.append(f"✅ <strong>成功</strong>")
+        results.append(f"   ステータスコード: {response.status_code}")
+        results.append(f"   所要時間: {elapsed:.3f}秒")
+        results.append(f"   レスポンスサイズ: {len(response.content)} bytes")
+        results.append(f"   最終URL: {response.url}")
+    except requests.exceptions.Timeout:
+        elapsed = time.time() - start
+        results.append(f"❌ <strong>失敗</strong>: タイムアウト（60秒）")
+        results.append(f"   実際の経過時間: {elapsed:.3f}秒")
+    except Exception as e:
+        results.append(f"❌ <strong>失敗</strong>: {str(e)}")
+    
+    # ========================================
+    # Test 3: ブラウザに近いヘッダー
+    # ========================================
+    results.append("<h2>Test 3: 完全なブラウザヘッダー</h2>")
+    try:
+        start = time.time()
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+            'Accept-Language': 'ja,en-US;q=0.9,en;q=0.8',
+            'Accept-Encoding': 'gzip, deflate, br',
+            'Connection': 'keep-alive',
+            'Upgrade-Insecure-Requests': '1'
+        }
+        response = requests.get(
+            'https://salonboard.com/login/',
+            headers=headers,
+            timeout=180,  # ← 120秒から60秒に変更
+            allow_redirects=True
+        )
+        elapsed = time.time() - start
+        results.append(f"✅ <strong>成功</strong>")
+        results.append(f"   ステータスコード: {response.status_code}")
+        results.append(f"   所要時間: {elapsed:.3f}秒")
+        results.append(f"   レスポンスサイズ: {len(response.content)} bytes")
+        results.append(f"   Content-Type: {response.headers.get('Content-Type', 'N/A')}")
+        results.append(f"   Server: {response.headers.get('Server', 'N/A')}")
+    except requests.exceptions.Timeout:
+        elapsed = time.time() - start
+        results.append(f"❌ <strong>失敗</strong>: タイムアウト（60秒）")
+        results.append(f"   実際の経過時間: {elapsed:.3f}秒")
+    except Exception as e:
+        results.append(f"❌ <strong>失敗</strong>: {str(e)}")
+    
+    # ========================================
+    # Test 4: セッション使用（Cookie保持）
+    # ========================================
+    results.append("<h2>Test 4: セッション使用</h2>")
+    try:
+        start = time.time()
+        session = requests.Session()
+        session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+        })
+        response = session.get(
+            'https://salonboard.com/login/',
+            timeout=180,  # ← 120秒から60秒に変更
+            allow_redirects=True
+        )
+        elapsed = time.time() - start
+        results.append(f"✅ <strong>成功</strong>")
+        results.append(f"   ステータスコード: {response.status_code}")
+        results.append(f"   所要時間: {elapsed:.3f}秒")
+        results.append(f"   Cookie数: {len(response.cookies)}")
+        results.append(f"   リダイレクト回数: {len(response.history)}")
+    except requests.exceptions.Timeout:
+        elapsed = time.time() - start
+        results.append(f"❌ <strong>失敗</strong>: タイムアウト（60秒）")
+        results.append(f"   実際の経過時間: {elapsed:.3f}秒")
+    except Exception as e:
+        results.append(f"❌ <strong>失敗</strong>: {str(e)}")
+    
+    # ========================================
+    # 結論
+    # ========================================
+    results.append("<hr>")
+    results.append("<h2>📊 診断結果</h2>")
+    results.append("<p>どのテストが成功したかで、問題の原因を特定できます</p>")
+    results.append("<ul>")
+    results.append("<li>すべて失敗 → SALON BOARDサーバー側の問題</li>")
+    results.append("<li>User-Agent追加で成功 → Bot検出の可能性</li>")
+    results.append("<li>完全ヘッダーで成功 → ヘッダー不足</li>")
+    results.append("<li>セッション使用で成功 → Cookie/セッション管理の問題</li>")
+    results.append("</ul>")
+    
+    return f"""
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <title>HTTP詳細診断テスト</title>
+        <style>
+            body {{
+                font-family: Arial, sans-serif;
+                padding: 20px;
+                max-width: 900px;
+                margin: 0 auto;
+                background-color: #f5f5f5;
+            }}
+            h1 {{
+                color: #333;
+                border-bottom: 3px solid #007bff;
+                padding-bottom: 10px;
+            }}
+            h2 {{
+                color: #007bff;
+                margin-top: 30px;
+                border-left: 5px solid #007bff;
+                padding-left: 10px;
+            }}
+            .result {{
+                background-color: white;
+                padding: 20px;
+                border-radius: 8px;
+                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+                margin-bottom: 20px;
+            }}
+            a {{
+                display: inline-block;
+                margin-top: 20px;
+                padding: 10px 20px;
+                background-color: #007bff;
+                color: white;
+                text-decoration: none;
+                border-radius: 5px;
+            }}
+            a:hover {{
+                background-color: #0056b3;
+            }}
+        </style>
+    </head>
+    <body>
+        <h1>HTTP詳細診断テスト</h1>
+        <p>様々な方法でHTTPリクエストを試します（各テスト最大60秒）</p>
+        <div class="result">
+            {''.join(results)}
+        </div>
+        <a href="/admin">← 管理画面に戻る</a>
+    </body>
+    </html>
+    """
+
+
+@bp.route('/test_salonboard_login', methods=['GET'])
+def test_salonboard_login():
+    """SALONBOARD ログインテスト（Firefox使用）"""
+    from playwright.sync_api import sync_playwright
+    import re
+    
+    try:
+        login_id = os.getenv('SALONBOARD_LOGIN_ID')
+        password = os.getenv('SALONBOARD_LOGIN_PASSWORD')
+        
+        if not login_id or not password:
+            return jsonify({
+                'success': False,
+                'error': '環境変数が設定されていません'
+            }), 500
+        
+        with sync_playwright() as p:
+            browser = p.firefox.launch(headless=True, args=["--no-sandbox", "--disable-dev-shm-usage"])
+            page = browser.new_page()
+            page.set_default_timeout(30000)
+            
+            page.goto('https://salonboard.com/login/')
+            page.wait_for_selector('input[name="userId"]', timeout=20000)
+            page.fill('input[name="userId"]', login_id)
+            page.fill('input[name="password"]', password)
+            page.press('input[name="password"]', 'Enter')
+            page.wait_for_url('**/KLP/**', timeout=20000)
+            
+            final_url = page.url
+            success = '/KLP/' in final_url
+            
+            browser.close()
+            
+            return jsonify({
+                'success': success,
+                'message': 'ログイン成功' if success else 'ログイン失敗',
+                'final_url': final_url,
+                'browser': 'firefox',
+                'timestamp': datetime.now().isoformat()
+            })
+            
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'error_type': type(e).__name__,
+            'timestamp': datetime.now().isoformat()
+        }), 500
+
+
+# グローバル変数
+login_results = {}
+
+
+login_lock = threading.Lock()
+
+
+@bp.route('/test_async', methods=['GET'])
+def test_async():
+    """subprocess版非同期ログインテスト"""
+    import subprocess
+    task_id = datetime.now().strftime('%Y%m%d%H%M%S%f')
+    
+    def bg_login():
+        try:
+            print(f"[SUBPROCESS] タスク開始: {task_id}", flush=True)
+            
+            # 完全に独立したプロセスとして実行（180秒タイムアウト）
+            result = subprocess.run(
+                ['python3', 'salonboard_login.py', task_id],
+                capture_output=True,
+                text=True,
+                timeout=180,
+                env=os.environ.copy()
+            )
+            
+            print(f"[SUBPROCESS] stdout: {result.stdout}", flush=True)
+            print(f"[SUBPROCESS] stderr: {result.stderr}", flush=True)
+            
+            # 結果ファイルから読み込み
+            result_file = f"/tmp/login_result_{task_id}.json"
+            if os.path.exists(result_file):
+                with open(result_file, 'r') as f:
+                    result_data = json.load(f)
+                with login_lock:
+                    login_results[task_id] = result_data
+                os.remove(result_file)
+            else:
+                with login_lock:
+                    login_results[task_id] = {
+                        'success': False,
+                        'error': 'Result file not found',
+                        'stdout': result.stdout,
+                        'stderr': result.stderr
+                    }
+                    
+        except subprocess.TimeoutExpired:
+            print(f"[SUBPROCESS] タイムアウト（180秒）: {task_id}", flush=True)
+            with login_lock:
+                login_results[task_id] = {
+                    'success': False,
+                    'error': 'Subprocess timeout after 180 seconds',
+                    'error_type': 'TimeoutExpired'
+                }
+        except Exception as e:
+            print(f"[SUBPROCESS] エラー: {str(e)}", flush=True)
+            with login_lock:
+                login_results[task_id] = {
+                    'success': False,
+                    'error': str(e),
+                    'error_type': type(e).__name__
+                }
+    
+    threading.Thread(target=bg_login, daemon=True).start()
+    return jsonify({
+        'status': 'processing',
+        'task_id': task_id,
+        'check_url': f'/result/{task_id}',
+        'message': 'subprocess版ログイン処理を開始しました（タイムアウト180秒）'
+    }), 202
+
+
+@bp.route('/result/<task_id>', methods=['GET'])
+def get_result(task_id):
+    """結果確認"""
+    with login_lock:
+        return jsonify(login_results.get(task_id, {'status': 'processing'}))
+
+
+@bp.route('/debug/check_files', methods=['GET'])
+
+@bp.route('/debug/check_files', methods=['GET'])
+def debug_check_files():
+    """Dockerコンテナ内のファイル確認"""
+    import subprocess
+    import os
+    
+    checks = {}
+    
+    # 1. カレントディレクトリ
+    checks['current_dir'] = os.getcwd()
+    
+    # 2. salonboard_login.py存在確認
+    checks['salonboard_login_exists'] = os.path.exists('salonboard_login.py')
+    checks['salonboard_login_path'] = os.path.abspath('salonboard_login.py') if checks['salonboard_login_exists'] else None
+    
+    # 3. 実行権限確認
+    if checks['salonboard_login_exists']:
+        checks['salonboard_login_executable'] = os.access('salonboard_login.py', os.X_OK)
+        checks['salonboard_login_size'] = os.path.getsize('salonboard_login.py')
+    
+    # 4. /app ディレクトリ内容
+    try:
+        checks['app_dir_contents'] = subprocess.run(['ls', '-la', '/app'], capture_output=True, text=True, timeout=5).stdout
+    except:
+        checks['app_dir_contents'] = 'ERROR'
+    
+    # 5. Python実行確認
+    try:
+        checks['python3_version'] = subprocess.run(['python3', '--version'], capture_output=True, text=True, timeout=5).stdout
+    except:
+        checks['python3_version'] = 'ERROR'
+    
+    # 6. /tmpへの書き込み確認
+    try:
+        test_file = '/tmp/test_write.txt'
+        with open(test_file, 'w') as f:
+            f.write('test')
+        checks['tmp_writable'] = os.path.exists(test_file)
+        os.remove(test_file)
+    except:
+        checks['tmp_writable'] = False
+    
+    # 7. 環境変数確認
+    checks['env_salonboard_id'] = bool(os.getenv('SALONBOARD_LOGIN_ID'))
+    checks['env_salonboard_pwd'] = bool(os.getenv('SALONBOARD_LOGIN_PASSWORD'))
+    
+    # 8. メモリ情報
+    try:
+        checks['memory_info'] = subprocess.run(['free', '-h'], capture_output=True, text=True, timeout=5).stdout
+    except:
+        checks['memory_info'] = 'ERROR'
+    
+    # 9. Playwrightブラウザ確認
+    try:
+        checks['playwright_browsers'] = subprocess.run(['ls', '-la', '/ms-playwright'], capture_output=True, text=True, timeout=5).stdout
+    except:
+        checks['playwright_browsers'] = 'ERROR'
+    
+    # 10. salonboard_login.pyの内容（最初の50行）
+    if checks['salonboard_login_exists']:
+        try:
+            with open('salonboard_login.py', 'r') as f:
+                checks['salonboard_login_content'] = ''.join(f.readlines()[:50])
+        except:
+            checks['salonboard_login_content'] = 'ERROR'
+    
+    return jsonify(checks), 200
+
+
+@bp.route('/debug/test_subprocess', methods=['GET'])
+def debug_test_subprocess():
+    """subprocessテスト"""
+    import subprocess
+    
+    results = {}
+    
+    # 1. 単純なコマンド
+    try:
+        result = subprocess.run(['echo', 'test'], capture_output=True, text=True, timeout=5)
+        results['echo_test'] = {'stdout': result.stdout, 'stderr': result.stderr, 'returncode': result.returncode}
+    except Exception as e:
+        results['echo_test'] = {'error': str(e)}
+    
+    # 2. python3テスト
+    try:
+        result = subprocess.run(['python3', '-c', 'print("hello")'], capture_output=True, text=True, timeout=5)
+        results['python3_test'] = {'stdout': result.stdout, 'stderr': result.stderr, 'returncode': result.returncode}
+    except Exception as e:
+        results['python3_test'] = {'error': str(e)}
+    
+    # 3. salonboard_login.py実行テスト（短時間）
+    try:
+        result = subprocess.run(
+            ['python3', 'salonboard_login.py', 'test_debug'],
+            capture_output=True,
+            text=True,
+            timeout=10,
+            env=os.environ.copy()
+        )
+        results['salonboard_login_test'] = {
+            'stdout': result.stdout[:1000],
+            'stderr': result.stderr[:1000],
+            'returncode': result.returncode
+        }
+    except subprocess.TimeoutExpired:
+        results['salonboard_login_test'] = {'error': 'Timeout after 10 seconds'}
+    except Exception as e:
+        results['salonboard_login_test'] = {'error': str(e), 'type': type(e).__name__}
+    
+    return jsonify(results), 200
+
+
+@bp.route('/debug/test_playwright_import', methods=['GET'])
+def debug_test_playwright_import():
+    """Playwrightインポートテスト"""
+    import subprocess
+    
+    try:
+        result = subprocess.run(
+            ['python3', 'test_playwright_import.py'],
+            capture_output=True,
+            text=True,
+            timeout=300,
+            env=os.environ.copy()
+        )
+        
+        return jsonify({
+            'success': True,
+            'stdout': result.stdout,
+            'stderr': result.stderr,
+            'returncode': result.returncode
+        }), 200
+        
+    except subprocess.TimeoutExpired as e:
+        return jsonify({
+            'success': False,
+            'error': 'Timeout after 60 seconds',
+            'stdout': e.stdout.decode() if e.stdout else '',
+            'stderr': e.stderr.decode() if e.stderr else ''
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'error_type': type(e).__name__
+        }), 500
+
+
+@bp.route('/debug/test_salonboard_direct', methods=['GET'])
+def debug_test_salonboard_direct():
+    """salonboard_login.pyを直接実行"""
+    import subprocess
+    
+    try:
+        result = subprocess.run(
+            ['python3', 'salonboard_login.py', 'test_render_debug'],
+            capture_output=True,
+            text=True,
+            timeout=300,
+            env=os.environ.copy()
+        )
+        
+        return jsonify({
+            'success': True,
+            'stdout': result.stdout,
+            'stderr': result.stderr,
+            'returncode': result.returncode
+        }), 200
+        
+    except subprocess.TimeoutExpired as e:
+        return jsonify({
+            'success': False,
+            'error': 'Timeout after 60 seconds',
+            'stdout': e.stdout.decode() if e.stdout else '',
+            'stderr': e.stderr.decode() if e.stderr else ''
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'error_type': type(e).__name__
+        }), 500
+
+
+@bp.route('/api/scrape_daily_test', methods=['GET', 'POST'])
+def scrape_daily_test():
+    """テスト用：スクレイピングのみ、LINE送信なし"""
+    try:
+        import subprocess
+        
+        result = subprocess.run(
+            ['python3', 'scrape_and_upload.py'],
+            capture_output=True,
+            text=True,
+            timeout=300
+        )
+        
+        return jsonify({
+            "success": True,
+            "scrape_stdout": result.stdout,
+            "scrape_stderr": result.stderr,
+            "scrape_returncode": result.returncode,
+            "note": "テストモード：LINE送信はスキップされました"
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@bp.route('/api/reminder_test_3days', methods=['GET'])
+def api_reminder_test_3days():
+    """3日後の予約でリマインドテスト（全員分を神原良祐に送信）"""
+    KAMBARA_LINE_ID = "U9022782f05526cf7632902acaed0cb08"
+    results = send_reminder_notifications(test_mode=False, target_days=[3], force_recipient=KAMBARA_LINE_ID)
+    return jsonify({"success": True, "results": results})
+
+
+@bp.route('/api/reminder_test_7days', methods=['GET'])
+def api_reminder_test_7days():
+    """7日後の予約でリマインドテスト（全員分を神原良祐に送信）"""
+    KAMBARA_LINE_ID = "U9022782f05526cf7632902acaed0cb08"
+    results = send_reminder_notifications(test_mode=False, target_days=[7], force_recipient=KAMBARA_LINE_ID)
+    return jsonify({"success": True, "results": results})
+
+
+@bp.route('/api/reminder_test', methods=['GET'])
+def api_reminder_test():
+    """リマインド送信テスト（神原良祐のみ、スクレイピングなし）"""
+    results = send_reminder_notifications(test_mode=True)
+    return jsonify({"success": True, "results": results})
+
+
+@bp.route('/api/reminder_dry_run', methods=['GET'])
+def api_reminder_dry_run():
+    """送信せずにリマインドの送信計画と所要時間を返す（?days=3,7&test_mode=0）"""
+    days = [int(d) for d in request.args.get('days', '3,7').split(',') if d.strip().isdigit()]
+    test_mode = request.args.get('test_mode', '1') != '0'
+    return jsonify({"success": True, **send_reminder_notifications(test_mode=test_mode, target_days=days or None, dry_run=True)})
+
+
+@bp.route('/api/scrape_test_1day', methods=['GET', 'POST'])
+def scrape_test_1day():
+    """テスト用：1日分のみスクレイピング"""
+    from datetime import datetime, timedelta, timezone
+    from playwright.sync_api import sync_playwright
+    import re
+    import json
+    import re
+    
+    JST = timezone(timedelta(hours=9))
+    today = datetime.now(JST)
+    target_date = today + timedelta(days=3)  # 3日後
+    date_str = target_date.strftime("%Y%m%d")
+    
+    results = {"date": target_date.strftime("%Y-%m-%d"), "bookings": [], "error": None}
+    
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=False)
+            context = browser.new_context()
+            
+            cookie_file = COOKIE_FILE
+            if os.path.exists(cookie_file):
+                with open(cookie_file, 'r') as f:
+                    cookies = json.load(f)
+                    context.add_cookies(cookies)
+            
+            page = context.new_page()
+            url = f"https://salonboard.com/KLP/reserve/reserveList/?search_date={date_str}"
+            
+            page.goto(url, timeout=30000, wait_until="domcontentloaded")
+            page.wait_for_timeout(3000)
+            
+            if 'login' in page.url.lower():
+                results["error"] = "ログイン必要（クッキー期限切れ）"
+            else:
+                rows = page.query_selector_all('tr.rsv')
+                for row in rows:
+                    try:
+                        time_el = row.query_selector('td.time')
+                        name_el = row.query_selector('td.name a')
+                        results["bookings"].append({
+                            "time": time_el.inner_text().strip() if time_el else '',
+                            "name": name_el.inner_text().strip() if name_el else ''
+                        })
+                    except:
+                        continue
+                
+                results["total"] = len(results["bookings"])
+            
+            browser.close()
+    
+    except Exception as e:
+        results["error"] = str(e)
+    
+    return jsonify(results)
+
+
+@bp.route('/api/scrape_test_1day_v2', methods=['GET', 'POST'])
+def scrape_test_1day_v2():
+    """テスト用：1日分のみ（タイムアウト延長）"""
+    from datetime import datetime, timedelta, timezone
+    from playwright.sync_api import sync_playwright
+    import re
+    import json
+    
+    JST = timezone(timedelta(hours=9))
+    today = datetime.now(JST)
+    target_date = today + timedelta(days=3)
+    date_str = target_date.strftime("%Y%m%d")
+    
+    results = {"date": target_date.strftime("%Y-%m-%d"), "bookings": [], "error": None, "url": None}
+    
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=False)
+            context = browser.new_context()
+            
+            cookie_file = COOKIE_FILE
+            if os.path.exists(cookie_file):
+                with open(cookie_file, 'r') as f:
+                    cookies = json.load(f)
+                    context.add_cookies(cookies)
+            
+            page = context.new_page()
+            
+            # まずトップページ
+            page.goto("https://salonboard.com/", timeout=60000, wait_until="domcontentloaded")
+            page.wait_for_timeout(2000)
+            
+            # 予約ページ
+            url = f"https://salonboard.com/KLP/reserve/reserveList/?search_date={date_str}"
+            results["url"] = url
+            
+            page.goto(url, timeout=90000, wait_until="domcontentloaded")
+            page.wait_for_timeout(3000)
+            
+            results["current_url"] = page.url
+            
+            if 'login' in page.url.lower():
+                results["error"] = "ログイン必要"
+            else:
+                # ページタイトル取得
+                results["title"] = page.title()
+                
+                # 予約行を取得
+                rows = page.query_selector_all('tr.rsv')
+                results["row_count"] = len(rows)
+                
+                for row in rows[:5]:  # 最初の5件のみ
+                    try:
+                        time_el = row.query_selector('td.time')
+                        name_el = row.query_selector('td.name a')
+                        results["bookings"].append({
+                            "time": time_el.inner_text().strip() if time_el else '',
+                            "name": name_el.inner_text().strip() if name_el else ''
+                        })
+                    except:
+                        continue
+            
+            browser.close()
+    
+    except Exception as e:
+        results["error"] = str(e)
+    
+    return jsonify(results)
@@ -0,0 +1,422 @@
+"""LIFF予約画面とそのAPI（登録・予約確認・空き枠・キャンセル／日時変更）"""
+import json
+
+from flask import Blueprint, jsonify, make_response, render_template, request
+
+from utils.customer_index import load_customer_index
+from utils.menu_index import IndexByEtag
+from utils.salonboard_tasks import browser_pool, slot_refresh_queue, task_queue
+from utils.slot_engine import bookable_starts
+from utils.slot_store import in_scrape_window, slot_store, is_stale as is_slot_stale
+from utils.supabase_client import supabase
+from utils.table_cache import table_cache, cached_select, make_etag
+
+bp = Blueprint('liff', __name__)
+
+
+# ========== LIFF予約確認画面 ==========
+@bp.route('/liff/booking')
+def liff_booking():
+    """LIFF予約確認画面"""
+    liff_id = "2006629229-Y8lb2daA"
+    return render_template('liff_booking.html', liff_id=liff_id)
+
+
+@bp.route('/api/liff/check-registration')
+def api_liff_check_registration():
+    """LINE IDで電話番号登録状況を確認"""
+    line_user_id = request.args.get('line_user_id')
+    
+    if not line_user_id:
+        return jsonify({'registered': False})
+    
+    res = supabase.get(f'customers?line_user_id=eq.{line_user_id}&select=phone')
+    customers = res.json()
+    
+    if customers and customers[0].get('phone'):
+        return jsonify({'registered': True, 'phone': customers[0]['phone']})
+    else:
+        return jsonify({'registered': False})
+
+
+@bp.route('/api/liff/register-phone', methods=['POST'])
+def api_liff_register_phone():
+    """電話番号をLINE IDと紐付け"""
+    data = request.json
+    line_user_id = data.get('line_user_id')
+    phone = data.get('phone', '').replace('-', '').replace(' ', '')
+    
+    if not line_user_id or not phone:
+        return jsonify({'success': False, 'message': '入力が不正です'})
+    
+    # LINE IDで既存顧客を検索
+    res = supabase.get(f'customers?line_user_id=eq.{line_user_id}&select=id')
+    customers_by_line = res.json()
+    
+    # 電話番号で既存顧客を検索（重複防止）
+    res_phone = supabase.get(f'customers?phone=eq.{phone}&select=id,line_user_id')
+    customers_by_phone = res_phone.json()
+    
+    if customers_by_line:
+        # LINE IDで見つかった → 電話番号を更新
+        supabase.update('customers', f'line_user_id=eq.{line_user_id}', {'phone': phone})
+    elif customers_by_phone:
+        # 電話番号で見つかった → LINE IDを更新（未設定の場合のみ）
+        existing = customers_by_phone[0]
+        if not existing.get('line_user_id'):
+            supabase.update('customers', f"id=eq.{existing['id']}", {'line_user_id': line_user_id})
+        # 既にLINE IDがある場合は何もしない（別人）
+    else:
+        # 電話番号で8weeks_bookingsから名前を取得
+        index = load_customer_index()
+        booking = index.booking_by_phone(phone) if index else None
+        if booking is None:
+            # インデックス読み込み後に入った予約かもしれないので電話番号で直接確認
+            booking_res = supabase.get(f'8weeks_bookings?phone=eq.{phone}&select=customer_name&limit=1')
+            if booking_res.status_code == 200 and booking_res.json():
+                booking = booking_res.json()[0]
+        name_from_booking = booking.get('customer_name') if booking else None
+        
+        # 新規顧客として登録
+        new_customer = {'line_user_id': line_user_id, 'phone': phone}
+        if name_from_booking:
+            new_customer['name'] = name_from_booking
+        supabase.insert('customers', new_customer)
+    
+    table_cache.invalidate('customers')
+    return jsonify({'success': True})
+
+
+@bp.route('/api/liff/unlink', methods=['POST'])
+def api_liff_unlink():
+    """LINE IDと電話番号の紐付けを解除"""
+    data = request.json
+    line_user_id = data.get('line_user_id')
+    
+    if not line_user_id:
+        return jsonify({'success': False, 'message': 'line_user_id required'})
+    
+    supabase.update('customers', f'line_user_id=eq.{line_user_id}', {'line_user_id': None})
+    table_cache.invalidate('customers')
+    
+    return jsonify({'success': True})
+
+
+@bp.route('/api/liff/bookings-by-phone')
+def api_liff_bookings_by_phone():
+    """電話番号で予約を検索（8weeks_bookingsテーブル）"""
+    from datetime import datetime, timedelta, timezone
+    
+    phone = request.args.get('phone', '').replace('-', '').replace(' ', '')
+    
+    if not phone:
+        return jsonify({'bookings': []})
+    
+    # 8weeks_bookingsテーブルで電話番号検索
+    res = supabase.get(f'8weeks_bookings?phone=eq.{phone}&select=booking_id,visit_datetime,customer_name,menu,staff&order=visit_datetime.asc')
+    all_bookings = res.json()
+    
+    # 今日以降のみフィルタ（Python側）
+    JST = timezone(timedelta(hours=9))
+    today = datetime.now(JST).strftime('%Y-%m-%d')
+    
+    bookings = [b for b in all_bookings if b.get('visit_datetime', '') >= today]
+    
+    # 次回予約フラグを追加（clean_menu前に判定）
+    for b in bookings:
+        b['is_next_booking'] = '【次回】' in (b.get('menu') or '')
+    
+    # メニュークリーンアップ
+    def clean_menu(m):
+        import re
+        if not m:
+            return ''
+        has_off_shampoo = 'オフあり+アイシャンプー' in m or 'オフあり＋アイシャンプー' in m
+        exclude = ['【全員】', '【次回】', '【リピーター様】', '【4週間以内】', '【ご新規】',
+            'オフあり+アイシャンプー', 'オフあり＋アイシャンプー', '次世代まつ毛パーマ', 'ダメージレス',
+            '(4週間以内 )', '(4週間以内)', '(アイシャンプー・トリートメント付き)', '(アイシャンプー・トリートメント付)', '(SP・TR付)',
+            '(まゆげパーマ)', '(眉毛Wax)', '＋メイク付', '+メイク付',
+            '指名料', 'カラー変更', '束感★']
+        for w in exclude:
+            m = m.replace(w, '')
+        m = re.sub(r'\(ｸｰﾎﾟﾝ\)', '', m)
+        m = re.sub(r'《[^》]*》', '', m)
+        m = re.sub(r'【[^】]*】', '', m)
+        m = re.sub(r'\s*/\s*', ' ', m)  # 「 / 」をスペースに置換
+        m = re.sub(r'◇エクステ.*', '', m)
+        m = re.sub(r'◇毛量調整.*', '', m)
+        m = re.sub(r'[¥￥][0-9,]+', '', m)
+        m = re.sub(r'^◇', '', m)
+        m = re.sub(r'◇$', '', m)
+        m = re.sub(r'◇\s*$', '', m)
+        parts = m.split('◇')
+        cleaned = [p.strip().strip('　') for p in parts if p.strip()]
+        m = '＋'.join(cleaned) if cleaned else ''
+        m = re.sub(r'\s+', ' ', m).strip()
+        if has_off_shampoo and m:
+            m = f'{m}（オフあり+アイシャンプー）'
+        return m
+    
+    for b in bookings:
+        b['menu'] = clean_menu(b.get('menu', ''))
+        # 日時変更フローで使う施術時間（menu-durationへの追加リクエストを省く）
+        b['duration'] = menu_duration_for(b['menu'])
+    
+    return jsonify({'bookings': bookings})
+
+
+@bp.route('/api/liff/change-request', methods=['POST'])
+def api_liff_change_request():
+    """日時変更リクエスト"""
+    data = request.get_json()
+    booking_id = data.get('booking_id')
+    line_user_id = data.get('line_user_id')
+    
+    print(f"[変更リクエスト] booking_id={booking_id}, line_user_id={line_user_id}")
+    
+    return jsonify({'success': True, 'message': '変更リクエストを受け付けました。サロンからご連絡いたします。'})
+
+
+@bp.route('/api/liff/cancel-request', methods=['POST'])
+def api_liff_cancel_request():
+    """予約キャンセルを非同期で実行（バックグラウンドスレッド）"""
+    data = request.get_json()
+    booking_id = data.get('booking_id')
+    line_user_id = data.get('line_user_id') or ''
+    
+    if not booking_id:
+        return jsonify({'success': False, 'message': '予約IDが必要です'}), 400
+    
+    # タスクキューに登録（ワーカーが常駐ブラウザプールで実行、スクレイピングより優先）
+    task_id, _ = task_queue.enqueue('cancel_booking', {'booking_id': booking_id, 'line_user_id': line_user_id},
+                                    dedupe_key=f'cancel_booking:{booking_id}')
+    print(f'[API] キャンセル処理登録: booking_id={booking_id} task=#{task_id}', flush=True)
+    
+    return jsonify({'success': True, 'task_id': task_id,
+                    'message': 'キャンセル処理を開始しました。完了後LINEでお知らせします。'})
+
+
+def api_liff_get_duration():
+    """SalonBoardから予約の所要時間を取得"""
+    data = request.get_json()
+    booking_id = data.get("booking_id")
+    
+    if not booking_id:
+        return jsonify({"error": "booking_id required"}), 400
+    
+    def read_duration(page):
+        url = f"https://salonboard.com/KLP/reserve/ext/extReserveChange/?reserveId={booking_id}"
+        page.goto(url, timeout=60000)
+        page.wait_for_timeout(3000)
+        hour_select = page.query_selector("#jsiRsvTermHour")
+        min_select = page.query_selector("#jsiRsvTermMin")
+        duration = 60
+        if hour_select and min_select:
+            hour_val = hour_select.evaluate("el => el.value")
+            min_val = min_select.evaluate("el => el.value")
+            duration = int(hour_val) + int(min_val)
+        return duration
+    
+    try:
+        return jsonify({"duration": browser_pool.run(read_duration, timeout=120, label='duration')})
+    except Exception as e:
+        return jsonify({"error": str(e), "duration": 60}), 200
+
+
+@bp.route('/api/liff/execute-change', methods=['POST'])
+def api_liff_execute_change():
+    """予約日時変更（タスクキューに登録して非同期実行）"""
+    data = request.get_json()
+    booking_id = data.get('booking_id')
+    new_date = data.get('new_date')
+    new_time = data.get('new_time')
+    line_user_id = data.get('line_user_id')
+    
+    if not all([booking_id, new_date, new_time]):
+        return jsonify({'error': 'booking_id, new_date, new_time required'}), 400
+    
+    task_id, _ = task_queue.enqueue(
+        'change_booking',
+        {'booking_id': booking_id, 'new_date': new_date, 'new_time': new_time, 'line_user_id': line_user_id},
+        dedupe_key=f'change_booking:{booking_id}:{new_date}:{new_time}')
+    
+    return jsonify({'success': True, 'task_id': task_id,
+                    'message': '変更リクエストを受け付けました。完了後LINEでお知らせします。'})
+
+
+def etag_response(payload, etag):
+    """ETag付きJSONを返す（If-None-Match一致なら304）"""
+    response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+def get_salonboard_menus_cached():
+    """salonboard_menus（id,name,duration,price）をキャッシュ経由で取得"""
+    return cached_select('salonboard_menus', 'salonboard_menus?select=id,name,duration,price&order=id.asc')
+
+
+# salonboard_menus の照合インデックス（キャッシュのETagが変わったら再構築）
+salonboard_menu_index = IndexByEtag()
+
+
+def menu_duration_for(menu_name, default=60):
+    """メニュー名から施術時間（分）を取得"""
+    index = salonboard_menu_index.get(get_salonboard_menus_cached())
+    return index.duration_for(menu_name, default) if index else default
+
+
+# === メニュー取得API ===
+@bp.route('/api/liff/menus', methods=['GET'])
+def api_liff_menus():
+    """salon_menusテーブルからメニュー一覧を取得"""
+    try:
+        entry = cached_select('salon_menus', 'salon_menus?select=id,name,price&order=id.asc')
+        if entry is not None:
+            return etag_response({'success': True, 'menus': entry.value}, entry.etag)
+        return jsonify({'success': False, 'message': 'メニュー取得失敗'}), 500
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@bp.route('/api/liff/menus-next', methods=['GET'])
+def api_liff_menus_next():
+    """salonboard_menusテーブルからメニュー一覧を取得（次回予約用）"""
+    try:
+        entry = get_salonboard_menus_cached()
+        if entry is not None:
+            return etag_response({'success': True, 'menus': entry.value}, entry.etag)
+        return jsonify({'success': False, 'message': 'メニュー取得失敗'}), 500
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@bp.route('/api/liff/staff-list', methods=['GET'])
+def api_liff_staff_list():
+    """スタッフ一覧を取得"""
+    try:
+        entry = cached_select('salon_staff:active', 'salon_staff?active=eq.true&select=id,name')
+        if entry is not None:
+            return etag_response({'success': True, 'staff': entry.value}, entry.etag)
+        return jsonify({'success': False, 'message': 'スタッフ取得失敗'}), 500
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@bp.route('/api/liff/staff-availability', methods=['GET'])
+def api_liff_staff_availability():
+    """スタッフ別の空き状況を取得"""
+    staff_name = request.args.get('staff', '')
+    
+    if not staff_name:
+        return jsonify({'success': False, 'message': 'スタッフ名が必要です'})
+    
+    try:
+        # 該当スタッフの予約を取得
+        res = supabase.get(f'8weeks_bookings?staff=like.*{staff_name}*&select=visit_datetime,customer_name,menu')
+        
+        bookings = res.json() if res.status_code == 200 else []
+        
+        # 日付ごとにグループ化
+        by_date = {}
+        for b in bookings:
+            date = b.get('visit_datetime', '')[:10]
+            if date not in by_date:
+                by_date[date] = []
+            by_date[date].append(b)
+        
+        return jsonify({'success': True, 'bookings': bookings, 'by_date': by_date})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@bp.route('/api/liff/menu-duration', methods=['GET'])
+def api_liff_menu_duration():
+    """メニュー名から施術時間を取得（部分一致）"""
+    menu_name = request.args.get('menu', '')
+    
+    if not menu_name:
+        return jsonify({'success': False, 'message': 'メニュー名が必要です'})
+    
+    try:
+        entry = get_salonboard_menus_cached()
+        if entry is None:
+            return jsonify({'success': False, 'message': 'メニュー取得失敗', 'duration': 60})
+        etag = make_etag([entry.etag, menu_name])
+        
+        # 部分一致 → キーワードの順で検索（インデックスはメニュー更新時のみ再構築）
+        m = salonboard_menu_index.get(entry).match(menu_name)
+        if m:
+            return etag_response({'success': True, 'duration': m['duration'], 'matched_menu': m['name']}, etag)
+        
+        return etag_response({'success': False, 'message': 'マッチするメニューが見つかりません', 'duration': 60}, etag)
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e), 'duration': 60})
+
+
+# === 空き枠取得API ===
+@bp.route('/api/liff/available-slots-range', methods=['GET'])
+def api_liff_available_slots_range():
+    """56日分の空き枠（8週間）を日付別の事前生成JSONから返す（ETag対応）
+    ?duration=分 を付けると、その施術時間で開始できる時刻だけを日付ごとに返す"""
+    duration = request.args.get('duration', type=int)
+    if duration is not None and not 0 < duration <= 600:
+        return jsonify({'error': 'invalid duration'}), 400
+    try:
+        if duration:
+            body, version = slot_store.range_starts(duration)
+        else:
+            body, version = slot_store.range_body()
+        if body is None:
+            return jsonify({'error': 'Database error'}), 500
+        
+        response = make_response(body)
+        response.mimetype = 'application/json'
+        response.set_etag(version)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+        
+    except Exception as e:
+        print(f'[空き枠取得エラー] {e}')
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/liff/available-slots', methods=['GET'])
+def api_liff_available_slots():
+    """指定日のスタッフ空き枠を取得（available_slotsから。古ければ裏で再取得を登録）"""
+    import re
+    
+    date_str = request.args.get('date')  # YYYYMMDD形式
+    
+    if not date_str or not re.fullmatch(r'\d{8}', date_str):
+        return jsonify({'error': 'date parameter required'}), 400
+    
+    try:
+        blob = slot_store.day(date_str)
+        if blob is None:
+            return jsonify({'error': 'Database error'}), 500
+        
+        stale = is_slot_stale(blob)
+        # 過去・56日より先の日付はスクレイピングでも埋まらないので再取得を登録しない
+        if stale and in_scrape_window(date_str):
+            # リクエスト内ではブラウザを起動しない（キューのワーカーが別プロセスで取得）
+            slot_refresh_queue.enqueue(date_str)
+        
+        data = json.loads(blob['json'])
+        result = {
+            'date': date_str,
+            'staff_schedules': data['staff_schedules'],
+            'updated_at': blob['updated_at'],
+            'stale': stale,
+            'refreshing': slot_refresh_queue.state(date_str)
+        }
+        duration = request.args.get('duration', type=int)
+        if duration and 0 < duration <= 600:
+            result['starts'] = bookable_starts(blob['masks'], duration)
+        return jsonify(result)
+    except Exception as e:
+        print(f'[空き枠取得エラー] {e}')
+        return jsonify({'error': str(e)}), 500
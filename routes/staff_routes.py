@@ -1,32 +1,127 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session
-from utils.auth import login_required
-from utils.line_sender import send_line_message
-from models.data_handler import load_mapping, save_absence, load_messages
+"""ログイン・スタッフの欠勤申請画面"""
+import os
 from datetime import datetime
 
-bp = Blueprint('staff_routes', __name__)
+from flask import Blueprint, redirect, render_template, request, session, url_for
 
-@bp.route('/staff/absence', methods=['GET', 'POST'])
+from models.data_handler import absence_store, load_messages, save_absence
+from utils.auth import ADMIN_USERS, STAFF_USERS, get_full_name, login_required
+from utils.line_sender import LINE_BOT_TOKEN_STAFF, queue_line_message, queue_line_multicast
+
+bp = Blueprint('staff', __name__)
+
+
+@bp.route('/')
+def index():
+    return redirect(url_for('staff.login_page'))
+
+
+@bp.route('/login', methods=['GET'])
+def login_page():
+    error = request.args.get('error')
+    return render_template('login.html', error=error)
+
+
+@bp.route('/login', methods=['POST'])
+def login_action():
+    username = request.form.get('username')
+    password = request.form.get('password')
+    
+    if username in ADMIN_USERS and ADMIN_USERS[username] == password:
+        session['logged_in'] = True
+        session['username'] = username
+        session['role'] = 'admin'
+        return redirect(url_for('admin.admin'))
+    
+    if username in STAFF_USERS and STAFF_USERS[username]['password'] == password:
+        session['logged_in'] = True
+        session['username'] = username
+        session['role'] = 'staff'
+        return redirect(url_for('staff.staff_absence'))
+    
+    return redirect(url_for('staff.login_page', error='IDまたはパスワードが正しくありません'))
+
+
+@bp.route('/logout')
+def logout():
+    session.clear()
+    return redirect(url_for('staff.login_page'))
+
+
+@bp.route('/staff/absence')
 @login_required
 def staff_absence():
-    user = session.get('user')
-    if request.method == 'POST':
-        staff_name = user['staff_id']
-        reason = request.form.get('reason')
-        details = request.form.get('details', '')
-        alternative_date = request.form.get('alternative_date', '')
-        absence_data = {"staff_name": staff_name, "reason": reason, "details": details, "alternative_date": alternative_date, "submitted_at": datetime.now().isoformat()}
-        save_absence(absence_data)
-        mapping = load_mapping()
-        messages = load_messages()
-        absence_message = messages['absence_confirmed'].format(reason=reason, details=details)
-        for customer_name, line_id in mapping.items():
-            if customer_name == staff_name:
-                send_line_message(line_id, absence_message)
-                break
-        request_message = messages['absence_request'].format(staff_name=user['full_name'])
-        for customer_name, line_id in mapping.items():
-            if customer_name != staff_name:
-                send_line_message(line_id, request_message)
-        return render_template('staff_absence.html', success=True, staff_name=user['full_name'])
-    return render_template('staff_absence.html', staff_name=user['full_name'])
+    if session.get('role') != 'staff':
+        return redirect(url_for('admin.admin'))
+    
+    return render_template('staff_absence.html')
+
+
+@bp.route('/confirm_absence', methods=['POST'])
+@login_required
+def confirm_absence():
+    if session.get('role') != 'staff':
+        return redirect(url_for('admin.admin'))
+    
+    reason = request.form.get('reason')
+    details = request.form.get('details')
+    alternative_date = request.form.get('alternative_date', '')
+    
+    return render_template('confirm_absence.html', reason=reason, details=details, alternative_date=alternative_date)
+
+
+@bp.route('/submit_absence', methods=['POST'])
+@login_required
+def submit_absence():
+    if session.get('role') != 'staff':
+        return redirect(url_for('admin.admin'))
+    
+    staff_name = session.get('username')
+    reason = request.form.get('reason')
+    details = request.form.get('details')
+    alternative_date = request.form.get('alternative_date', '')
+    
+    absence_date = request.form.get('absence_date', datetime.now().strftime("%Y-%m-%d"))
+    save_absence(staff_name, reason, details, alternative_date, absence_date)
+    
+    # メッセージを動的に読み込む
+    MESSAGES = load_messages()
+    
+    full_name = get_full_name(staff_name)
+    
+    # LINE通知はディスパッチャに登録するだけ（送信はワーカーが行う）
+    try:
+        LINE_USER_ID_HAL = os.getenv('LINE_USER_ID_HAL')
+        if LINE_USER_ID_HAL:
+            admin_message = f"【欠勤申請】\n{full_name}から欠勤申請がありました。\n\n欠勤日: {absence_date}\n理由: {reason}\n詳細: {details}\n\n管理画面で承認してください。\nhttps://salon-absence-system-production.up.railway.app/admin/absences"
+            queue_line_message(LINE_USER_ID_HAL, admin_message, LINE_BOT_TOKEN_STAFF)
+    
+        absence_message = MESSAGES["absence_request"].format(staff_name=full_name)
+        queue_line_multicast([info['line_id'] for username, info in STAFF_USERS.items() if username != staff_name],
+                             absence_message, LINE_BOT_TOKEN_STAFF)
+    
+        confirmation_message = MESSAGES["absence_confirmed"].format(reason=reason, details=details)
+        queue_line_message(STAFF_USERS[staff_name]['line_id'], confirmation_message, LINE_BOT_TOKEN_STAFF)
+    except Exception as e:
+        print(f"[LINE] 欠勤申請の通知登録エラー: {e}", flush=True)
+    
+    return redirect(url_for('staff.absence_success'))
+
+
+@bp.route('/absence/success')
+@login_required
+def absence_success():
+    return render_template('absence_success.html')
+
+
+@bp.route('/staff/my_absences')
+@login_required
+def staff_my_absences():
+    if session.get('role') != 'staff':
+        return redirect(url_for('admin.admin'))
+    
+    staff_name = session.get('username')
+    # 自分の申請のみ（新しい順）
+    my_absences = absence_store.list(staff_name=staff_name)
+    
+    return render_template('my_absences.html', my_absences=my_absences)
@@ -0,0 +1,168 @@
+"""LINE Webhook（顧客用・スタッフ用）"""
+import json
+import os
+import threading
+
+import requests
+from flask import Blueprint, jsonify, request
+
+from models.data_handler import clean_customer_name, load_mapping, load_messages, save_mapping
+from utils.auth import staff_mapping
+from utils.line_sender import LINE_BOT_TOKEN, LINE_BOT_TOKEN_STAFF, queue_line_multicast
+from utils.line_webhook import WebhookEventQueue, verify_signature
+from utils.supabase_client import supabase
+
+bp = Blueprint('webhook', __name__)
+
+
+# Webhook の署名検証用（未設定なら検証しない）
+LINE_CHANNEL_SECRET = os.getenv('LINE_CHANNEL_SECRET')
+
+
+def handle_line_event(event):
+    """Webhookイベント1件の処理（受信キューのワーカーから呼ばれる）"""
+    if event.get('type') != 'message':
+        return
+    # メッセージを動的に読み込む
+    MESSAGES = load_messages()
+
+    user_id = event['source']['userId']
+    text = event['message'].get('text')
+    staff_info = staff_mapping.get(user_id)
+
+    if staff_info:
+        if not text:
+            return
+        staff_name = staff_info['name']
+
+        others = [uid for uid in staff_mapping if uid != user_id]
+        if "欠勤" in text or "休み" in text:
+            msg = MESSAGES["absence_request"].format(staff_name=staff_name)
+            queue_line_multicast(others, msg)
+
+        elif "出勤" in text or "できます" in text:
+            notification = MESSAGES["substitute_confirmed"].format(substitute_name=staff_name)
+            queue_line_multicast(others, notification)
+
+    else:
+        # 何を送られても登録を試みる（上書きはsave_mapping内で防止）
+        cleaned_name = clean_customer_name(text) if text else None
+        if cleaned_name and len(cleaned_name) >= 2:
+            save_mapping(cleaned_name, user_id)
+        else:
+            # 名前として認識できない場合はLINE表示名で仮登録
+            try:
+                profile_url = f"https://api.line.me/v2/bot/profile/{user_id}"
+                profile_res = requests.get(profile_url, headers={'Authorization': f'Bearer {LINE_BOT_TOKEN}'}, timeout=10)
+                if profile_res.status_code == 200:
+                    display_name = profile_res.json().get('displayName', '不明')
+                    save_mapping(display_name, user_id)
+                    print(f"[LINE] LINE表示名で仮登録: {display_name}", flush=True)
+            except Exception as e:
+                print(f"[LINE] 仮登録エラー: {e}", flush=True)
+
+
+_line_webhook_queue = None
+_line_webhook_queue_lock = threading.Lock()
+
+
+def get_line_webhook_queue():
+    """受信キュー（初回呼び出し時に作成し、前回の未処理分を復元する。import 時には読み込まない）"""
+    global _line_webhook_queue
+    with _line_webhook_queue_lock:
+        if _line_webhook_queue is None:
+            _line_webhook_queue = WebhookEventQueue(handle_line_event)
+        return _line_webhook_queue
+
+
+@bp.route('/webhook/line', methods=['POST'])
+def webhook():
+    """署名を検証してイベントを受信キューに積み、すぐ200を返す（処理はワーカー）"""
+    body = request.get_data()
+    if LINE_CHANNEL_SECRET:
+        if not verify_signature(body, request.headers.get('X-Line-Signature'), LINE_CHANNEL_SECRET):
+            print("[WEBHOOK] 署名検証に失敗", flush=True)
+            return 'Invalid signature', 400
+    try:
+        events = json.loads(body or b'{}').get('events', [])
+    except ValueError:
+        return 'Bad request', 400
+    line_webhook_queue = get_line_webhook_queue()
+    added = line_webhook_queue.enqueue(events)
+    print(f"[WEBHOOK] 受信 {len(events)}件（新規 {added}件、待ち {line_webhook_queue.depth()}件）", flush=True)
+    return 'OK', 200
+
+
+@bp.route('/api/line_webhook_status', methods=['GET'])
+def api_line_webhook_status():
+    """Webhook受信キューの待ち件数・重複数・待ち時間／処理時間"""
+    return jsonify(get_line_webhook_queue().status())
+
+
+# LINE Webhook - 自動顧客登録（修正版）
+@bp.route('/webhook', methods=['POST'])
+def line_webhook():
+    try:
+        body = request.get_json()
+        events = body.get('events', [])
+        
+        for event in events:
+            if event['type'] == 'message':
+                user_id = event['source']['userId']
+                message_text = event.get('message', {}).get('text', '')
+                
+                # 既存ユーザーは処理しない（名前上書き防止）
+                check_res = supabase.get(f"customers?line_user_id=eq.{user_id}")
+                if check_res.status_code == 200 and len(check_res.json()) > 0:
+                    print(f"既存ユーザー: {user_id} → スキップ")
+                    continue
+                
+                # メッセージ本文が名前っぽい場合は名前として処理
+                if message_text and 2 <= len(message_text) <= 20 and not any(c in message_text for c in ['http', '予約', '確認', 'キャンセル']):
+                    # メッセージを名前として登録/更新
+                    if save_mapping(message_text, user_id):
+                        print(f"✅ 顧客名更新: {message_text} ({user_id})")
+                # elseブロック削除：プロフィール自動登録しない
+        
+        return jsonify({'status': 'ok'}), 200
+    except Exception as e:
+        print(f"❌ Webhook エラー: {str(e)}")
+        return jsonify({'status': 'error'}), 500
+
+
+# LINE Webhook - スタッフ用
+@bp.route('/webhook/staff', methods=['POST'])
+def line_webhook_staff():
+    try:
+        body = request.get_json()
+        events = body.get('events', [])
+        
+        for event in events:
+            if event['type'] == 'message':
+                user_id = event['source']['userId']
+                
+                # プロフィール取得（スタッフ用トークン使用）
+                headers = {'Authorization': f'Bearer {LINE_BOT_TOKEN_STAFF}'}
+                profile_url = f'https://api.line.me/v2/bot/profile/{user_id}'
+                profile_response = requests.get(profile_url, headers=headers)
+                
+                if profile_response.status_code == 200:
+                    profile = profile_response.json()
+                    display_name = profile.get('displayName', 'Unknown')
+                    
+                    # 自動登録
+                    mapping = load_mapping()
+                    if display_name not in mapping:
+                        if save_mapping(display_name, user_id):
+                            print(f"✅ 新規スタッフ登録: {display_name} ({user_id})")
+                        else:
+                            print(f"❌ スタッフ登録失敗: {display_name} ({user_id})")
+                    else:
+                        print(f"[情報] 既に登録済み（スタッフ）: {display_name} ({user_id})")
+                else:
+                    print(f"❌ プロフィール取得失敗（スタッフ）: status_code={profile_response.status_code}, user_id={user_id}")
+        
+        return jsonify({'status': 'ok'}), 200
+    except Exception as e:
+        print(f"❌ Webhook エラー（スタッフ）: {str(e)}")
+        return jsonify({'status': 'error'}), 500
@@ -3,21 +3,25 @@
 8週間分の予約をスクレイピングして8weeks_bookingsテーブルに保存
 詳細ページをスキップ、一覧ページから直接保存
 """
+import importlib.util
 import json
-import re
 import os
+import time
 import requests
 from datetime import datetime, timedelta, timezone
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
-# 仮想ディスプレイ（Railway用）
-try:
-    from pyvirtualdisplay import Display
-    display = Display(visible=0, size=(1920, 1080))
-    display.start()
-    print("[OK] Xvfb仮想ディスプレイ起動", flush=True)
-except Exception as e:
-    print(f"[WARN] Xvfb起動スキップ: {e}", flush=True)
+from concurrent.futures import ThreadPoolExecutor
+from utils.supabase_client import supabase
+# ブラウザ・ログイン・Cookie・仮想ディスプレイはプール側で管理
+from utils.browser_pool import BrowserPool, login_to_salonboard, needs_login, save_cookies
+from utils.date_scheduler import AdaptiveDateScheduler, SCRAPE_WORKERS_START, log_date_result
+from utils.booking_writer import (BOOKING_COLUMNS, WriteStage, booking_date, dedupe_bookings, diff_bookings, diff_slots,
+                                  load_slots)
+from utils.scrape_fingerprints import FingerprintStore, fingerprint, LAST_REPORT_FILE
+from utils.detail_enrichment import DetailCache, EnrichmentStage, SCRAPE_DETAIL_PAGES, SCRAPE_DETAIL_PAGES_FAST, valid_menu
+from utils.salonboard_http import NeedsBrowser, SalonBoardHttp, SCRAPE_ENGINE, SCRAPE_HTTP_WORKERS
+from utils.salonboard_parse import (DETAIL_EXTRACT_JS, LIST_EXTRACT_JS, SCHEDULE_EXTRACT_JS, parse_detail,
+                                    parse_reserve_rows, parse_schedule)
 
 print(f"[STARTUP] scrape_8weeks_v3.py 開始", flush=True)
 
@@ -36,11 +40,7 @@ def get_phone_for_customer(customer_name, booking_id):
         return ''
     # スペース除去（半角・全角両方）
     normalized_name = customer_name.replace(' ', '').replace('　', '')
-    headers = {'apikey': SUPABASE_KEY, 'Authorization': f'Bearer {SUPABASE_KEY}'}
-    res = requests.get(
-        f'{SUPABASE_URL}/rest/v1/customers?name=ilike.*{normalized_name}*&select=phone',
-        headers=headers
-    )
+    res = supabase.get(f'customers?name=ilike.*{normalized_name}*&select=phone')
     if res.status_code == 200 and res.json():
         phone = res.json()[0].get('phone', '')
         if phone:
@@ -48,69 +48,26 @@ def get_phone_for_customer(customer_name, booking_id):
             return phone
     return ''
 
+def load_detail(page, booking_id):
+    """予約詳細ページを開いて page.evaluate 1回で取り出し、電話番号・メニュー・予約経路を返す（失敗時は例外）"""
+    url = f'https://salonboard.com/KLP/reserve/ext/extReserveDetail/?reserveId={booking_id}'
+    page.goto(url, timeout=30000)
+    page.wait_for_timeout(500)
+    if needs_login(page):
+        # ログイン画面を解析して「詳細なし」とキャッシュしないように失敗にする
+        raise RuntimeError('ログインが必要')
+    details = parse_detail(page.evaluate(DETAIL_EXTRACT_JS))
+    print(f"[DETAIL-SB] {booking_id} 電話: {details['phone'] or '-'} 経路: {details['booking_source'] or '不明'} "
+          f"メニュー: {details['menu'][:50] or '-'}", flush=True)
+    return details
+
 def get_details_from_salonboard(page, booking_id):
     """SalonBoardの予約詳細から電話番号、メニュー、予約経路を取得"""
-    result = {'phone': '', 'menu': '', 'booking_source': None}
     try:
-        # 予約詳細ページにアクセス
-        url = f'https://salonboard.com/KLP/reserve/ext/extReserveDetail/?reserveId={booking_id}'
-        page.goto(url, timeout=30000)
-        page.wait_for_timeout(500)
-        
-        page_content = page.content()
-        import re
-        
-        # 電話番号を取得
-        rows = page.query_selector_all('tr, .row, div')
-        for row in rows:
-            text = row.inner_text()
-            if '電話番号' in text:
-                phone_match = re.search(r'0[0-9]{9,10}', text.replace('-', ''))
-                if phone_match:
-                    result['phone'] = phone_match.group()
-                    print(f"[DETAIL-SB] {booking_id} 電話: {result['phone']}")
-                    break
-        
-        # メニューを取得（ページのテキストから抽出）
-        import re
-        try:
-            page_text = page.inner_text('body')
-            menu_patterns = [
-                r'【まつげエクステ】[^【\n]+',
-                r'【その他まつげメニュー】[^【\n]+',
-                r'【付替オフ】[^【\n]+',
-                r'【次回】[^【\n]+'
-            ]
-            menu_parts = []
-            for pattern in menu_patterns:
-                matches = re.findall(pattern, page_text)
-                for match in matches:
-                    clean = match.strip()
-                    if clean and len(clean) > 5 and clean not in menu_parts:
-                        menu_parts.append(clean)
-            if menu_parts:
-                result['menu'] = ' / '.join(menu_parts[:3])[:300]
-                print(f"[DETAIL-SB] {booking_id} メニュー: {result['menu'][:50]}...")
-        except Exception as e:
-            print(f"[DETAIL-SB] メニュー取得エラー: {e}")
-        
-        # 予約経路を取得（テキストから検索）
-        try:
-            route_text = page.inner_text('body')
-            if '次回予約' in route_text:
-                result['booking_source'] = '次回'
-                print(f"[DETAIL-SB] {booking_id} 経路: 次回予約")
-            elif 'NHPB' in route_text or 'ホットペッパー' in route_text:
-                result['booking_source'] = 'NHPB'
-                print(f"[DETAIL-SB] {booking_id} 経路: ホットペッパー")
-            else:
-                print(f"[DETAIL-SB] {booking_id} 経路: 不明")
-        except Exception as e:
-            print(f"[DETAIL-SB] {booking_id} 経路取得エラー: {e}")
-        
+        return load_detail(page, booking_id)
     except Exception as e:
         print(f"[DETAIL-SB] エラー: {booking_id} - {e}")
-    return result
+        return {'phone': '', 'menu': '', 'booking_source': None}
 
 def get_phone_from_salonboard(page, booking_id):
     """後方互換性のため残す"""
@@ -120,351 +77,228 @@ def get_phone_from_salonboard(page, booking_id):
 
 # スレッドセーフなロック
 db_lock = threading.Lock()
-result_lock = threading.Lock()
 
-def scrape_date_range(worker_id, start_day, end_day, existing_cache, headers, today):
-    """指定範囲の日付をスクレイピング（1ワーカー）"""
-    import re
-    from playwright.sync_api import sync_playwright
-    
+def scrape_date_range(worker_id, start_day, end_day, existing_cache, headers, today, pool=None, store=None):
+    """指定範囲の日付をスクレイピング（1ワーカー、ページはブラウザプールから借りる）"""
     print(f"[W{worker_id}] 開始: {start_day}〜{end_day-1}日目", flush=True)
     
-    bookings_list = []
-    slots_list = []
+    own_pool = pool is None
+    if own_pool:
+        pool = BrowserPool(size=1, name=f'W{worker_id}')
+    try:
+        return pool.run(
+            lambda page: scrape_days_on_page(page, worker_id, start_day, end_day, existing_cache, today, store),
+            label=f'W{worker_id}'
+        )
+    except Exception as e:
+        print(f"[W{worker_id}] 例外: {e}", flush=True)
+        return [], []
+    finally:
+        if own_pool:
+            pool.shutdown()
+
+
+def load_schedule(page, schedule_url):
+    """スケジュール画面を開いてスタッフ行を1回の page.evaluate で取り出す"""
+    page.goto(schedule_url, timeout=60000)
+    page.wait_for_selector('.scheduleMainTableLine', timeout=10000)
+    page.wait_for_timeout(150)
+    return page.evaluate(SCHEDULE_EXTRACT_JS)
+
+
+# ログイン確認済みのページ（レーンのスレッドごと。レーンの先頭の日付だけ table の有無まで確認する）
+_login_state = threading.local()
+# SalonBoardが混雑・制限時に返すステータス
+THROTTLE_STATUS = (429, 503)
+
+
+def scrape_day_on_page(page, worker_id, day_offset, existing_cache, today, store=None):
+    """借りたページで day_offset 日目の予約と空き枠を取得（store があれば差分モード）
+
+    {'date', 'status', 'engine', 'bookings', 'slots'} を返す。status は
+    ok / unchanged（差分モードで変化なし）/ skipped（再訪間隔内）/ error / throttled / login_failed。
+    """
+    target_date = today + timedelta(days=day_offset)
+    date_str = target_date.strftime('%Y%m%d')
+    url = f'https://salonboard.com/KLP/reserve/reserveList/searchDate?date={date_str}'
+    schedule_url = f'https://salonboard.com/KLP/schedule/salonSchedule/?date={date_str}'
+    result = {'date': date_str, 'status': 'ok', 'engine': 'browser', 'bookings': [], 'slots': []}
+    
+    # 差分モード：再訪間隔内の日付はページを開かない
+    if store is not None and not store.due(date_str, day_offset):
+        result['status'] = 'skipped'
+        return result
     
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(
-                headless=False,
-                args=['--disable-blink-features=AutomationControlled', '--no-sandbox', '--disable-dev-shm-usage']
-            )
-            
-            context = browser.new_context(
-                user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
-                viewport={'width': 1920, 'height': 1080},
-                locale='ja-JP',
-                timezone_id='Asia/Tokyo'
-            )
-            
-            context.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
-            """)
+        resp = page.goto(url, timeout=60000)
+        page.wait_for_timeout(150)
+    except Exception as e:
+        print(f"[W{worker_id}] {target_date.strftime('%Y-%m-%d')} エラー: {e}", flush=True)
+        return {**result, 'status': 'error', 'error': str(e)[:200]}
+    if resp is not None and resp.status in THROTTLE_STATUS:
+        print(f"[W{worker_id}] {date_str} SalonBoard応答 {resp.status}", flush=True)
+        return {**result, 'status': 'throttled', 'error': f'HTTP {resp.status}'}
+    
+    # ログイン確認（このページで初めての日付は table の有無まで、以降はログイン画面への転送だけ見る）
+    first = getattr(_login_state, 'page', None) is not page
+    if 'login' in page.url.lower() or 'エラー' in page.title() or (first and len(page.query_selector_all('table')) == 0):
+        if not login_to_salonboard(page):
+            print(f"[W{worker_id}] ログイン失敗", flush=True)
+            return {**result, 'status': 'login_failed'}
+        
+        save_cookies(page.context)
+        
+        page.goto(url, timeout=60000)
+        page.wait_for_timeout(150)
+    _login_state.page = page
+    
+    # === 一覧・スケジュールは page.evaluate 1回ずつで取り出し、解析はPython側 ===
+    return process_day(worker_id, target_date, page.evaluate(LIST_EXTRACT_JS),
+                       lambda: load_schedule(page, schedule_url), existing_cache, store, result)
+
+
+def scrape_day_http(http, worker_id, day_offset, existing_cache, today, store=None):
+    """ブラウザを使わずHTTPで day_offset 日目を取得（scrape_day_on_page と同じ結果、取れないページは NeedsBrowser）"""
+    target_date = today + timedelta(days=day_offset)
+    date_str = target_date.strftime('%Y%m%d')
+    result = {'date': date_str, 'status': 'ok', 'engine': 'http', 'bookings': [], 'slots': []}
+    
+    if store is not None and not store.due(date_str, day_offset):
+        result['status'] = 'skipped'
+        return result
+    
+    saved = store.saved(date_str) if store is not None else None
+    day = http.fetch_day(date_str, saved)
+    if day['not_modified']:
+        # 一覧・スケジュールとも 304：前回のフィンガープリントのまま確認時刻だけ更新
+        store.mark(date_str, saved.get('list'), saved.get('schedule'), changed=False, http=day['validators'])
+        print(f"[W{worker_id}] {target_date.strftime('%m/%d')} 変更なし（304）", flush=True)
+        result['status'] = 'unchanged'
+        return result
+    return process_day(worker_id, target_date, day['list'], lambda: day['schedule'], existing_cache, store, result,
+                       http=day['validators'])
+
+
+def process_day(worker_id, target_date, list_rows, get_schedule, existing_cache, store, result, http=None):
+    """取り出した一覧行とスケジュール（get_schedule() で取得）から予約・空き枠を作る（差分モードは変化なしを判定）"""
+    date_str = target_date.strftime('%Y%m%d')
+    bookings_list = result['bookings']
+    slots_list = result['slots']
+    list_fp = fingerprint(list_rows)
+    schedule_data = None
+    schedule_fp = None
+    
+    # 差分検出：一覧・スケジュールとも前回と同じなら解析・詳細取得・DB書き込みを省く
+    if store is not None and not store.is_changed(date_str, 'list', list_fp):
+        try:
+            schedule_data = get_schedule()
+            schedule_fp = fingerprint(schedule_data)
+        except Exception as e:
+            print(f"[W{worker_id}] {date_str} スケジュール確認エラー: {e}", flush=True)
+        if not store.is_changed(date_str, 'schedule', schedule_fp):
+            store.mark(date_str, list_fp, schedule_fp, changed=False, http=http)
+            print(f"[W{worker_id}] {target_date.strftime('%m/%d')} 変更なし", flush=True)
+            result['status'] = 'unchanged'
+            return result
+    
+    if list_rows is None:
+        return result
+    
+    for parsed in parse_reserve_rows(list_rows, target_date):
+        booking_id = parsed['booking_id']
+        try:
+            cached = existing_cache.get(booking_id, {})
+            cached_menu = cached.get('menu', '')
+            cached_phone = cached.get('phone', '')
             
-            try:
-                with open('session_cookies.json', 'r') as f:
-                    cookies = json.load(f)
-                context.add_cookies(cookies)
-            except:
-                pass
+            # キャッシュのメニューが有効か確認
+            menu = cached_menu if valid_menu(cached_menu) else ''
             
-            page = context.new_page()
+            phone = cached_phone
+            if not phone:
+                phone = get_phone_for_customer(parsed['customer_name'], booking_id)
             
-            for day_offset in range(start_day, end_day):
-                target_date = today + timedelta(days=day_offset)
-                date_str = target_date.strftime('%Y%m%d')
-                url = f'https://salonboard.com/KLP/reserve/reserveList/searchDate?date={date_str}'
-                
-                try:
-                    page.goto(url, timeout=60000)
-                    page.wait_for_timeout(150)
-                except Exception as e:
-                    print(f"[W{worker_id}] {target_date.strftime('%Y-%m-%d')} エラー: {e}", flush=True)
-                    continue
-                
-                # 初回のみログイン確認
-                if day_offset == start_day and ('login' in page.url.lower() or 'エラー' in page.title() or len(page.query_selector_all('table')) == 0):
-                    if not login_to_salonboard(page):
-                        print(f"[W{worker_id}] ログイン失敗", flush=True)
-                        browser.close()
-                        return [], []
-                    
-                    with db_lock:
-                        new_cookies = context.cookies()
-                        with open('session_cookies.json', 'w') as f:
-                            json.dump(new_cookies, f, indent=2, ensure_ascii=False)
-                    
-                    page.goto(url, timeout=60000)
-                    page.wait_for_timeout(150)
-                
-                # 予約テーブル取得
-                reservation_table = None
-                for table in page.query_selector_all("table"):
-                    if table.query_selector("th#comingDate"):
-                        reservation_table = table
-                        break
-                
-                if not reservation_table:
-                    continue
-                
-                rows = reservation_table.query_selector_all('tbody tr')
-                
-                for row in rows:
-                    try:
-                        cells = row.query_selector_all('td')
-                        if len(cells) < 4:
-                            continue
-                        
-                        # 受付待ちフィルター
-                        status_text = cells[1].text_content().strip()
-                        if "受付待ち" not in status_text:
-                            continue
-                        
-                        # リンク取得（v3形式: cells[2]から）
-                        reserve_link = cells[2].query_selector("a[href*='reserveId=']")
-                        if not reserve_link:
-                            continue
-                        
-                        href = reserve_link.get_attribute('href')
-                        id_match = re.search(r'reserveId=([A-Z]{2}\d+)', href)
-                        if not id_match:
-                            continue
-                        
-                        booking_id = id_match.group(1)
-                        
-                        # 名前取得（v3形式）
-                        name_elem = cells[2].query_selector("p.wordBreak")
-                        customer_name = name_elem.text_content().strip() if name_elem else ""
-                        customer_name = re.sub(r'[★☆♪♡⭐️🦁]', '', customer_name).strip()
-
-                        
-                        # 時間取得（v3形式）
-                        time_cell = cells[0].text_content().strip()
-                        time_match = re.search(r'(\d{1,2}:\d{2})', time_cell)
-                        time_only = time_match.group(1) if time_match else "00:00"
-                        visit_datetime = f"{target_date.strftime('%Y-%m-%d')} {time_only}:00"
-                        
-                        # スタッフ取得（v3形式）
-                        staff_text = cells[3].text_content().strip() if len(cells) > 3 else ''
-                        is_designated = staff_text.startswith('(指)') or staff_text.startswith('（指）')
-                        staff_name = re.sub(r'^[\(（]指[\)）]', '', staff_text).strip()
-
-                        
-                        cached = existing_cache.get(booking_id, {})
-                        cached_menu = cached.get('menu', '')
-                        cached_phone = cached.get('phone', '')
-                        
-                        # キャッシュのメニューが有効か確認
-                        menu = ''
-                        if cached_menu and '\n' not in cached_menu and '来店日' not in cached_menu and len(cached_menu) <= 200:
-                            menu = cached_menu
-                        
-                        phone = cached_phone
-                        if not phone:
-                            phone = get_phone_for_customer(customer_name, booking_id)
-                        
-                        # Phase 1: 詳細取得はスキップ（後でまとめて取得）
-                        cached_booking_source = existing_cache.get(booking_id, {}).get('booking_source')
-                        booking_source = cached_booking_source
-                        is_new_booking = booking_id not in existing_cache
-                        needs_detail = not phone or not menu  # 電話番号またはメニューがない場合は詳細取得
-                        
-                        bookings_list.append({
-                            'booking_id': booking_id,
-                            'customer_name': customer_name,
-                            'visit_datetime': visit_datetime,
-                            'staff': staff_name,
-                            'menu': menu,
-                            'phone': phone,
-                            'status': '予約確定',
-                            'booking_source': booking_source,
-                            'is_designated': is_designated,
-                            'needs_detail': needs_detail
-                        })
-                    except Exception as e:
-                        print(f"[ERROR] 予約処理エラー: {booking_id if 'booking_id' in dir() else 'unknown'} - {e}", flush=True)
-                        # リトライ1回
-                        try:
-                            page.wait_for_timeout(300)
-                            page.goto(url, timeout=60000)
-                            page.wait_for_timeout(150)
-                        except:
-                            pass
-                        continue
-                
-                
-                # === 詳細取得（日付の処理終了後、同じブラウザで）===
-                needs_detail_list = [b for b in bookings_list if b.get('needs_detail', False)]
-                for b in needs_detail_list:
-                    try:
-                        details = get_details_from_salonboard(page, b['booking_id'])
-                        if details['phone']:
-                            b['phone'] = details['phone']
-                        if details['menu']:
-                            b['menu'] = details['menu']
-                        if details['booking_source']:
-                            b['booking_source'] = details['booking_source']
-                        b['needs_detail'] = False
-                    except Exception as e:
-                        print(f"[W{worker_id}] 詳細エラー {b['booking_id']}", flush=True)
-                
-                # === 空き枠取得（スケジュール画面から）===
-                import math
-                schedule_url = f'https://salonboard.com/KLP/schedule/salonSchedule/?date={date_str}'
-                try:
-                    page.goto(schedule_url, timeout=60000)
-                    page.wait_for_selector('.scheduleMainTableLine', timeout=10000)
-                    page.wait_for_timeout(150)
-                    
-                    staff_list = []
-                    staff_options = page.query_selector_all('#stockNameList option')
-                    for opt in staff_options:
-                        value = opt.get_attribute('value') or ''
-                        name = opt.inner_text()
-                        if value.startswith('STAFF_'):
-                            staff_list.append({'id': value.split('_')[1], 'name': name})
-                    
-                    staff_rows = page.query_selector_all('.jscScheduleMainTableStaff .scheduleMainTableLine')
-                    
-                    for idx, row in enumerate(staff_rows):
-                        if idx >= len(staff_list):
-                            break
-                        staff_info = staff_list[idx]
-                        
-                        time_list = row.query_selector_all('.scheduleTime')
-                        start_time = 9
-                        if time_list:
-                            first_time = time_list[0].inner_text()
-                            try:
-                                start_time = int(first_time.split(':')[0])
-                            except:
-                                pass
-                        
-                        booked_slots = []
-                        reservations = row.query_selector_all('.scheduleReservation, .scheduleToDo')
-                        for res in reservations:
-                            time_zone = res.query_selector('.scheduleTimeZoneSetting')
-                            if time_zone:
-                                try:
-                                    time_text = time_zone.inner_text()
-                                    times = json.loads(time_text)
-                                    if len(times) >= 2:
-                                        start_parts = times[0].split(':')
-                                        end_parts = times[1].split(':')
-                                        start_h = int(start_parts[0]) + int(start_parts[1]) / 60
-                                        end_h = int(end_parts[0]) + int(end_parts[1]) / 60
-                                        booked_slots.append({'start': start_h, 'end': end_h})
-                                except:
-                                    pass
-                        
-                        day_off = row.query_selector('.isDayOff')
-                        is_day_off = day_off is not None
-                        
-                        # .scheduleToDoが終日をカバーしているか、または予約が0件なら休日
-                        if not is_day_off:
-                            todos = row.query_selector_all('.scheduleToDo')
-                            for todo in todos:
-                                style = todo.get_attribute('style') or ''
-                                # styleなし、またはwidth>=1000(ほぼ終日)なら休日
-                                if not style or 'left' not in style or 'width' not in style:
-                                    is_day_off = True
-                                    break
-                                # width値を抽出してチェック
-                                import re
-                                width_match = re.search(r'width:\s*(\d+)', style)
-                                if width_match and int(width_match.group(1)) >= 1000:
-                                    is_day_off = True
-                                    break
-                        
-                        available_slots = []
-                        if not is_day_off:
-                            booked_slots.sort(key=lambda x: x['start'])
-                            current = start_time
-                            for slot in booked_slots:
-                                if slot['start'] > current:
-                                    start_min = current * 60
-                                    end_min = slot['start'] * 60
-                                    start_min_rounded = math.ceil(start_min / 10) * 10
-                                    end_min_rounded = math.floor(end_min / 10) * 10
-                                    if end_min_rounded > start_min_rounded:
-                                        start_str = f"{int(start_min_rounded // 60)}:{int(start_min_rounded % 60):02d}"
-                                        end_str = f"{int(end_min_rounded // 60)}:{int(end_min_rounded % 60):02d}"
-                                        available_slots.append({'start': start_str, 'end': end_str})
-                                current = max(current, slot['end'])
-                            if current < 19:
-                                current_min = current * 60
-                                current_min_rounded = math.ceil(current_min / 10) * 10
-                                start_str = f"{int(current_min_rounded // 60)}:{int(current_min_rounded % 60):02d}"
-                                available_slots.append({'start': start_str, 'end': '19:00'})
-                        
-                        slots_list.append({
-                            'date': date_str,
-                            'staff_id': staff_info['id'],
-                            'staff_name': staff_info['name'],
-                            'is_day_off': is_day_off,
-                            'slots': available_slots
-                        })
-                except Exception as e:
-                    print(f"[W{worker_id}] 空き枠取得エラー {date_str}: {e}", flush=True)
-
-                print(f"[W{worker_id}] {target_date.strftime('%m/%d')} 完了", flush=True)
+            # 詳細ページはここでは開かない（全日付の取得後に補完ステージでまとめて取得）
+            booking_source = cached.get('booking_source')
+            needs_detail = not phone or not menu  # 電話番号またはメニューがない場合は詳細取得
             
-            browser.close()
-    except Exception as e:
-        print(f"[W{worker_id}] 例外: {e}", flush=True)
+            bookings_list.append({
+                'booking_id': booking_id,
+                'customer_name': parsed['customer_name'],
+                'visit_datetime': parsed['visit_datetime'],
+                'staff': parsed['staff'],
+                'menu': menu,
+                'phone': phone,
+                'status': '予約確定',
+                'booking_source': booking_source,
+                'is_designated': parsed['is_designated'],
+                'needs_detail': needs_detail
+            })
+        except Exception as e:
+            print(f"[ERROR] 予約処理エラー: {booking_id} - {e}", flush=True)
+            continue
     
-    print(f"[W{worker_id}] 終了: {len(bookings_list)}件", flush=True)
-    return bookings_list, slots_list
+    
+    # === 空き枠取得（スケジュール画面から）===
+    try:
+        if schedule_data is None:
+            schedule_data = get_schedule()
+            schedule_fp = fingerprint(schedule_data)
+        slots_list.extend(parse_schedule(schedule_data, date_str))
+    except Exception as e:
+        print(f"[W{worker_id}] 空き枠取得エラー {date_str}: {e}", flush=True)
 
+    if store is not None:
+        store.mark(date_str, list_fp, schedule_fp, changed=True, http=http)
+    print(f"[W{worker_id}] {target_date.strftime('%m/%d')} 完了", flush=True)
+    return result
 
 
-def login_to_salonboard(page):
-    login_id = os.environ.get('SALONBOARD_LOGIN_ID', 'CD18317')
-    login_password = os.environ.get('SALONBOARD_LOGIN_PASSWORD', 'Ne8T2Hhi!')
+def scrape_days_on_page(page, worker_id, start_day, end_day, existing_cache, today, store=None):
+    """借りたページで start_day〜end_day-1 日目を順に取得（単日の再取得・範囲指定用）"""
     
-    print(f"[LOGIN] ログインページにアクセス中...", flush=True)
-    page.goto('https://salonboard.com/login/', timeout=60000)
-    page.wait_for_timeout(1000)
+    bookings_list = []
+    slots_list = []
     
     try:
-        page.fill('input[name="userId"]', login_id)
-        page.fill('input[name="password"]', login_password)
-        print(f"[LOGIN] ID/PW入力完了", flush=True)
-        
-        # ログインボタンをクリック
-        btn = None
-        selectors = [
-            'a.common-CNCcommon__primaryBtn',
-            'button[type="submit"]',
-            'input[type="submit"]',
-            'a.loginBtn',
-            '.loginBtn',
-            'button.primary',
-            'a:has-text("ログイン")',
-            'button:has-text("ログイン")'
-        ]
-        for sel in selectors:
-            try:
-                btn = page.query_selector(sel)
-                if btn:
-                    print(f"[LOGIN] ボタン発見: {sel}", flush=True)
-                    break
-            except:
-                pass
-        
-        if btn:
-            btn.click()
-            print(f"[LOGIN] ボタンクリック", flush=True)
-        else:
-            print(f"[LOGIN] ボタン見つからず、Enter押下", flush=True)
-            page.keyboard.press('Enter')
-        
-        # ページ遷移を待つ
-        for i in range(30):
-            page.wait_for_timeout(300)
-            current_url = page.url
-            if '/KLP/' in current_url:
-                print(f"[LOGIN] ログイン成功", flush=True)
-                return True
-            # doLogin後の遷移を待つ
-            if 'doLogin' in current_url:
-                print(f"[LOGIN] doLogin処理中...", flush=True)
-                continue
+        for day_offset in range(start_day, end_day):
+            result = scrape_day_on_page(page, worker_id, day_offset, existing_cache, today, store)
+            if result['status'] == 'login_failed':
+                return [], []
+            bookings_list.extend(result['bookings'])
+            slots_list.extend(result['slots'])
         
-        print(f"[LOGIN] タイムアウト: {page.url}", flush=True)
-        return False
     except Exception as e:
-        print(f"[LOGIN] エラー: {e}", flush=True)
-        return False
+        print(f"[W{worker_id}] 例外: {e}", flush=True)
+    
+    print(f"[W{worker_id}] 終了: {len(bookings_list)}件", flush=True)
+    return bookings_list, slots_list
+
+
+
+def scrape_days_http(http, day_offsets, existing_cache, today, store=None, workers=SCRAPE_HTTP_WORKERS):
+    """HTTPで日付を並行取得し、(結果のリスト, ブラウザで取り直す day_offset のリスト) を返す"""
+    
+    def job(day_offset):
+        started = time.perf_counter()
+        try:
+            result = scrape_day_http(http, 'H', day_offset, existing_cache, today, store)
+        except NeedsBrowser as e:
+            result = {'status': 'needs_browser', 'reason': e.reason}
+        except Exception as e:
+            result = {'status': 'needs_browser', 'reason': f'{type(e).__name__}: {e}'}
+        result.update(item=day_offset, seconds=round(time.perf_counter() - started, 2),
+                      worker=threading.current_thread().name)
+        log_date_result(result)
+        return result
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='http') as executor:
+        results = list(executor.map(job, day_offsets))
+    fallback = [r['item'] for r in results if r['status'] == 'needs_browser']
+    if fallback:
+        print(f"[HTTP] ブラウザで取り直す日付: {len(fallback)}件", flush=True)
+    return [r for r in results if r['status'] != 'needs_browser'], fallback
+
 
 def send_scrape_alert(failure_count, error_message=""):
     LINE_CHANNEL_ACCESS_TOKEN_STAFF = os.environ.get('LINE_CHANNEL_ACCESS_TOKEN_STAFF')
@@ -490,15 +324,16 @@ def increment_failure_count(error_message=""):
     if scrape_failure_count == FAILURE_THRESHOLD:
         send_scrape_alert(scrape_failure_count, error_message)
 
-def main(days_limit=56):
+def main(days_limit=56, incremental=None):
     mode = "高速版（14日）" if days_limit <= 14 else "通常版（8週間）"
-    print(f"[{datetime.now(JST)}] 予約スクレイピング {mode} 開始", flush=True)
-    
-    try:
-        from playwright.sync_api import sync_playwright
-        print("[OK] playwright インポート成功", flush=True)
-    except Exception as e:
-        print(f"[ERROR] playwright インポート失敗: {e}", flush=True)
+    if incremental is None:
+        incremental = os.getenv('SCRAPE_INCREMENTAL', 'true').lower() == 'true'
+    run_started = time.time()
+    print(f"[{datetime.now(JST)}] 予約スクレイピング {mode} 開始（{'差分' if incremental else '全件'}モード）", flush=True)
+    
+    # ブラウザはプールが起動する（ここでは読み込まず、インストールされているかだけ確認）
+    if importlib.util.find_spec('playwright') is None:
+        print("[ERROR] playwright がインストールされていません", flush=True)
         return
     
     SUPABASE_URL = os.environ.get('SUPABASE_URL')
@@ -510,23 +345,13 @@ def main(days_limit=56):
     
     print(f"[OK] SUPABASE_URL: {SUPABASE_URL[:30]}...", flush=True)
     
-    headers = {
-        'apikey': SUPABASE_KEY,
-        'Authorization': f'Bearer {SUPABASE_KEY}',
-        'Content-Type': 'application/json',
-        'Prefer': 'resolution=merge-duplicates'
-    }
-    
-    # 既存データをキャッシュ
+    # 既存データをキャッシュ（メニュー・電話番号の再利用と、書き込み時の差分計算に使うスナップショット）
     existing_cache = {}
     try:
-        cache_res = requests.get(
-            f"{SUPABASE_URL}/rest/v1/8weeks_bookings?select=booking_id,menu,phone,booking_source",
-            headers=headers
-        )
+        cache_res = supabase.get(f"8weeks_bookings?select={','.join(BOOKING_COLUMNS)}", timeout=(3.05, 60))
         if cache_res.status_code == 200:
             for item in cache_res.json():
-                existing_cache[item['booking_id']] = {'menu': item.get('menu', ''), 'phone': item.get('phone', ''), 'booking_source': item.get('booking_source')}
+                existing_cache[item['booking_id']] = item
             print(f"[CACHE] 既存データ: {len(existing_cache)}件", flush=True)
     except Exception as e:
         print(f"[CACHE] キャッシュ取得エラー: {e}", flush=True)
@@ -535,31 +360,41 @@ def main(days_limit=56):
     all_bookings = []
     all_slots = []
     
-    # days_limitに応じて分割
-    if days_limit <= 14:
-        ranges = [(0, 3), (3, 5), (5, 8), (8, 10), (10, 12), (12, days_limit)]
-    else:
-        ranges = [(0, 10), (10, 19), (19, 28), (28, 37), (37, 46), (46, days_limit)]
+    # 差分モード：前回から変化のない日付は解析・DB書き込みを省く
+    store = FingerprintStore.load() if incremental else None
+    # 再訪間隔内の日付はジョブにしない
+    day_offsets = [d for d in range(days_limit)
+                   if store is None or store.due((today + timedelta(days=d)).strftime('%Y%m%d'), d)]
     
-    print("[PARALLEL] 6ワーカーで並列実行開始", flush=True)
+    print(f"[PARALLEL] {len(day_offsets)}日分を日付単位で並列実行開始", flush=True)
     start_time = datetime.now(JST)
     
-    with ThreadPoolExecutor(max_workers=6) as executor:
-        futures = {
-            executor.submit(scrape_date_range, i+1, start, end, existing_cache, headers, today): i
-            for i, (start, end) in enumerate(ranges)
-        }
-        
-        for future in as_completed(futures):
-            worker_id = futures[future]
-            try:
-                bookings, slots = future.result()
-                with result_lock:
-                    all_bookings.extend(bookings)
-                    all_slots.extend(slots)
-                print(f"[PARALLEL] Worker{worker_id+1} 完了: {len(bookings)}件", flush=True)
-            except Exception as e:
-                print(f"[PARALLEL] Worker{worker_id+1} 例外: {e}", flush=True)
+    # HTTPモード：一覧・スケジュールはブラウザを使わずに取得し、取れなかった日付だけブラウザに回す
+    results = []
+    browser_offsets = day_offsets
+    http = SalonBoardHttp() if SCRAPE_ENGINE == 'http' else None
+    if http is not None:
+        http_results, browser_offsets = scrape_days_http(http, day_offsets, existing_cache, today, store)
+        results.extend(http_results)
+    
+    # 日付ごとのジョブを空いたレーンから取っていく（レーン数は応答時間・空きメモリ・エラーを見て増減）
+    # レーンのブラウザは詳細補完ステージでも使い回す（ブラウザは最初のジョブで起動）
+    pool = BrowserPool(size=SCRAPE_WORKERS_START, name='scrape')
+    scheduler = AdaptiveDateScheduler(pool)
+    
+    def scrape_job(page, day_offset):
+        lane_id = threading.current_thread().name.rsplit('-', 1)[-1]
+        return scrape_day_on_page(page, lane_id, day_offset, existing_cache, today, store)
+    
+    if browser_offsets:
+        results.extend(scheduler.run(browser_offsets, scrape_job))
+    for result in results:
+        if result['status'] == 'login_failed':
+            print(f"[PARALLEL] {result['date']} ログイン失敗", flush=True)
+        all_bookings.extend(result.get('bookings', []))
+        all_slots.extend(result.get('slots', []))
+    failed_dates = sorted((today + timedelta(days=r['item'])).strftime('%Y%m%d')
+                          for r in results if r['status'] in ('error', 'throttled', 'login_failed'))
     
     end_time = datetime.now(JST)
     elapsed = (end_time - start_time).total_seconds()
@@ -571,51 +406,28 @@ def main(days_limit=56):
         for kb in kambara_bookings:
             print(f"[神原予約] {kb['booking_id']} {kb['visit_datetime']}", flush=True)
     
-    # SalonBoardにない予約をDBから削除（一時的に無効化）
-    # TODO: 削除ロジックはスクレイピングの安定性が確認できてから再有効化
-    # if all_bookings:
-    #     scraped_booking_ids = set(b['booking_id'] for b in all_bookings)
-    #     ...
-    
-    # Phase 2: 詳細が必要な予約だけ取得（高速版はスキップ）
-    needs_detail_bookings = [b for b in all_bookings if b.get('needs_detail', False)]
-    print(f"[PHASE2] 詳細取得が必要な予約: {len(needs_detail_bookings)}件", flush=True)
+    # 詳細補完ステージ：詳細が必要な予約を重複なしで集め、キャッシュ・既存データにないものだけ詳細ページを開く
+    # 高速版も新規予約の詳細は取る（キャッシュ済みは開かないので、毎時でも開くのは新しい予約の分だけ）
+    detail_cache = DetailCache.load()
+    detail_pages = SCRAPE_DETAIL_PAGES_FAST if days_limit <= 14 else SCRAPE_DETAIL_PAGES
+    enricher = EnrichmentStage(pool, load_detail, detail_cache, pages=detail_pages)
+    enrich_report = enricher.run(all_bookings, existing_cache)
+    if store is not None and enricher.unfinished:
+        # 詳細を取れなかった予約の日付はフィンガープリントを残さず、次のランで一覧から取り直す
+        retry_dates = {booking_date(b) for b in all_bookings if b['booking_id'] in enricher.unfinished}
+        store.retry(retry_dates)
+        print(f"[ENRICH] 詳細未取得{len(enricher.unfinished)}件の日付を次回再解析: {', '.join(sorted(retry_dates))}", flush=True)
+    try:
+        detail_cache.commit(keep_from=today.strftime('%Y%m%d'))
+    except OSError as e:
+        print(f"[ENRICH] キャッシュ保存エラー: {e}", flush=True)
     
-    if days_limit <= 14:
-        print(f"[PHASE2] 高速版のためスキップ（通常版で取得）", flush=True)
-        needs_detail_bookings = []
-    
-    if needs_detail_bookings:
-        
-        # 詳細取得用のブラウザを1つ起動
-        try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                context = browser.new_context()
-                page = context.new_page()
-                
-                # ログイン（共通関数を使用）
-                if not login_to_salonboard(page):
-                    print("[PHASE2] ログイン失敗、スキップ", flush=True)
-                else:
-                
-                    # 詳細取得
-                    for booking in needs_detail_bookings:
-                        try:
-                            details = get_details_from_salonboard(page, booking['booking_id'])
-                            if details['phone']:
-                                booking['phone'] = details['phone']
-                            if details['menu']:
-                                booking['menu'] = details['menu']
-                            if details['booking_source']:
-                                booking['booking_source'] = details['booking_source']
-                            print(f"[PHASE2] 詳細取得完了: {booking['booking_id']}", flush=True)
-                        except Exception as e:
-                            print(f"[PHASE2] 詳細取得エラー: {booking['booking_id']} - {e}", flush=True)
-                
-                browser.close()
-        except Exception as e:
-            print(f"[PHASE2] ブラウザエラー: {e}", flush=True)
+    # レーンごとの稼働率はシャットダウン前に取る
+    pool_metrics = pool.metrics()
+    pool.shutdown()
+    for lane in pool_metrics['lanes']:
+        print(f"[SCRAPE-LANE] {json.dumps(lane, ensure_ascii=False)}", flush=True)
+    print(f"[BROWSER] プール統計: {json.dumps({k: v for k, v in pool_metrics.items() if k != 'lanes'}, ensure_ascii=False)}", flush=True)
     
     # needs_detailフラグを削除
     for b in all_bookings:
@@ -640,133 +452,118 @@ def main(days_limit=56):
         if '與那城' in staff or '神原' in b.get('customer_name', ''):
             print(f"[DEBUG] {b.get('customer_name')}: key={key}, is_day_off={is_day_off}, staff_on_duty={b['staff_on_duty']}", flush=True)
     
-    # DBに一括保存（バッチ）
-    total_saved = 0
-    if all_bookings:
-        try:
-            upsert_headers = headers.copy()
-            upsert_headers["Prefer"] = "resolution=merge-duplicates"
-            # 50件ずつバッチ処理
-            batch_size = 50
-            for i in range(0, len(all_bookings), batch_size):
-                batch = all_bookings[i:i+batch_size]
-                res = requests.post(
-                    f"{SUPABASE_URL}/rest/v1/8weeks_bookings?on_conflict=booking_id",
-                    headers=upsert_headers,
-                    json=batch
-                )
-                if res.status_code in [200, 201]:
-                    total_saved += len(batch)
-                else:
-                    print(f"[DB] バッチエラー: {res.status_code} - {res.text[:100]}", flush=True)
-            print(f"[DB] {total_saved}件一括保存完了", flush=True)
-        except Exception as e:
-            print(f"[DB] 保存エラー: {e}", flush=True)
+    # === 書き込みステージ：取得結果の重複を除き、スナップショットとの差分だけをまとめて書く ===
+    all_bookings, duplicates = dedupe_bookings(all_bookings)
+    if duplicates:
+        print(f"[重複削除] 同一電話番号・同一日時のホットペッパー予約{len(duplicates)}件を除外: {', '.join(duplicates)}", flush=True)
     
-    # 空き枠をDBに保存
-    slots_saved = 0
-    if all_slots:
-        try:
-            slot_headers = headers.copy()
-            slot_headers["Prefer"] = "resolution=merge-duplicates"
-            batch_size = 50
-            for i in range(0, len(all_slots), batch_size):
-                batch = all_slots[i:i+batch_size]
-                # updated_atを追加
-                for slot in batch:
-                    slot['updated_at'] = datetime.now(JST).isoformat()
-                res = requests.post(
-                    f"{SUPABASE_URL}/rest/v1/available_slots?on_conflict=date,staff_id",
-                    headers=slot_headers,
-                    json=batch
-                )
-                if res.status_code in [200, 201]:
-                    slots_saved += len(batch)
-                else:
-                    print(f"[SLOTS] バッチエラー: {res.status_code} - {res.text[:100]}", flush=True)
-            print(f"[SLOTS] {slots_saved}件の空き枠保存完了", flush=True)
-        except Exception as e:
-            print(f"[SLOTS] 保存エラー: {e}", flush=True)
-    
-    # === サロンボードにない予約をDBから削除 ===
-    if all_bookings:
-        try:
-            # スクレイピングで取得したbooking_idリスト
-            scraped_ids = set(b['booking_id'] for b in all_bookings)
-            
-            # 対象日付範囲のDB予約を取得
-            start_date = today.strftime('%Y-%m-%d')
-            end_date = (today + timedelta(days=days_limit)).strftime('%Y-%m-%d')
-            
-            db_res = requests.get(
-                f"{SUPABASE_URL}/rest/v1/8weeks_bookings?visit_datetime=gte.{start_date}&visit_datetime=lt.{end_date}&select=booking_id",
-                headers=headers
-            )
-            
-            if db_res.status_code == 200:
-                db_bookings = db_res.json()
-                db_ids = set(b['booking_id'] for b in db_bookings)
-                
-                # DBにあるがスクレイピング結果にない = 削除された予約
-                to_delete = db_ids - scraped_ids
-                
-                if to_delete:
-                    delete_headers = headers.copy()
-                    for bid in to_delete:
-                        del_res = requests.delete(
-                            f"{SUPABASE_URL}/rest/v1/8weeks_bookings?booking_id=eq.{bid}",
-                            headers=delete_headers
-                        )
-                        if del_res.status_code in [200, 204]:
-                            print(f"[DELETE] {bid} 削除（サロンボードに存在しない）", flush=True)
-                    print(f"[DELETE] {len(to_delete)}件の古い予約を削除", flush=True)
-                else:
-                    print("[DELETE] 削除対象なし", flush=True)
-        except Exception as e:
-            print(f"[DELETE] 削除処理エラー: {e}", flush=True)
+    # 削除の対象は今回解析できた日付だけ（スケジュールまで取れた日付＋差分モードで変化のあった日付）
+    slot_dates = {str(s['date']) for s in all_slots}
+    scope_dates = slot_dates | (set(store.changed_dates) if store is not None else set())
+    booking_diff = diff_bookings(all_bookings, existing_cache, scope_dates)
+    changed_slots = diff_slots(all_slots, load_slots(slot_dates) or {})
     
-    # === 同一電話番号・同一日時の重複削除 ===
-    # 次回予約(YF)とホットペッパー(BE)が重複した場合、次回予約(YF)を優先
-    # 理由: ホットペッパー予約をキャンセル後、店舗で次回予約を入れるケースがある
+    writer = WriteStage()
+    now = datetime.now(JST).isoformat()
     try:
-        db_res = requests.get(
-            f"{SUPABASE_URL}/rest/v1/8weeks_bookings?select=booking_id,phone,visit_datetime",
-            headers=headers
-        )
-        if db_res.status_code == 200:
-            db_bookings = db_res.json()
-            seen = {}
-            duplicates_to_delete = []
-            for b in db_bookings:
-                key = f"{b['phone']}_{b['visit_datetime']}"
-                if key in seen:
-                    # 重複発見: ホットペッパー(BE)を削除、次回予約(YF)を残す
-                    existing = seen[key]
-                    if b['booking_id'].startswith('BE') and existing.startswith('YF'):
-                        duplicates_to_delete.append(b['booking_id'])
-                    elif b['booking_id'].startswith('YF') and existing.startswith('BE'):
-                        duplicates_to_delete.append(existing)
-                        seen[key] = b['booking_id']
-                else:
-                    seen[key] = b['booking_id']
-            
-            if duplicates_to_delete:
-                for bid in duplicates_to_delete:
-                    del_res = requests.delete(
-                        f"{SUPABASE_URL}/rest/v1/8weeks_bookings?booking_id=eq.{bid}",
-                        headers=headers
-                    )
-                    if del_res.status_code in [200, 204]:
-                        print(f"[重複削除] {bid}（ホットペッパー）を削除", flush=True)
-                print(f"[重複削除] {len(duplicates_to_delete)}件削除完了", flush=True)
+        writer.upsert("8weeks_bookings", booking_diff['upsert'], on_conflict="booking_id")
+        writer.upsert("available_slots", [{**s, 'updated_at': now} for s in changed_slots], on_conflict="date,staff_id")
+        # 変化のなかった空き枠（差分モードで開かなかった日付も含む）は確認時刻だけ更新（LIFF側で古いと判定されないように）
+        touch_dates = slot_dates | (set(store.unchanged_dates) if store is not None else set())
+        writer.touch("available_slots", "date", touch_dates, {'updated_at': now})
+        # SalonBoardから消えた予約の削除。対象は今回解析した日付（scope_dates）の予約だけで、範囲外・未取得の日付は消さない
+        writer.delete_in("8weeks_bookings", "booking_id", booking_diff['delete'])
     except Exception as e:
-        print(f"[重複削除] エラー: {e}", flush=True)
+        writer.errors += 1
+        print(f"[WRITE] 書き込みエラー: {e}", flush=True)
+    
+    write_report = writer.report()
+    write_errors = writer.errors
+    bookings_stats = write_report['tables'].get('8weeks_bookings', {})
+    total_saved = bookings_stats.get('written', 0)
+    deleted = bookings_stats.get('deleted', 0)
+    slots_saved = write_report['tables'].get('available_slots', {}).get('written', 0)
+    if booking_diff['delete']:
+        print(f"[DELETE] サロンボードに存在しない予約 {deleted}/{len(booking_diff['delete'])}件を削除: "
+              f"{', '.join(booking_diff['delete'][:30])}", flush=True)
+    print(f"[WRITE] 予約: 追加{booking_diff['inserted']} 変更{booking_diff['updated']} 変化なし{booking_diff['unchanged']} "
+          f"削除{deleted} / 空き枠: {slots_saved}/{len(all_slots)}行 / "
+          f"{write_report['requests']}リクエスト {write_report['seconds']}秒", flush=True)
     
     # 成功したのでカウンターリセット
     reset_failure_count()
     
+    # フィンガープリントはDB書き込みが全て成功した場合のみ保存（失敗時は次回もう一度解析させる）
+    if store is not None:
+        if write_errors:
+            print(f"[FINGERPRINT] 書き込みエラー{write_errors}件のため保存しない", flush=True)
+        else:
+            try:
+                store.commit(keep_from=today.strftime('%Y%m%d'))
+            except Exception as e:
+                print(f"[FINGERPRINT] 保存エラー: {e}", flush=True)
+    
+    report = {
+        'mode': 'incremental' if store is not None else 'full',
+        'days_limit': days_limit,
+        **(store.report() if store is not None else {}),
+        'bookings_written': total_saved,
+        'bookings_unchanged': booking_diff['unchanged'],
+        'bookings_duplicates': len(duplicates),
+        'slots_written': slots_saved,
+        'bookings_deleted': deleted,
+        'delete_skipped_dates': booking_diff['skipped_dates'],
+        'write_errors': write_errors,
+        'write': write_report,
+        'enrich': enrich_report,
+        'scrape': {
+            'dates': len(day_offsets),
+            'engine': SCRAPE_ENGINE,
+            'browser_dates': len(browser_offsets),
+            'http': http.report() if http is not None else None,
+            'failed_dates': failed_dates,
+            'workers_final': scheduler.workers,
+            'worker_changes': scheduler.changes,
+            'utilisation': pool_metrics['utilisation'],
+            'scrape_seconds': round(elapsed, 1),
+        },
+        'elapsed_seconds': round(time.time() - run_started, 1),
+    }
+    print(f"[REPORT] {json.dumps(report, ensure_ascii=False)}", flush=True)
+    try:
+        os.makedirs(os.path.dirname(LAST_REPORT_FILE), exist_ok=True)
+        with open(LAST_REPORT_FILE, 'w') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+    except OSError as e:
+        print(f"[REPORT] 保存エラー: {e}", flush=True)
+    
     print(f"\n[完了] {total_saved}件の予約を保存", flush=True)
     print(f"[{datetime.now(JST)}] 8週間予約スクレイピング（並列処理版）完了", flush=True)
 
+
+def refresh_day(date_str, pool=None):
+    """指定日（YYYYMMDD）の空き枠だけを取り直してavailable_slotsに保存（LIFFの古い日付の再取得用）"""
+    today = datetime.now(JST)
+    target = datetime.strptime(date_str, '%Y%m%d').replace(tzinfo=JST)
+    day_offset = (target.date() - today.date()).days
+    if day_offset < 0:
+        print(f"[REFRESH] 過去日のためスキップ: {date_str}", flush=True)
+        return 0
+
+    _, slots = scrape_date_range(0, day_offset, day_offset + 1, {}, None, today, pool)
+    if not slots:
+        print(f"[REFRESH] {date_str} 空き枠取得なし", flush=True)
+        return 0
+
+    now = datetime.now(JST).isoformat()
+    for slot in slots:
+        slot['updated_at'] = now
+    res = supabase.upsert("available_slots", slots, on_conflict="date,staff_id")
+    if res.status_code not in [200, 201]:
+        print(f"[REFRESH] 保存エラー: {res.status_code} - {res.text[:100]}", flush=True)
+        return 0
+    print(f"[REFRESH] {date_str} 空き枠{len(slots)}件を更新", flush=True)
+    return len(slots)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,632 @@
+const API_BASE = "https://salon-absence-system-production.up.railway.app";
+
+function formatDate(dateStr) {
+    const match = dateStr.match(/(\d{4})[-\/](\d{2})[-\/](\d{2}).*?(\d{2}):(\d{2})/);
+    if (match) {
+const year = match[1];
+const month = parseInt(match[2]);
+const day = parseInt(match[3]);
+const hour = match[4];
+const min = match[5];
+const date = new Date(year, month - 1, day);
+const days = ['日', '月', '火', '水', '木', '金', '土'];
+const dayOfWeek = days[date.getDay()];
+return `${month}月${day}日(${dayOfWeek}) ${hour}:${min}〜`;
+    }
+    return dateStr;
+}
+let userProfile = null;
+let lineUserId = null;
+let currentPhone = null;
+
+async function initLiff() {
+    try {
+        document.getElementById('loading').innerHTML = 'LIFF初期化中...';
+        await liff.init({ liffId: LIFF_ID });
+        
+        if (!liff.isLoggedIn()) {
+            document.getElementById('loading').innerHTML = 'ログイン中...';
+            liff.login();
+            return;
+        }
+        
+        document.getElementById('loading').innerHTML = 'プロフィール取得中...';
+        userProfile = await liff.getProfile();
+        lineUserId = userProfile.userId;
+        document.getElementById('user-info').innerHTML = `<strong>${userProfile.displayName}</strong> 様`;
+        document.getElementById('user-info').style.display = 'block';
+        document.getElementById('user-info').innerHTML += ' <button onclick="logoutLiff()" style="margin-left:10px;padding:5px 10px;font-size:12px;background:#666666;color:white;border:none;border-radius:3px;">ログアウト</button>';
+        
+        await checkRegistration(lineUserId);
+    } catch (error) {
+        document.getElementById('loading').innerHTML = 'エラー: ' + error.message + '<br><br><button onclick="location.reload()">再読み込み</button>';
+        console.error('LIFF init error:', error);
+    }
+}
+
+async function logoutLiff() {
+    await fetch(API_BASE + '/api/liff/unlink', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ line_user_id: lineUserId })
+    });
+    liff.logout();
+    location.reload();
+}
+
+async function checkRegistration(lineUserId) {
+    try {
+        document.getElementById('loading').innerHTML = '確認中...';
+        const response = await fetch(API_BASE + `/api/liff/check-registration?line_user_id=${lineUserId}`);
+        const data = await response.json();
+        
+        document.getElementById('loading').style.display = 'none';
+        
+        if (data.registered && data.phone) {
+            await loadBookings(data.phone);
+        } else {
+            document.getElementById('phone-form').style.display = 'block';
+        }
+    } catch (error) {
+        document.getElementById('loading').style.display = 'none';
+        document.getElementById('phone-form').style.display = 'block';
+        console.error('Check registration error:', error);
+    }
+}
+
+async function submitPhone() {
+    const phone = document.getElementById('phone-input').value.replace(/[^0-9]/g, '');
+    
+    if (phone.length < 10) {
+        alert('正しい電話番号を入力してください');
+        return;
+    }
+    
+    try {
+        // 電話番号をLINE IDと紐付けて保存
+        const response = await fetch(API_BASE + '/api/liff/register-phone', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ line_user_id: lineUserId, phone: phone })
+        });
+        const data = await response.json();
+        
+        if (data.success) {
+            document.getElementById('phone-form').style.display = 'none';
+            await loadBookings(phone);
+        } else {
+            alert(data.message || '登録に失敗しました');
+        }
+    } catch (error) {
+        alert('エラーが発生しました');
+    }
+}
+
+let bookings = [];  // グローバル変数
+
+async function loadBookings(phone) {
+    currentPhone = phone;  // グローバル変数に保存
+    try {
+        const response = await fetch(API_BASE + `/api/liff/bookings-by-phone?phone=${phone}`);
+        const data = await response.json();
+        
+        if (data.bookings && data.bookings.length > 0) {
+            bookings = data.bookings;  // グローバル変数に保存
+            let html = '';
+            data.bookings.forEach(booking => {
+                const isNextBooking = booking.is_next_booking;
+                const statusText = isNextBooking ? '予約確定【次回予約分】' : '予約確定【ホットペッパー】';
+                const staffDisplay = booking.staff ? booking.staff + '（￥330）' : '指名なし';
+                html += `
+                    <div class="booking-card" data-booking-id="${booking.booking_id}">
+                        <span class="booking-status">${statusText}</span>
+                        <div class="booking-date">${formatDate(booking.visit_datetime)}</div>
+                        <div class="booking-menu">
+                            <div class="booking-menu-label">施術メニュー</div>
+                            <div class="booking-menu-text">${booking.menu || '未設定'}</div>
+                            
+                        </div>
+                        <div style="font-size:13px;color:#666;margin:10px 0;">指名スタッフ：${staffDisplay}</div>
+                        ${isNextBooking 
+                            ? `<button class="btn btn-change" onclick="changeBooking('${booking.booking_id}', '${booking.menu || ""}', '${booking.staff || ""}', ${booking.is_next_booking})">日時を変更する</button>`
+                            : `<button class="btn btn-change" onclick="window.open('https://beauty.hotpepper.jp/CSP/kr/reserve/?storeId=H000537368', '_blank')">ホットペッパーで変更</button>`
+                        }
+                        <div class="btn-cancel" onclick="cancelBooking('${booking.booking_id}')">この予約をキャンセル</div>
+                    </div>
+                `;
+            });
+            document.getElementById('bookings').innerHTML = html;
+        } else {
+            document.getElementById('bookings').innerHTML = '<div class="no-booking">現在予約はありません</div>';
+        }
+    } catch (error) {
+        document.getElementById('bookings').innerHTML = '<div class="no-booking">予約の取得に失敗しました</div>';
+    }
+}
+
+let calendarData = {};
+let currentBookingId = null;
+let currentIsNextBooking = false;
+let currentBookingMenu = '';
+let currentBookingStaff = '';
+let currentBookingDuration = 60;
+let currentWeek = 0;
+
+async function changeBooking(bookingId, menu, staff, isNextBooking) {
+    currentBookingId = bookingId;
+    currentBookingMenu = menu || '未設定';
+    currentBookingStaff = staff || 'なし';
+    currentIsNextBooking = isNextBooking || false;
+    
+    // ローディング表示
+    document.getElementById('bookings').innerHTML = `
+        <div style="text-align:center;padding:60px 20px;">
+            <div style="width:50px;height:50px;border:4px solid #f3f3f3;border-top:4px solid #C43357;border-radius:50%;animation:spin 1s linear infinite;margin:0 auto 20px;"></div>
+            <p style="color:#666;font-size:14px;">読み込み中...</p>
+        </div>
+        <style>@keyframes spin { 0% { transform: rotate(0deg); } 100% { transform: rotate(360deg); } }</style>
+    `;
+    
+    // 現在の予約情報を取得
+    const bookingCard = document.querySelector(`[data-booking-id="${bookingId}"]`) || document.querySelector('.booking-card');
+    if (bookingCard) {
+        const menuEl = bookingCard.querySelector('.booking-menu');
+        currentBookingMenu = menuEl ? menuEl.innerText.replace('メニュー：', '') : '未設定';
+    }
+
+    // メニュー名から施術時間を取得（予約一覧に含まれていればそれを使う）
+    currentBookingDuration = 60;
+    const knownBooking = bookings.find(b => String(b.booking_id) === String(bookingId));
+    if (knownBooking && knownBooking.duration) {
+        currentBookingDuration = knownBooking.duration;
+    } else try {
+        const durationRes = await fetch(API_BASE + '/api/liff/menu-duration?menu=' + encodeURIComponent(currentBookingMenu));
+        const durationData = await durationRes.json();
+        if (durationData.success && durationData.duration) {
+            currentBookingDuration = durationData.duration;
+        }
+    } catch (e) {
+        console.log('施術時間取得エラー', e);
+    }
+    
+    // メニュー選択画面を表示（ホットペッパー風UI）
+    document.getElementById('bookings').innerHTML = `
+        <div id="menu-selection" style="font-family:-apple-system,BlinkMacSystemFont,'Hiragino Sans',sans-serif;">
+            <!-- ステップインジケーター -->
+            <div style="display:flex;justify-content:center;align-items:center;padding:20px 15px;background:#fff;border-bottom:1px solid #E0E0E0;">
+                <div style="display:flex;align-items:center;">
+                    <div style="width:28px;height:28px;border-radius:50%;background:#E85298;color:#fff;display:flex;align-items:center;justify-content:center;font-size:14px;font-weight:bold;">1</div>
+                    <span style="margin-left:8px;font-size:13px;color:#E85298;font-weight:bold;">メニュー</span>
+                </div>
+                <div style="width:30px;height:2px;background:#E0E0E0;margin:0 8px;"></div>
+                <div style="display:flex;align-items:center;">
+                    <div style="width:28px;height:28px;border-radius:50%;background:#E0E0E0;color:#999;display:flex;align-items:center;justify-content:center;font-size:14px;">2</div>
+                    <span style="margin-left:8px;font-size:13px;color:#999;">日時</span>
+                </div>
+                <div style="width:30px;height:2px;background:#E0E0E0;margin:0 8px;"></div>
+                <div style="display:flex;align-items:center;">
+                    <div style="width:28px;height:28px;border-radius:50%;background:#E0E0E0;color:#999;display:flex;align-items:center;justify-content:center;font-size:14px;">3</div>
+                    <span style="margin-left:8px;font-size:13px;color:#999;">確認</span>
+                </div>
+            </div>
+            
+            <div style="padding:15px;">
+                <!-- 選択中のメニュー -->
+                <div style="background:#FFF5F8;padding:15px;border:1px solid #FFCCE0;border-radius:8px;margin-bottom:20px;">
+                    <div style="font-size:12px;color:#E85298;margin-bottom:8px;font-weight:bold;">選択中のメニュー</div>
+                    <div style="font-size:15px;color:#333;font-weight:500;">${currentBookingMenu}</div>
+                    <div style="font-size:13px;color:#666;margin-top:8px;">
+                        所要時間：<span id="duration-display" style="font-weight:bold;color:#E85298;">${formatDuration(currentBookingDuration)}</span>
+                    </div>
+                </div>
+                
+                <!-- メニュー変更 -->
+                <div style="margin-bottom:20px;">
+                    <label style="font-size:14px;color:#333;display:block;margin-bottom:10px;font-weight:500;">メニューを変更する</label>
+                    <select id="menu-select" style="width:100%;padding:14px;border:1px solid #E0E0E0;border-radius:8px;font-size:15px;background:#fff;appearance:none;background-image:url('data:image/svg+xml;charset=US-ASCII,<svg xmlns=%22http://www.w3.org/2000/svg%22 width=%2212%22 height=%2212%22 viewBox=%220 0 12 12%22><path fill=%22%23666%22 d=%22M6 8L1 3h10z%22/></svg>');background-repeat:no-repeat;background-position:right 12px center;" onchange="updateSelectedMenu()">
+                        <option value="">変更しない（現在のメニューのまま）</option>
+                    </select>
+                </div>
+                
+                <input type="hidden" id="duration-select" value="${currentBookingDuration}">
+                
+                <!-- オプション選択 -->
+                <div style="margin-bottom:20px;">
+                    <label style="font-size:14px;color:#333;display:block;margin-bottom:10px;font-weight:500;">オプション</label>
+                    <select id="option-select" style="width:100%;padding:14px;border:1px solid #E0E0E0;border-radius:8px;font-size:15px;background:#fff;">
+                        <option value="">未選択</option>
+                        <option value="off_shampoo_1000">オフあり+アイシャンプー ¥1,000</option>
+                        <option value="off_500">オフあり ¥500</option>
+                        <option value="off_none">オフなし</option>
+                    </select>
+                    <p style="font-size:11px;color:#E85298;margin-top:8px;">※次回予約特典のご予約は無料ですが、必ずご選択をお願いします。</p>
+                </div>
+                
+                <!-- スタッフ選択 -->
+                <div style="margin-bottom:25px;">
+                    <label style="font-size:14px;color:#333;display:block;margin-bottom:10px;font-weight:500;">スタッフ</label>
+                    <div style="display:flex;gap:10px;">
+                        <label id="staff-no" style="flex:1;padding:14px;border:2px solid #E85298;border-radius:8px;text-align:center;cursor:pointer;background:#FFF5F8;color:#E85298;font-weight:500;" onclick="selectStaff('no')">
+                            <input type="radio" name="staff-pref" value="no" checked style="display:none;"> 指名しない
+                        </label>
+                        <label id="staff-yes" style="flex:1;padding:14px;border:2px solid #E0E0E0;border-radius:8px;text-align:center;cursor:pointer;background:#fff;color:#666;" onclick="selectStaff('yes')">
+                            <input type="radio" name="staff-pref" value="yes" style="display:none;"> 指名する
+                        </label>
+                    </div>
+                </div>
+                
+                <!-- 次へボタン -->
+                <button id="check-availability-btn" class="btn btn-primary" style="width:100%;padding:16px;font-size:16px;border-radius:8px;background:#E85298;border:none;color:#fff;font-weight:bold;cursor:pointer;" onclick="showCalendar()">この内容で次へ</button>
+                <div style="text-align:center;margin-top:15px;">
+                    <span style="color:#666;font-size:13px;cursor:pointer;text-decoration:underline;" onclick="loadBookings(currentPhone)">← 予約一覧に戻る</span>
+                </div>
+            </div>
+        </div>
+    `;
+    loadMenus();
+}
+
+
+
+
+function showSalonTab() {
+    document.getElementById('tab-salon').style.borderBottom = '2px solid #E85298';
+    document.getElementById('tab-salon').style.color = '#E85298';
+    document.getElementById('tab-salon').style.fontWeight = 'bold';
+    document.getElementById('tab-staff').style.borderBottom = 'none';
+    document.getElementById('tab-staff').style.color = '#999';
+    document.getElementById('tab-staff').style.fontWeight = 'normal';
+    document.getElementById('calendar-table').style.display = 'block';
+    document.getElementById('staff-view').style.display = 'none';
+}
+
+async function showStaffTab() {
+    document.getElementById('tab-staff').style.borderBottom = '2px solid #E85298';
+    document.getElementById('tab-staff').style.color = '#E85298';
+    document.getElementById('tab-staff').style.fontWeight = 'bold';
+    document.getElementById('tab-salon').style.borderBottom = 'none';
+    document.getElementById('tab-salon').style.color = '#999';
+    document.getElementById('tab-salon').style.fontWeight = 'normal';
+    document.getElementById('calendar-table').style.display = 'none';
+    document.getElementById('week-nav').style.display = 'none';
+    
+    if (!document.getElementById('staff-view')) {
+        const staffDiv = document.createElement('div');
+        staffDiv.id = 'staff-view';
+        document.getElementById('calendar-table').parentNode.insertBefore(staffDiv, document.getElementById('calendar-table').nextSibling);
+    }
+    
+    const staffView = document.getElementById('staff-view');
+    staffView.style.display = 'block';
+    staffView.innerHTML = '<div style="text-align:center;padding:20px;color:#666;">スタッフ読み込み中...</div>';
+    
+    try {
+        const res = await fetch(API_BASE + '/api/liff/staff-list');
+        const data = await res.json();
+        
+        if (data.success && data.staff) {
+            let html = '<div style="padding:10px;">';
+            html += '<div style="font-size:14px;color:#333;margin-bottom:15px;font-weight:bold;">スタッフを選択してください</div>';
+            html += '<div style="display:flex;flex-wrap:wrap;gap:10px;">';
+            
+            data.staff.forEach(s => {
+                html += '<button onclick="loadStaffSchedule(&#39;' + s.name + '&#39;)" style="padding:12px 20px;border:2px solid #E85298;border-radius:8px;background:#fff;color:#E85298;font-size:14px;cursor:pointer;">' + s.name + '</button>';
+            });
+            
+            html += '</div>';
+            html += '<div id="staff-schedule" style="margin-top:20px;"></div>';
+            html += '</div>';
+            staffView.innerHTML = html;
+        } else {
+            staffView.innerHTML = '<div style="text-align:center;padding:40px;color:#666;">スタッフ情報を取得できませんでした</div>';
+        }
+    } catch (e) {
+        staffView.innerHTML = '<div style="text-align:center;padding:40px;color:#666;">エラーが発生しました</div>';
+    }
+}
+
+async function loadStaffSchedule(staffName) {
+    const scheduleDiv = document.getElementById('staff-schedule');
+    scheduleDiv.innerHTML = '<div style="text-align:center;padding:20px;color:#666;">' + staffName + 'の予約を読み込み中...</div>';
+    
+    try {
+        const res = await fetch(API_BASE + '/api/liff/staff-availability?staff=' + encodeURIComponent(staffName));
+        const data = await res.json();
+        
+        if (data.success) {
+            if (data.bookings.length === 0) {
+                scheduleDiv.innerHTML = '<div style="padding:15px;background:#FFF5F8;border-radius:8px;color:#666;">' + staffName + 'の予約はありません</div>';
+            } else {
+                let html = '<div style="font-size:14px;color:#333;margin-bottom:10px;font-weight:bold;">' + staffName + 'の予約一覧（' + data.bookings.length + '件）</div>';
+                html += '<div style="max-height:300px;overflow-y:auto;">';
+                
+                data.bookings.sort((a, b) => a.visit_datetime.localeCompare(b.visit_datetime));
+                
+                data.bookings.forEach(b => {
+                    const dt = b.visit_datetime || '';
+                    html += '<div style="padding:10px;border:1px solid #E0E0E0;border-radius:5px;margin-bottom:8px;background:#fff;">';
+                    html += '<div style="font-size:13px;color:#E85298;font-weight:bold;">' + dt + '</div>';
+                    html += '<div style="font-size:12px;color:#666;margin-top:5px;">' + (b.customer_name || '') + '</div>';
+                    html += '<div style="font-size:11px;color:#999;margin-top:3px;">' + (b.menu || '') + '</div>';
+                    html += '</div>';
+                });
+                
+                html += '</div>';
+                scheduleDiv.innerHTML = html;
+            }
+        } else {
+            scheduleDiv.innerHTML = '<div style="text-align:center;padding:20px;color:#666;">取得に失敗しました</div>';
+        }
+    } catch (e) {
+        scheduleDiv.innerHTML = '<div style="text-align:center;padding:20px;color:#666;">エラーが発生しました</div>';
+    }
+}
+
+function formatDuration(minutes) {
+    const hours = Math.floor(minutes / 60);
+    const mins = minutes % 60;
+    if (hours > 0 && mins > 0) {
+        return hours + '時間' + mins + '分';
+    } else if (hours > 0) {
+        return hours + '時間';
+    } else {
+        return mins + '分';
+    }
+}
+
+function selectStaff(value) {
+    const noLabel = document.getElementById('staff-no');
+    const yesLabel = document.getElementById('staff-yes');
+    if (value === 'no') {
+        noLabel.style.border = '2px solid #E85298';
+        noLabel.style.background = '#FFF5F8';
+        noLabel.style.color = '#E85298';
+        yesLabel.style.border = '2px solid #E0E0E0';
+        yesLabel.style.background = '#fff';
+        yesLabel.style.color = '#666';
+        document.querySelector('input[name="staff-pref"][value="no"]').checked = true;
+    } else {
+        yesLabel.style.border = '2px solid #E85298';
+        yesLabel.style.background = '#FFF5F8';
+        yesLabel.style.color = '#E85298';
+        noLabel.style.border = '2px solid #E0E0E0';
+        noLabel.style.background = '#fff';
+        noLabel.style.color = '#666';
+        document.querySelector('input[name="staff-pref"][value="yes"]').checked = true;
+    }
+}
+
+let selectedMenuCouponId = null;
+
+async function loadMenus() {
+    try {
+        const endpoint = currentIsNextBooking ? '/api/liff/menus-next' : '/api/liff/menus';
+        const res = await fetch(API_BASE + endpoint);
+        const data = await res.json();
+        if (data.success && data.menus) {
+            const select = document.getElementById('menu-select');
+            // 次回予約の場合は【次回】メニューのみ、通常は【全員】を除外
+            const filteredMenus = currentIsNextBooking 
+                ? data.menus.filter(m => m.name.includes('【次回】'))
+                : data.menus.filter(m => !m.name.includes('【全員】'));
+            filteredMenus.forEach(m => {
+                const opt = document.createElement('option');
+                opt.value = m.id;
+                opt.dataset.duration = m.duration || 60;
+                const price = m.price ? ' ¥' + m.price.toLocaleString() : '';
+                opt.textContent = m.name.replace(/^《[^》]+》\s*/, '').replace(/^【次回】/, '') + price;
+                select.appendChild(opt);
+            });
+        }
+    } catch (e) {
+        console.error('メニュー取得エラー', e);
+    }
+}
+
+function updateSelectedMenu() {
+    const select = document.getElementById('menu-select');
+    selectedMenuCouponId = select.value || null;
+    if (select.value) {
+        currentBookingMenu = select.options[select.selectedIndex].textContent;
+        const duration = parseInt(select.options[select.selectedIndex].dataset.duration);
+        if (duration) {
+            const durationSelect = document.getElementById('duration-select');
+            durationSelect.value = duration;
+            currentBookingDuration = duration;
+            const hours = Math.floor(duration / 60);
+            const mins = duration % 60;
+            let display = '';
+            if (hours > 0) display += hours + '時間';
+            if (mins > 0) display += mins + '分';
+            document.getElementById('duration-display').textContent = display || '1時間';
+        }
+        // ボタンを有効化
+        const btn = document.getElementById('check-availability-btn');
+        btn.disabled = false;
+        btn.style.opacity = '1';
+        btn.style.cursor = 'pointer';
+        btn.textContent = '空き状況を確認する';
+    }
+}
+
+function updateDuration() {
+    currentBookingDuration = parseInt(document.getElementById('duration-select').value);
+}
+
+async function showCalendar() {
+    // オプション未選択チェック
+    const optionSelect = document.getElementById('option-select');
+    if (optionSelect && optionSelect.value === '') {
+        alert('オプションを選択してください');
+        return;
+    }
+    document.getElementById('bookings').innerHTML = `
+        <div id="calendar-view" style="font-family:-apple-system,BlinkMacSystemFont,'Hiragino Sans',sans-serif;">
+            <div style="background:#FFF5F8;padding:15px;border:1px solid #FFCCE0;border-radius:8px;margin:15px;">
+                <div style="font-size:12px;color:#E85298;margin-bottom:8px;font-weight:bold;">選択済みクーポン・メニュー</div>
+                <div style="font-size:15px;color:#333;font-weight:500;">${currentBookingMenu}</div>
+                <div style="font-size:13px;color:#666;margin-top:8px;">所要時間：<span style="font-weight:bold;color:#E85298;">${formatDuration(currentBookingDuration)}</span></div>
+            </div>
+            
+            <div style="display:flex;border-bottom:1px solid #E0E0E0;margin:0 -15px 15px;">
+                <div id="tab-salon" onclick="showSalonTab()" style="flex:1;text-align:center;padding:12px;border-bottom:2px solid #E85298;margin-bottom:-1px;font-weight:bold;color:#E85298;font-size:14px;cursor:pointer;">サロンの空き状況</div>
+                <div id="tab-staff" onclick="showStaffTab()" style="flex:1;text-align:center;padding:12px;color:#999;font-size:14px;cursor:pointer;">スタッフ別の空き状況</div>
+            </div>
+            
+            <div id="calendar-loading" style="text-align:center;padding:30px;color:#666;">読み込み中...</div>
+            
+            <div id="week-nav" style="display:none;margin-bottom:15px;padding:0 5px;">
+                <div style="display:flex;justify-content:space-between;align-items:center;">
+                    <span onclick="changeWeek(-1)" style="color:#E85298;font-size:13px;cursor:pointer;">< 前の一週間</span>
+                    <span id="month-label" style="font-size:15px;font-weight:bold;color:#333;"></span>
+                    <span onclick="changeWeek(1)" style="color:#E85298;font-size:13px;cursor:pointer;">次の一週間 ></span>
+                </div>
+            </div>
+            
+            <div id="calendar-table" style="margin:0;overflow-x:hidden;"></div>
+            
+            <div style="margin-top:20px;padding:12px;background:#FFFBEB;border:1px solid #FDE68A;border-radius:5px;font-size:11px;color:#666;">
+                <p style="margin-bottom:5px;">◯ の日時から施術を開始することが出来ます。</p>
+                <p>ご希望の来店日時の ◯ を選択してください。</p>
+            </div>
+            
+            <div style="text-align:center;margin-top:20px;margin-bottom:40px;">
+                <span style="color:#666;font-size:13px;cursor:pointer;" onclick="loadBookings(currentPhone)">← 戻る</span>
+            </div>
+        </div>
+    `;
+    await loadCalendarData();
+    renderCalendar();
+}
+
+async function loadCalendarData() {
+    try {
+        // 施術時間で開始できる時刻はサーバー側で計算済み（日付ごとの開始時刻リスト）
+        const res = await fetch(API_BASE + '/api/liff/available-slots-range?duration=' + encodeURIComponent(currentBookingDuration));
+        const data = await res.json();
+        if (data.starts) {
+            calendarData = {};
+            Object.keys(data.starts).forEach(d => { calendarData[d] = new Set(data.starts[d]); });
+        }
+    } catch (e) {
+        console.error('空き枠取得エラー', e);
+    }
+    document.getElementById('calendar-loading').style.display = 'none';
+    document.getElementById('week-nav').style.display = 'block';
+}
+
+function changeWeek(delta) {
+    currentWeek += delta;
+    if (currentWeek < 0) currentWeek = 0;
+    if (currentWeek > 7) currentWeek = 7;
+    renderCalendar();
+}
+
+function renderCalendar() {
+    const today = new Date();
+    const startIdx = currentWeek * 7;
+    const dates = [];
+    for (let i = startIdx; i < startIdx + 7 && i < 56; i++) {
+        const d = new Date(today);
+        d.setDate(today.getDate() + i);
+        dates.push(d);
+    }
+    
+    document.getElementById('month-label').innerText = `${today.getFullYear()}年${dates[0].getMonth()+1}月`;
+    
+    const timeSlots = [];
+    for (let h = 9; h < 19; h++) {
+        for (let m = 0; m < 60; m += 10) {
+            if (h === 18 && m > 50) continue;
+            timeSlots.push(`${h}:${m.toString().padStart(2, '0')}`);
+        }
+    }
+    
+    const days = ['日', '月', '火', '水', '木', '金', '土'];
+    
+    let html = '<table style="border-collapse:collapse;font-size:10px;width:100%;table-layout:fixed;max-width:100%;">';
+    html += '<thead><tr><th style="border:1px solid #ddd;padding:8px;background:#f5f5f5;width:60px;"></th>';
+    
+    dates.forEach(d => {
+        const day = days[d.getDay()];
+        const color = d.getDay() === 0 ? '#e74c3c' : d.getDay() === 6 ? '#3498db' : '#333';
+        html += `<th style="border:1px solid #ddd;padding:8px;background:#f5f5f5;color:${color};text-align:center;">
+            <div style="font-size:16px;font-weight:bold;">${d.getDate()}</div>
+            <div style="font-size:11px;">(${day})</div>
+        </th>`;
+    });
+    html += '</tr></thead><tbody>';
+    
+    timeSlots.forEach(time => {
+        html += `<tr><td style="border:1px solid #ddd;padding:6px 8px;background:#f5f5f5;font-weight:bold;text-align:right;">${time}</td>`;
+        
+        dates.forEach(d => {
+            const dateStr = `${d.getFullYear()}${(d.getMonth()+1).toString().padStart(2,'0')}${d.getDate().toString().padStart(2,'0')}`;
+            const dayStarts = calendarData[dateStr];
+            let cellContent = '×';
+            let cellStyle = 'color:#ccc;';
+            
+            if (dayStarts) {
+                if (dayStarts.has(time)) {
+                    cellContent = `<a href="#" onclick="selectSlot('${currentBookingId}','${dateStr}','${time}');return false;" style="color:#e74c3c;font-weight:bold;text-decoration:none;font-size:16px;">◯</a>`;
+                    cellStyle = 'background:#fff;';
+                } else {
+                    cellContent = '×';
+                    cellStyle = 'color:#ccc;background:#f9f9f9;';
+                }
+            } else {
+                cellContent = 'ー';
+                cellStyle = 'color:#999;background:#f0f0f0;';
+            }
+            
+            html += `<td style="border:1px solid #ddd;padding:8px;text-align:center;height:32px;line-height:16px;${cellStyle}">${cellContent}</td>`;
+        });
+        html += '</tr>';
+    });
+    
+    html += '</tbody></table>';
+    document.getElementById('calendar-table').innerHTML = html;
+}
+
+async function selectSlot(bookingId, dateStr, time) {
+    const dateFormatted = `${dateStr.slice(0,4)}/${dateStr.slice(4,6)}/${dateStr.slice(6,8)}`;
+    if (confirm(`${dateFormatted} ${time}〜 に変更しますか？`)) {
+        document.getElementById('calendar-table').innerHTML = '<p style="text-align:center;padding:20px;">変更処理中...</p>';
+        const response = await fetch(API_BASE + '/api/liff/execute-change', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ booking_id: bookingId, new_date: dateStr, new_time: time, line_user_id: lineUserId })
+        });
+        const data = await response.json();
+        alert(data.message || '変更リクエストを送信しました');
+        if (data.success) loadBookings(currentPhone);
+    }
+}
+
+async function cancelBooking(bookingId) {
+    const booking = bookings.find(b => b.booking_id === bookingId);
+    if (confirm(`以下の予約をキャンセルしますか？
+
+お客様：${booking.customer_name}
+日時：${booking.visit_datetime}
+メニュー：${booking.menu}
+スタッフ：${booking.staff}`)) {
+        document.getElementById('bookings').innerHTML = '<div style="text-align:center;padding:40px;"><p>キャンセル処理中...</p></div>';
+        try {
+            const response = await fetch(API_BASE + '/api/liff/cancel-request', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ booking_id: bookingId, line_user_id: lineUserId })
+            });
+            const data = await response.json();
+            alert(data.message || 'キャンセル処理が完了しました');
+            loadBookings(currentPhone);
+        } catch (e) {
+            alert('エラーが発生しました');
+            loadBookings(currentPhone);
+        }
+    }
+}
+
+initLiff();
+    
@@ -0,0 +1,31 @@
+"""タスクワーカー（Webとは別プロセスでキャンセル・日時変更・スクレイピング・電話番号補完を実行）
+
+  TASK_WORKER=external python3 task_worker.py
+
+TASK_WORKER=external の時、Webプロセス（gunicorn）はタスクを登録するだけで実行しない。
+タスクの種類は utils/salonboard_jobs.py で登録する。Flaskアプリ・LINE Webhookのキューは読み込まず、
+LINEの未送信分はWebとは別のファイル（LINE_WORKER_OUTBOX_FILE）に保存する。
+止まっても実行中だったタスクは TASK_LEASE 秒後に別のワーカー（再起動後の自分）が引き継ぐ。
+"""
+import signal
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import utils.salonboard_jobs  # noqa: F401  （タスクの種類の登録）
+from utils.line_dispatcher import LINE_WORKER_OUTBOX_FILE
+from utils.line_sender import enable_line_outbox
+from utils.salonboard_tasks import notify_web_invalidate, task_queue
+from utils.task_queue import TaskWorker
+
+
+def main():
+    enable_line_outbox(LINE_WORKER_OUTBOX_FILE)
+    worker = TaskWorker(task_queue, on_invalidate=notify_web_invalidate)
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    worker.run_forever()
+
+
+if __name__ == '__main__':
+    main()
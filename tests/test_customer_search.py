@@ -0,0 +1,28 @@
+"""顧客検索（utils/customer_search.py）のテスト
+
+  python3 -m unittest discover tests
+"""
+import unittest
+from unittest import mock
+
+from utils.customer_index import CustomerIndex
+from utils.customer_search import NO_MATCH, customer_page, search_filter
+
+
+class NameSearchTest(unittest.TestCase):
+    def setUp(self):
+        self.index = CustomerIndex([{'id': '6f1c0a52-0000-4000-8000-000000000001', 'name': '山田 花子'}])
+
+    def test_match_uses_id_filter(self):
+        self.assertIn('id.in.(', search_filter('山田', self.index))
+
+    def test_zero_match_returns_empty_page_without_query(self):
+        self.assertIs(search_filter('存在しない名前', self.index), NO_MATCH)
+        with mock.patch('utils.customer_search.supabase') as supabase:
+            page = customer_page(q='存在しない名前', index=self.index)
+        supabase.get.assert_not_called()
+        self.assertEqual(page, {'rows': [], 'next': None, 'total': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
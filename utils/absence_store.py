@@ -0,0 +1,203 @@
+"""欠勤申請のストア（SQLite）
+
+absence_log.json を毎回読み書きしていた処理を置き換える。
+- 追加はINSERT 1回（IDは AUTOINCREMENT、同時申請でも取りこぼさない）
+- スタッフ・月・状態にインデックスを張り、一覧は月単位・ページ単位で取得する
+- 承認は pending の行だけを更新するので、二重承認でも通知は1回
+初回の利用時に absence_log.json の内容を1回だけ取り込む（JSONファイル自体は残す）。
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ABSENCE_DB = os.getenv('ABSENCE_DB', os.path.join(APP_DIR, 'data', 'absences.db'))
+
+COLUMNS = ('id', 'staff_name', 'reason', 'details', 'alternative_date', 'absence_date',
+           'submitted_at', 'status', 'approved_at')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS absences (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    staff_name TEXT NOT NULL,
+    reason TEXT,
+    details TEXT,
+    alternative_date TEXT,
+    absence_date TEXT,
+    submitted_at TEXT NOT NULL,
+    month TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    approved_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_absences_staff ON absences (staff_name, submitted_at);
+CREATE INDEX IF NOT EXISTS idx_absences_month ON absences (month, submitted_at);
+CREATE INDEX IF NOT EXISTS idx_absences_status ON absences (status, submitted_at);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def _row(row):
+    """テンプレート互換の辞書（id は従来どおり文字列）"""
+    absence = {k: row[k] for k in COLUMNS}
+    absence['id'] = str(row['id'])
+    return absence
+
+
+class AbsenceStore:
+    """欠勤申請テーブル（接続はスレッドごと、書き込みはSQLiteのトランザクションで直列化）"""
+
+    def __init__(self, path=ABSENCE_DB, legacy_file=None):
+        self.path = path
+        self.legacy_file = legacy_file
+        self._local = threading.local()
+        self._ready = False
+        self._setup_lock = threading.Lock()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if not self._ready:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        if not self._ready:
+            self._setup(conn)
+        return conn
+
+    def _setup(self, conn):
+        """初回の利用時にテーブル作成・absence_log.json の移行（import 時にはファイルを作らない）"""
+        with self._setup_lock:
+            if self._ready:
+                return
+            with conn:
+                conn.executescript(SCHEMA)
+            if self.legacy_file:
+                self._migrate(conn, self.legacy_file)
+            self._ready = True
+
+    # ===== 書き込み =====
+    def add(self, staff_name, reason, details, alternative_date, absence_date=None, submitted_at=None):
+        """申請を1件追加してIDを返す"""
+        submitted_at = submitted_at or datetime.now().isoformat()
+        with self._conn() as conn:
+            cur = conn.execute(
+                'INSERT INTO absences (staff_name, reason, details, alternative_date, absence_date, submitted_at, month) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (staff_name, reason, details, alternative_date,
+                 absence_date or datetime.now().strftime("%Y-%m-%d"), submitted_at, submitted_at[:7]))
+            return str(cur.lastrowid)
+
+    def approve(self, absence_id):
+        """pending なら approved にして行を返す（見つからない・承認済みなら None）"""
+        with self._conn() as conn:
+            cur = conn.execute(
+                "UPDATE absences SET status = 'approved', approved_at = ? WHERE id = ? AND status = 'pending'",
+                (datetime.now().isoformat(), absence_id))
+            if cur.rowcount == 0:
+                return None
+        return self.get(absence_id)
+
+    # ===== 読み取り =====
+    def get(self, absence_id):
+        row = self._conn().execute('SELECT * FROM absences WHERE id = ?', (absence_id,)).fetchone()
+        return _row(row) if row else None
+
+    def list(self, staff_name=None, status=None, month=None, limit=None, offset=0, newest_first=True):
+        """条件に合う申請を申請日時順に（limit/offset でページ分割）"""
+        where, params = self._where(staff_name, status, month)
+        sql = f"SELECT * FROM absences{where} ORDER BY submitted_at {'DESC' if newest_first else 'ASC'}, id"
+        if limit is not None:
+            sql += ' LIMIT ? OFFSET ?'
+            params += [limit, offset]
+        return [_row(r) for r in self._conn().execute(sql, params)]
+
+    def iter_rows(self, month=None, batch=500):
+        """申請を古い順に batch 件ずつ読み出す（エクスポート用、全件をメモリに載せない）"""
+        where, params = self._where(None, None, month)
+        cur = self._conn().execute(f'SELECT * FROM absences{where} ORDER BY submitted_at, id', params)
+        while True:
+            rows = cur.fetchmany(batch)
+            if not rows:
+                return
+            for r in rows:
+                yield _row(r)
+
+    def count(self, staff_name=None, status=None, month=None):
+        where, params = self._where(staff_name, status, month)
+        return self._conn().execute(f'SELECT COUNT(*) FROM absences{where}', params).fetchone()[0]
+
+    def months(self):
+        """[(YYYY-MM, 件数)] を新しい月から"""
+        rows = self._conn().execute('SELECT month, COUNT(*) FROM absences GROUP BY month ORDER BY month DESC')
+        return [(r[0], r[1]) for r in rows]
+
+    @staticmethod
+    def _where(staff_name, status, month):
+        clauses, params = [], []
+        for column, value in (('staff_name', staff_name), ('status', status), ('month', month)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    # ===== 移行 =====
+    def migrate_json(self, legacy_file):
+        """absence_log.json を1回だけ取り込む（IDは重複しない限り元の番号を使う）"""
+        return self._migrate(self._conn(), legacy_file)
+
+    def _migrate(self, conn, legacy_file):
+        # 複数のワーカーが同時に起動しても1回だけ取り込むよう、確認・取り込み・記録を1つの BEGIN IMMEDIATE で行う
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = self._import_json(conn, legacy_file)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        if result is None:
+            conn.execute('ROLLBACK')
+            return 0
+        conn.execute('COMMIT')
+        count, renumbered = result
+        if count:
+            print(f"[ABSENCE] {legacy_file} から {count}件を移行（ID振り直し {renumbered}件）", flush=True)
+        return count
+
+    @staticmethod
+    def _import_json(conn, legacy_file):
+        """トランザクション内で取り込み (件数, ID振り直し件数) を返す（移行済み・読み込めない時は None）"""
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+            return None
+        try:
+            with open(legacy_file, 'r', encoding='utf-8') as f:
+                absences = json.load(f)
+        except FileNotFoundError:
+            absences = []
+        except (OSError, ValueError) as e:
+            print(f"[ABSENCE] {legacy_file} を読み込めないため移行をスキップ: {e}", flush=True)
+            return None
+
+        # len()+1 で採番していたため重複IDがありうる：重複分は元の番号を全部入れた後に新しい番号で入れる
+        used, keep, renumber = set(), [], []
+        for a in absences:
+            legacy_id = str(a.get('id', ''))
+            if legacy_id.isdigit() and int(legacy_id) not in used:
+                used.add(int(legacy_id))
+                keep.append((int(legacy_id), a))
+            else:
+                renumber.append((None, a))
+
+        for row_id, a in keep + renumber:
+            submitted_at = a.get('submitted_at') or datetime.now().isoformat()
+            conn.execute(
+                'INSERT INTO absences (id, staff_name, reason, details, alternative_date, absence_date, '
+                'submitted_at, month, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (row_id, a.get('staff_name', ''), a.get('reason'), a.get('details'), a.get('alternative_date'),
+                 a.get('absence_date'), submitted_at, submitted_at[:7], a.get('status', 'pending')))
+        conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (datetime.now().isoformat(),))
+        return len(absences), len(renumber)
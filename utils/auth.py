@@ -0,0 +1,47 @@
+"""ログインユーザーと画面の認可デコレーター"""
+from functools import wraps
+
+from flask import redirect, session, url_for
+
+
+ADMIN_USERS = {
+    'admin': 'admin123'
+}
+
+STAFF_USERS = {
+    'kambara': {'password': 'kambara123', 'full_name': '神原良祐', 'line_id': 'U9022782f05526cf7632902acaed0cb08'},
+    'saori': {'password': 'saori123', 'full_name': 'Saori', 'line_id': 'U1ad150fa84a287c095eb98186a8cdc45'},
+    'ota': {'password': 'ota123', 'full_name': '太田由香利', 'line_id': 'U2c097f177a2c96b0732f6d15152d0d68'}
+}
+
+# LINE Webhookで受けたスタッフのLINE ID → 表示名
+staff_mapping = {
+    "U9022782f05526cf7632902acaed0cb08": {"name": "神原良祐さん"},
+    "U1ad150fa84a287c095eb98186a8cdc45": {"name": "Saoriさん"}
+}
+
+
+def login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'logged_in' not in session:
+            return redirect(url_for('staff.login_page'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'logged_in' not in session:
+            return redirect(url_for('staff.login_page'))
+        if session.get('role') != 'admin':
+            return redirect(url_for('staff.staff_absence'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def get_full_name(username):
+    if username in STAFF_USERS:
+        return STAFF_USERS[username]['full_name']
+    return username
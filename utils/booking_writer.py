@@ -0,0 +1,184 @@
+"""スクレイピング結果の書き込みステージ（差分をメモリで計算してまとめて書く）
+
+取得した予約は書き込む前に重複を除き（同じ booking_id、同じ電話番号・同じ日時の BE/YF）、
+開始時に読み込んだ 8weeks_bookings のスナップショットと比べて
+追加・変更の行だけを1回の upsert、消えた予約を booking_id=in.(...) の一括削除で反映する。
+空き枠も既存行と比べて変わった行だけ upsert し、確認時刻（updated_at）は日付単位の1回の PATCH で更新する。
+"""
+import os
+import time
+
+from utils.supabase_client import supabase
+
+BOOKING_COLUMNS = ('booking_id', 'customer_name', 'visit_datetime', 'staff', 'menu', 'phone', 'status',
+                   'booking_source', 'is_designated', 'staff_on_duty')
+SLOT_COLUMNS = ('date', 'staff_id', 'staff_name', 'is_day_off', 'slots')
+# 1リクエストの行数上限（通常は1回で収まる）
+UPSERT_CHUNK = int(os.getenv('SCRAPE_UPSERT_CHUNK', '1000'))
+# booking_id=in.(...) に並べるIDの上限（URL長対策）
+DELETE_CHUNK = 200
+WRITE_TIMEOUT = (3.05, 60)
+
+
+def _norm(value):
+    """比較用（None と空文字は同じとみなす）"""
+    return '' if value is None else value
+
+
+def booking_date(booking):
+    """visit_datetime（'2026-02-03 15:50:00'）→ 'YYYYMMDD'"""
+    return (booking.get('visit_datetime') or '')[:10].replace('-', '')
+
+
+def dedupe_bookings(bookings):
+    """(残す予約, 除いた booking_id のリスト)
+
+    同じ booking_id は後のものを残す。同じ電話番号・同じ日時で次回予約(YF)とホットペッパー(BE)が
+    両方ある場合は YF を残す（ホットペッパーをキャンセル後に店舗で次回予約を入れるケース）。
+    電話番号が空の予約は別のお客様の可能性があるので対象外。
+    """
+    by_id = {}
+    for b in bookings:
+        by_id[b['booking_id']] = b
+
+    dropped = []
+    seen = {}
+    for bid, b in by_id.items():
+        if not b.get('phone'):
+            continue
+        key = (b['phone'], b.get('visit_datetime'))
+        other = seen.get(key)
+        if other is None:
+            seen[key] = bid
+        elif bid.startswith('BE') and other.startswith('YF'):
+            dropped.append(bid)
+        elif bid.startswith('YF') and other.startswith('BE'):
+            dropped.append(other)
+            seen[key] = bid
+    drop = set(dropped)
+    return [b for bid, b in by_id.items() if bid not in drop], dropped
+
+
+def diff_bookings(scraped, existing, scope_dates):
+    """スナップショット existing（booking_id → 行）との差分
+
+    scope_dates（今回解析した日付 YYYYMMDD）の既存予約のうち、取得結果にないものを削除対象にする。
+    ただし既存予約があるのに取得結果が0件の日付は、一覧の取りこぼし（空のページ）とみなして削除しない
+    （skipped_dates に入れる。本当に全件キャンセルされた日付は次に1件以上取れた時に消える）。
+    """
+    upsert, inserted, updated = [], 0, 0
+    scraped_ids = set()
+    for b in scraped:
+        row = {c: b.get(c) for c in BOOKING_COLUMNS}
+        scraped_ids.add(row['booking_id'])
+        old = existing.get(row['booking_id'])
+        if old is None:
+            inserted += 1
+        elif any(_norm(old.get(c)) != _norm(row[c]) for c in BOOKING_COLUMNS):
+            updated += 1
+        else:
+            continue
+        upsert.append(row)
+    scraped_dates = {booking_date(b) for b in scraped}
+    delete, skipped_dates = [], set()
+    for bid, old in existing.items():
+        date_str = booking_date(old)
+        if bid in scraped_ids or date_str not in scope_dates:
+            continue
+        if date_str not in scraped_dates:
+            skipped_dates.add(date_str)
+            continue
+        delete.append(bid)
+    if skipped_dates:
+        print(f"[WRITE] 取得0件のため削除しない日付: {', '.join(sorted(skipped_dates))}", flush=True)
+    return {'upsert': upsert, 'delete': sorted(delete), 'inserted': inserted, 'updated': updated,
+            'unchanged': len(scraped_ids) - inserted - updated, 'skipped_dates': sorted(skipped_dates)}
+
+
+def diff_slots(scraped, existing):
+    """既存の空き枠行（(date, staff_id) → 行）と比べて変わった行だけ返す"""
+    changed = []
+    for s in scraped:
+        row = {c: s.get(c) for c in SLOT_COLUMNS}
+        old = existing.get((str(row['date']), str(row['staff_id'])))
+        if old is None or any(_norm(old.get(c)) != _norm(row[c]) for c in SLOT_COLUMNS[2:]):
+            changed.append(row)
+    return changed
+
+
+def load_slots(dates):
+    """対象日付の available_slots を (date, staff_id) → 行 で返す（取得失敗時は None＝全行書く）"""
+    if not dates:
+        return {}
+    res = supabase.get(f"available_slots?date=in.({','.join(sorted(dates))})&select={','.join(SLOT_COLUMNS)}",
+                       timeout=WRITE_TIMEOUT)
+    if res.status_code != 200:
+        print(f"[WRITE] 既存空き枠の取得失敗: {res.status_code} - {res.text[:100]}", flush=True)
+        return None
+    return {(str(r['date']), str(r['staff_id'])): r for r in res.json()}
+
+
+class WriteStage:
+    """差分の適用（テーブルごとの書き込み行数・リクエスト数・所要時間を数える）"""
+
+    def __init__(self):
+        self.stats = {}
+        self.errors = 0
+        self.requests = 0
+
+    def _table(self, table):
+        return self.stats.setdefault(table, {'written': 0, 'deleted': 0, 'seconds': 0.0})
+
+    def _timed(self, table, fn):
+        started = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            self._table(table)['seconds'] += time.perf_counter() - started
+
+    def upsert(self, table, rows, on_conflict):
+        def run():
+            for i in range(0, len(rows), UPSERT_CHUNK):
+                chunk = rows[i:i + UPSERT_CHUNK]
+                self.requests += 1
+                res = supabase.upsert(table, chunk, on_conflict=on_conflict,
+                                      prefer='resolution=merge-duplicates,return=minimal', timeout=WRITE_TIMEOUT)
+                if res.status_code in (200, 201, 204):
+                    self._table(table)['written'] += len(chunk)
+                else:
+                    self.errors += 1
+                    print(f"[WRITE] {table} upsertエラー: {res.status_code} - {res.text[:100]}", flush=True)
+        if rows:
+            self._timed(table, run)
+
+    def delete_in(self, table, column, values):
+        def run():
+            for i in range(0, len(values), DELETE_CHUNK):
+                chunk = values[i:i + DELETE_CHUNK]
+                self.requests += 1
+                res = supabase.remove(table, f"{column}=in.({','.join(chunk)})", timeout=WRITE_TIMEOUT)
+                if res.status_code in (200, 204):
+                    self._table(table)['deleted'] += len(chunk)
+                else:
+                    self.errors += 1
+                    print(f"[WRITE] {table} 削除エラー: {res.status_code} - {res.text[:100]}", flush=True)
+        if values:
+            self._timed(table, run)
+
+    def touch(self, table, column, values, data):
+        def run():
+            self.requests += 1
+            res = supabase.update(table, f"{column}=in.({','.join(sorted(values))})", data, timeout=WRITE_TIMEOUT)
+            if res.status_code not in (200, 204):
+                self.errors += 1
+                print(f"[WRITE] {table} 更新エラー: {res.status_code} - {res.text[:100]}", flush=True)
+        if values:
+            self._timed(table, run)
+
+    def report(self):
+        return {
+            'tables': {t: {**s, 'seconds': round(s['seconds'], 2)} for t, s in self.stats.items()},
+            'requests': self.requests,
+            'errors': self.errors,
+            'seconds': round(sum(s['seconds'] for s in self.stats.values()), 2),
+        }
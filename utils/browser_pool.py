@@ -0,0 +1,411 @@
+"""SalonBoard操作用の常駐ブラウザプール
+
+Playwright（sync API）のオブジェクトは作成したスレッドでしか使えないため、
+レーン（＝ブラウザ1つ＋ログイン済みコンテキスト1つ）ごとに専用スレッドを持ち、
+呼び出し側は run(fn) で「ページを借りて fn(page) を実行」する。
+コンテキストは K 回の画面遷移ごと、または空きメモリ不足時に作り直す。
+resize(n) でレーン数を途中で増減できる（減らす時は余ったレーンが手の空いた時点で止まる）。
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COOKIE_FILE = os.path.join(APP_DIR, 'session_cookies.json')
+
+BROWSER_POOL_SIZE = int(os.getenv('BROWSER_POOL_SIZE', '1'))
+BROWSER_POOL_MAX_NAVIGATIONS = int(os.getenv('BROWSER_POOL_MAX_NAVIGATIONS', '200'))
+BROWSER_POOL_MIN_FREE_MB = int(os.getenv('BROWSER_POOL_MIN_FREE_MB', '300'))
+BROWSER_POOL_HEADLESS = os.getenv('BROWSER_POOL_HEADLESS', 'false').lower() == 'true'
+
+LAUNCH_ARGS = ['--disable-blink-features=AutomationControlled', '--no-sandbox', '--disable-dev-shm-usage']
+CONTEXT_OPTIONS = {
+    'user_agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
+    'viewport': {'width': 1920, 'height': 1080},
+    'locale': 'ja-JP',
+    'timezone_id': 'Asia/Tokyo',
+}
+STEALTH_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
+"""
+TOP_URL = 'https://salonboard.com/KLP/top/'
+
+_cookie_lock = threading.Lock()
+_display = None
+_display_lock = threading.Lock()
+
+
+def ensure_display():
+    """DISPLAY未設定ならXvfb仮想ディスプレイを1つだけ起動（headless=False用）"""
+    global _display
+    if os.environ.get('DISPLAY'):
+        return
+    with _display_lock:
+        if _display is not None:
+            return
+        try:
+            from pyvirtualdisplay import Display
+            _display = Display(visible=0, size=(1920, 1080))
+            _display.start()
+            print("[BROWSER] Xvfb仮想ディスプレイ起動", flush=True)
+        except Exception as e:
+            _display = False
+            print(f"[BROWSER] Xvfb起動スキップ: {e}", flush=True)
+
+
+def load_cookies(context, cookie_file=COOKIE_FILE):
+    try:
+        with open(cookie_file, 'r') as f:
+            cookies = json.load(f)
+        context.add_cookies(cookies)
+        return len(cookies)
+    except Exception as e:
+        print(f"[BROWSER] クッキー読み込み失敗: {e}", flush=True)
+        return 0
+
+
+def save_cookies(context, cookie_file=COOKIE_FILE):
+    cookies = context.cookies()
+    with _cookie_lock:
+        with open(cookie_file, 'w') as f:
+            json.dump(cookies, f, indent=2, ensure_ascii=False)
+    return len(cookies)
+
+
+def login_to_salonboard(page):
+    """SalonBoardにログイン（成功で True）"""
+    login_id = os.environ.get('SALONBOARD_LOGIN_ID', 'CD18317')
+    login_password = os.environ.get('SALONBOARD_LOGIN_PASSWORD', 'Ne8T2Hhi!')
+
+    print("[LOGIN] ログインページにアクセス中...", flush=True)
+    page.goto('https://salonboard.com/login/', timeout=60000)
+    page.wait_for_timeout(1000)
+
+    try:
+        page.fill('input[name="userId"]', login_id)
+        page.fill('input[name="password"]', login_password)
+        print("[LOGIN] ID/PW入力完了", flush=True)
+
+        # ログインボタンをクリック
+        btn = None
+        selectors = [
+            'a.common-CNCcommon__primaryBtn',
+            'button[type="submit"]',
+            'input[type="submit"]',
+            'a.loginBtn',
+            '.loginBtn',
+            'button.primary',
+            'a:has-text("ログイン")',
+            'button:has-text("ログイン")'
+        ]
+        for sel in selectors:
+            try:
+                btn = page.query_selector(sel)
+                if btn:
+                    print(f"[LOGIN] ボタン発見: {sel}", flush=True)
+                    break
+            except:
+                pass
+
+        if btn:
+            btn.click()
+            print("[LOGIN] ボタンクリック", flush=True)
+        else:
+            print("[LOGIN] ボタン見つからず、Enter押下", flush=True)
+            page.keyboard.press('Enter')
+
+        # ページ遷移を待つ
+        for i in range(30):
+            page.wait_for_timeout(300)
+            current_url = page.url
+            if '/KLP/' in current_url:
+                print("[LOGIN] ログイン成功", flush=True)
+                return True
+            # doLogin後の遷移を待つ
+            if 'doLogin' in current_url:
+                print("[LOGIN] doLogin処理中...", flush=True)
+                continue
+
+        print(f"[LOGIN] タイムアウト: {page.url}", flush=True)
+        return False
+    except Exception as e:
+        print(f"[LOGIN] エラー: {e}", flush=True)
+        return False
+
+
+def needs_login(page):
+    try:
+        return 'login' in page.url.lower() or 'エラー' in page.title()
+    except Exception:
+        return True
+
+
+def ensure_logged_in(page, url, timeout=60000):
+    """url を開き、ログイン画面に飛ばされたらログインしてCookieを保存し開き直す"""
+    page.goto(url, timeout=timeout)
+    if not needs_login(page):
+        return True
+    if not login_to_salonboard(page):
+        return False
+    save_cookies(page.context)
+    page.goto(url, timeout=timeout)
+    return not needs_login(page)
+
+
+def free_memory_mb():
+    """MemAvailable（MB）。/proc/meminfo が無い環境では None"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+
+class _Lane:
+    """1スレッドが所有するブラウザ＋コンテキスト＋ページ"""
+
+    def __init__(self, lane_id):
+        self.id = lane_id
+        self.browser = None
+        self.context = None
+        self.page = None
+        self.navigations = 0
+        self.leases = 0
+        self.state = 'idle'
+        self.busy_seconds = 0.0
+        self.started_at = time.monotonic()
+        self.stopped_at = None
+
+    def utilisation(self):
+        lifetime = (self.stopped_at or time.monotonic()) - self.started_at
+        return round(self.busy_seconds / lifetime, 3) if lifetime > 0 else None
+
+    def _count_navigation(self, frame):
+        if self.page is not None and frame == self.page.main_frame:
+            self.navigations += 1
+
+    def close_context(self):
+        try:
+            if self.context is not None:
+                self.context.close()
+        except Exception:
+            pass
+        self.context = self.page = None
+        self.navigations = 0
+        self.leases = 0
+
+    def close(self):
+        self.close_context()
+        try:
+            if self.browser is not None:
+                self.browser.close()
+        except Exception:
+            pass
+        self.browser = None
+
+
+class BrowserPool:
+    """N本のレーンに run(fn) の仕事を配るプール（レーンは初回利用時に起動）"""
+
+    def __init__(self, size=BROWSER_POOL_SIZE, max_navigations=BROWSER_POOL_MAX_NAVIGATIONS,
+                 min_free_mb=BROWSER_POOL_MIN_FREE_MB, headless=BROWSER_POOL_HEADLESS,
+                 launch_args=LAUNCH_ARGS, context_options=CONTEXT_OPTIONS,
+                 cookie_file=COOKIE_FILE, warm_url=None, name='pool'):
+        self.size = max(1, size)
+        self.max_navigations = max_navigations
+        self.min_free_mb = min_free_mb
+        self.headless = headless
+        self.launch_args = list(launch_args)
+        self.context_options = dict(context_options)
+        self.cookie_file = cookie_file
+        self.warm_url = warm_url
+        self.name = name
+        self._jobs = deque()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._lanes = []
+        self._lane_ids = set()
+        self._live = 0
+        self._stopping = False
+        self._started_at = None
+        self._waits = deque(maxlen=200)
+        self.stats = {'leases': 0, 'failures': 0, 'launches': 0, 'recycles': 0, 'timeouts': 0}
+
+    # ===== 呼び出し側API =====
+    def start(self):
+        """レーンのスレッドを起動（ブラウザ起動とウォームアップは各レーン内で行う）"""
+        with self._cond:
+            if self._threads:
+                return
+            self._stopping = False
+            self._started_at = time.monotonic()
+            self._spawn_lanes()
+
+    def resize(self, size):
+        """レーン数を size にする（増やす分はすぐ起動、減らす分は手の空いたレーンから止まる）"""
+        with self._cond:
+            self.size = max(1, size)
+            if self._threads and not self._stopping:
+                self._spawn_lanes()
+            self._cond.notify_all()
+
+    def _spawn_lanes(self):
+        # self._cond を取った状態で呼ぶ
+        while self._live < self.size:
+            lane = _Lane(len(self._lanes))
+            t = threading.Thread(target=self._lane_main, args=(lane,), name=f'{self.name}-lane-{lane.id}', daemon=True)
+            self._lanes.append(lane)
+            self._threads.append(t)
+            self._live += 1
+            t.start()
+
+    def submit(self, fn, label=''):
+        """fn(page) を予約して Future を返す"""
+        if threading.get_ident() in self._lane_ids:
+            raise RuntimeError('BrowserPool.run() をレーン内から呼ぶとデッドロックします')
+        self.start()
+        future = Future()
+        with self._cond:
+            self._jobs.append((fn, label, time.monotonic(), future))
+            self._cond.notify()
+        return future
+
+    def run(self, fn, timeout=None, label=''):
+        """空いたレーンのページで fn(page) を実行して結果を返す（例外はそのまま送出）"""
+        future = self.submit(fn, label)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            # まだ順番待ちなら取り消す（実行中のものは止められない）
+            future.cancel()
+            with self._cond:
+                self.stats['timeouts'] += 1
+            raise
+
+    def shutdown(self, wait=True):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if wait:
+            for t in self._threads:
+                t.join(timeout=30)
+        with self._cond:
+            self._threads = []
+            self._lanes = []
+            self._live = 0
+
+    def metrics(self):
+        with self._cond:
+            waits = sorted(self._waits)
+            busy = sum(l.busy_seconds for l in self._lanes)
+            lane_seconds = sum((l.stopped_at or time.monotonic()) - l.started_at for l in self._lanes)
+            return {
+                'size': self.size,
+                'live': self._live,
+                'queued': len(self._jobs),
+                **self.stats,
+                'lease_wait_avg': round(sum(waits) / len(waits), 3) if waits else None,
+                'lease_wait_p95': round(waits[int(len(waits) * 0.95) - 1 if len(waits) > 1 else 0], 3) if waits else None,
+                'lease_wait_max': round(waits[-1], 3) if waits else None,
+                'utilisation': round(busy / lane_seconds, 3) if lane_seconds else None,
+                'free_memory_mb': free_memory_mb(),
+                'lanes': [
+                    {'id': l.id, 'state': l.state, 'navigations': l.navigations, 'leases': l.leases,
+                     'busy_seconds': round(l.busy_seconds, 1), 'utilisation': l.utilisation()}
+                    for l in self._lanes
+                ],
+            }
+
+    # ===== レーン内部 =====
+    def _next_job(self):
+        """次の仕事（停止中、またはレーン数を減らされて余ったレーンには None）"""
+        with self._cond:
+            while not self._jobs and not self._stopping and self._live <= self.size:
+                self._cond.wait()
+            if self._stopping or self._live > self.size:
+                self._live -= 1
+                return None
+            return self._jobs.popleft()
+
+    def _open_context(self, p, lane):
+        if lane.browser is None or not lane.browser.is_connected():
+            lane.close()
+            ensure_display()
+            lane.browser = p.chromium.launch(headless=self.headless, args=self.launch_args)
+            with self._cond:
+                self.stats['launches'] += 1
+            print(f"[BROWSER] {self.name}-lane-{lane.id} ブラウザ起動", flush=True)
+        lane.context = lane.browser.new_context(**self.context_options)
+        lane.context.add_init_script(STEALTH_SCRIPT)
+        load_cookies(lane.context, self.cookie_file)
+        lane.page = lane.context.new_page()
+        lane.page.on('framenavigated', lane._count_navigation)
+        if self.warm_url:
+            try:
+                ensure_logged_in(lane.page, self.warm_url)
+            except Exception as e:
+                print(f"[BROWSER] {self.name}-lane-{lane.id} ウォームアップ失敗: {e}", flush=True)
+
+    def _should_recycle(self, lane):
+        if lane.navigations >= self.max_navigations:
+            return 'navigations'
+        free = free_memory_mb()
+        if free is not None and free < self.min_free_mb:
+            return f'memory {free}MB'
+        return None
+
+    def _lane_main(self, lane):
+        from playwright.sync_api import sync_playwright
+        self._lane_ids.add(threading.get_ident())
+        with sync_playwright() as p:
+            while True:
+                if lane.context is None:
+                    try:
+                        lane.state = 'starting'
+                        self._open_context(p, lane)
+                    except Exception as e:
+                        print(f"[BROWSER] {self.name}-lane-{lane.id} 起動失敗: {e}", flush=True)
+                        lane.close()
+                lane.state = 'idle'
+                job = self._next_job()
+                if job is None:
+                    break
+                fn, label, submitted, future = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                started = time.monotonic()
+                with self._cond:
+                    self._waits.append(started - submitted)
+                    self.stats['leases'] += 1
+                lane.state = f'busy:{label}' if label else 'busy'
+                lane.leases += 1
+                try:
+                    if lane.context is None:
+                        self._open_context(p, lane)
+                    future.set_result(fn(lane.page))
+                except Exception as e:
+                    with self._cond:
+                        self.stats['failures'] += 1
+                    future.set_exception(e)
+                    # ページやブラウザが壊れている可能性があるので作り直す
+                    if lane.browser is None or not lane.browser.is_connected() or lane.page is None or lane.page.is_closed():
+                        lane.close()
+                finally:
+                    lane.busy_seconds += time.monotonic() - started
+                    lane.state = 'idle'
+                reason = self._should_recycle(lane) if lane.context is not None else None
+                if reason:
+                    print(f"[BROWSER] {self.name}-lane-{lane.id} コンテキスト再作成（{reason}）", flush=True)
+                    lane.close_context()
+                    with self._cond:
+                        self.stats['recycles'] += 1
+            lane.state = 'stopped'
+            lane.stopped_at = time.monotonic()
+            lane.close()
+        self._lane_ids.discard(threading.get_ident())
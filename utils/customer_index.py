@@ -0,0 +1,121 @@
+"""顧客の名前・電話番号の照合インデックス
+
+customers と 8weeks_bookings を1回ずつ読み込み、
+正規化名 → 予約（電話番号・顧客番号）、電話番号 → 顧客 などを辞書で引けるようにする。
+照合のたびに 8weeks_bookings 全件を取り直していた処理（LINE登録・電話番号補完・欠勤通知）は
+load_customer_index() のインデックスを使う。読み込みは table_cache 経由で CUSTOMER_INDEX_TTL 秒保持し、
+customers に書き込んだら table_cache.invalidate('customers') で顧客側だけ取り直す。
+"""
+import os
+import re
+
+from utils.supabase_client import supabase
+from utils.table_cache import table_cache
+
+CUSTOMER_INDEX_TTL = int(os.getenv('CUSTOMER_INDEX_TTL', '300'))
+CUSTOMER_FIELDS = 'id,name,line_user_id,phone,customer_number'
+BOOKING_FIELDS = 'customer_name,phone,customer_number'
+
+_NAME_NOISE = re.compile(r'[\s　★]+')
+
+
+def name_key(name):
+    """照合用の名前（改行以降・空白（全角含む）・★を除く）"""
+    return _NAME_NOISE.sub('', (name or '').split('\n')[0])
+
+
+def phone_key(phone):
+    """照合用の電話番号（ハイフン・空白を除く、空なら None）"""
+    phone = re.sub(r'[\s\-]+', '', phone or '')
+    return phone or None
+
+
+class CustomerIndex:
+    """customers / 8weeks_bookings の行から作る照合用の辞書（同じキーは先に出た行を優先）"""
+
+    def __init__(self, customers=(), bookings=()):
+        self.customers_by_name = {}
+        self.customers_by_phone = {}
+        self.customers_by_line_id = {}
+        self.bookings_by_name = {}
+        self.bookings_by_phone = {}
+        for c in customers:
+            self.add_customer(c)
+        for b in bookings:
+            self._add(self.bookings_by_name, name_key(b.get('customer_name')), b)
+            self._add(self.bookings_by_phone, phone_key(b.get('phone')), b)
+
+    @staticmethod
+    def _add(index, key, row):
+        if key:
+            index.setdefault(key, []).append(row)
+
+    def add_customer(self, row):
+        """顧客行を名前・電話番号・LINE IDの各辞書に追加"""
+        self._add(self.customers_by_name, name_key(row.get('name')), row)
+        self._add(self.customers_by_phone, phone_key(row.get('phone')), row)
+        if row.get('line_user_id'):
+            self.customers_by_line_id.setdefault(row['line_user_id'], row)
+
+    # ===== 予約（8weeks_bookings）=====
+    def booking_by_name(self, name, with_phone=False):
+        """名前が一致する最初の予約（with_phone なら電話番号のある予約）"""
+        for b in self.bookings_by_name.get(name_key(name), ()):
+            if not with_phone or b.get('phone'):
+                return b
+        return None
+
+    def booking_by_phone(self, phone):
+        rows = self.bookings_by_phone.get(phone_key(phone))
+        return rows[0] if rows else None
+
+    # ===== 顧客（customers）=====
+    def customer_by_name(self, name, with_line=False):
+        """名前が一致する最初の顧客（with_line なら LINE ID のある顧客）"""
+        for c in self.customers_by_name.get(name_key(name), ()):
+            if not with_line or c.get('line_user_id'):
+                return c
+        return None
+
+    def customer_by_phone(self, phone):
+        rows = self.customers_by_phone.get(phone_key(phone))
+        return rows[0] if rows else None
+
+    def customer_by_line_id(self, line_user_id):
+        return self.customers_by_line_id.get(line_user_id)
+
+    def stats(self):
+        return {
+            'customer_names': len(self.customers_by_name),
+            'customer_phones': len(self.customers_by_phone),
+            'booking_names': len(self.bookings_by_name),
+            'booking_phones': len(self.bookings_by_phone),
+        }
+
+
+_state = (None, None)
+
+
+def _select(key, path, ttl):
+    def loader():
+        res = supabase.get(path, timeout=(3.05, 30))
+        if res.status_code == 200:
+            return res.json()
+        print(f"[CUSTOMER_INDEX] {key} 取得失敗: {res.status_code}", flush=True)
+        return None
+    return table_cache.get(key, loader, ttl)
+
+
+def load_customer_index(ttl=CUSTOMER_INDEX_TTL):
+    """キャッシュ済みの customers / 8weeks_bookings からインデックスを返す（取得失敗時は None）"""
+    global _state
+    customers = _select('customers:identity', f'customers?select={CUSTOMER_FIELDS}', ttl)
+    bookings = _select('8weeks_bookings:identity', f'8weeks_bookings?select={BOOKING_FIELDS}', ttl)
+    if customers is None or bookings is None:
+        return None
+    etag, index = _state
+    if (customers.etag, bookings.etag) != etag:
+        # どちらかの内容が変わった時だけ作り直す（差し替えはタプル1つなのでロック不要）
+        index = CustomerIndex(customers.value, bookings.value)
+        _state = ((customers.etag, bookings.etag), index)
+    return index
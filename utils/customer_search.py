@@ -0,0 +1,113 @@
+"""顧客一覧のページ取得・検索（PostgRESTのフィルタで絞り込み）
+
+登録日時の新しい順（同時刻は id 順）にキーセット方式で CUSTOMER_PAGE_SIZE 件ずつ取得する。
+検索語は電話番号（数字）・LINE ID（U＋32桁）・名前（正規化名の部分一致）のどれかとして判定し、
+件数は Prefer: count=estimated の Content-Range から取る。
+"""
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
+
+from utils.customer_index import name_key
+from utils.supabase_client import supabase
+
+CUSTOMER_PAGE_SIZE = int(os.getenv('CUSTOMER_PAGE_SIZE', '50'))
+# 名前検索で id=in.(...) にするIDの上限（超えたら ilike）
+CUSTOMER_SEARCH_MAX_IDS = 300
+CUSTOMER_LIST_FIELDS = 'id,name,line_user_id,phone,registered_at'
+ORDER = 'registered_at.desc.nullslast,id.desc'
+
+JST = timezone(timedelta(hours=9))
+_LINE_ID = re.compile(r'^U[0-9a-f]{32}$')
+# PostgRESTの論理式で意味を持つ文字は検索語から除く
+_RESERVED = re.compile(r'[,()"\\*%]')
+
+
+def _value(text):
+    """論理式内の値（ダブルクォートで囲み、URLエンコード）"""
+    return quote(f'"{text}"', safe='')
+
+
+# インデックスで名前が1件も一致しなかった（問い合わせずに0件を返す）
+NO_MATCH = object()
+
+
+def search_filter(q, index=None):
+    """検索語 → PostgRESTの条件（空なら None、名前の該当が無ければ NO_MATCH）
+
+    名前は照合インデックス（正規化名）で部分一致するIDを引いて id=in.(...) にする。
+    インデックスが無い・該当が多すぎる場合は name.ilike にする。
+    """
+    q = (q or '').strip()
+    digits = re.sub(r'[\s\-]', '', q)
+    if not q:
+        return None
+    if _LINE_ID.match(q):
+        return f'line_user_id.eq.{_value(q)}'
+    if digits.isdigit():
+        return f'or(phone.like.{_value("*" + digits + "*")},customer_number.eq.{_value(digits)})'
+    key = name_key(q)
+    if index is not None and key:
+        ids = [c['id'] for name, rows in index.customers_by_name.items() if key in name for c in rows]
+        if not ids:
+            # id.in.("") は uuid として不正で 400 になる
+            return NO_MATCH
+        if len(ids) <= CUSTOMER_SEARCH_MAX_IDS:
+            return f'id.in.({",".join(_value(i) for i in ids)})'
+    # 空白区切りの語を順に含む名前（全角・半角スペースの違いを吸収）
+    words = [w for w in re.split(r'[\s　]+', _RESERVED.sub('', q)) if w]
+    return f'name.ilike.{_value("*" + "*".join(words) + "*")}' if words else None
+
+
+def cursor_filter(after):
+    """'登録日時|id' カーソル → それより後ろの行の条件（desc・nullslast の並びに合わせる）"""
+    if not after or '|' not in after:
+        return None
+    registered_at, customer_id = after.split('|', 1)
+    if not registered_at:
+        return f'and(registered_at.is.null,id.lt.{_value(customer_id)})'
+    return (f'or(registered_at.lt.{_value(registered_at)},registered_at.is.null,'
+            f'and(registered_at.eq.{_value(registered_at)},id.lt.{_value(customer_id)}))')
+
+
+def _total(res):
+    """Content-Range: 0-49/1234 の件数（不明なら None）"""
+    total = (res.headers.get('Content-Range') or '').rpartition('/')[2]
+    return int(total) if total.isdigit() else None
+
+
+def to_jst(value):
+    """ISO日時 → 'YYYY-MM-DD HH:MM:SS'（JST、解析できなければそのまま）"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).astimezone(JST).strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return value
+
+
+def customer_page(q=None, after=None, limit=CUSTOMER_PAGE_SIZE, index=None):
+    """{'rows', 'next', 'total'} を返す（取得失敗時は RuntimeError）"""
+    search = search_filter(q, index)
+    if search is NO_MATCH:
+        return {'rows': [], 'next': None, 'total': 0}
+    conditions = [c for c in (search, cursor_filter(after)) if c]
+    path = f'customers?select={CUSTOMER_LIST_FIELDS}&order={ORDER}&limit={limit + 1}'
+    if conditions:
+        path += f'&and=({",".join(conditions)})'
+    res = supabase.get(path, prefer='count=estimated')
+    if res.status_code not in (200, 206):
+        raise RuntimeError(f'customers 取得失敗: {res.status_code} - {res.text[:100]}')
+    rows = res.json()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    for row in rows:
+        row['registered_at_jst'] = to_jst(row.get('registered_at'))
+    last = rows[-1] if rows and has_more else None
+    return {
+        'rows': rows,
+        'next': f"{last.get('registered_at') or ''}|{last['id']}" if last else None,
+        # 2ページ目以降の件数はカーソル条件込みになるため返さない
+        'total': _total(res) if not after else None,
+    }
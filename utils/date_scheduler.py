@@ -0,0 +1,141 @@
+"""日付単位のスクレイピングをブラウザプールの共有キューで回し、ワーカー数を状況に合わせて増減する
+
+日付ごとに1件の仕事を BrowserPool に積み、空いたレーンから順に取っていく（固定の日付範囲の割り当てはしない）。
+ワーカー（レーン）数は SCRAPE_WORKERS_START から始め、日付が終わるたびに見直す:
+- エラー・429/503（throttled）が続いたら半分に減らす
+- 空きメモリがレーン1本分（SCRAPE_LANE_MB）に足りなければ増やさない、下限を割ったら1本減らす
+- 1日あたりの所要時間が最初の基準の2倍を超えたら1本減らす（SalonBoard側が遅くなっている）
+- どれにも当たらず基準の1.5倍以内なら、現在のワーカー数ぶん日付が終わるごとに1本増やす
+エラー・throttled の日付は最後に1回だけ積み直す。
+日付ごとの結果・ワーカー数の変更は [SCRAPE-DATE] / [SCRAPE-WORKERS] のJSON1行で出す。
+"""
+import json
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from utils.browser_pool import BROWSER_POOL_MIN_FREE_MB, free_memory_mb
+
+SCRAPE_WORKERS_MIN = int(os.getenv('SCRAPE_WORKERS_MIN', '1'))
+SCRAPE_WORKERS_START = int(os.getenv('SCRAPE_WORKERS_START', '2'))
+SCRAPE_WORKERS_MAX = int(os.getenv('SCRAPE_WORKERS_MAX', '6'))
+# ブラウザ1本（レーン）あたりに見込むメモリ
+SCRAPE_LANE_MB = int(os.getenv('SCRAPE_LANE_MB', '400'))
+
+FAILED = ('error', 'throttled')
+
+
+def log_date_result(result):
+    """日付1件の結果を [SCRAPE-DATE] のJSON1行で出す（予約・空き枠の中身は除く）"""
+    print('[SCRAPE-DATE] ' + json.dumps(
+        {k: v for k, v in result.items() if k not in ('bookings', 'slots')}, ensure_ascii=False), flush=True)
+
+
+class DateFailed(Exception):
+    """日付の処理が例外で終わった（結果の辞書を持たせてプールには例外として返す）"""
+
+    def __init__(self, result):
+        super().__init__(result.get('error'))
+        self.result = result
+
+
+class AdaptiveDateScheduler:
+    """日付の仕事をプールに配り、結果を見てプールのレーン数を調整する"""
+
+    def __init__(self, pool, min_workers=SCRAPE_WORKERS_MIN, start_workers=SCRAPE_WORKERS_START,
+                 max_workers=SCRAPE_WORKERS_MAX, lane_mb=SCRAPE_LANE_MB, min_free_mb=BROWSER_POOL_MIN_FREE_MB):
+        self.pool = pool
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        self.workers = min(max(start_workers, self.min_workers), self.max_workers)
+        self.lane_mb = lane_mb
+        self.min_free_mb = min_free_mb
+        self.baseline = None
+        self.recent = deque(maxlen=12)
+        self.done_since_change = 0
+        self.changes = []
+
+    def _wrap(self, fn, item):
+        """fn(page, item) → 結果の辞書に所要時間・ワーカー名を足す"""
+        def job(page):
+            started = time.perf_counter()
+            worker = threading.current_thread().name
+            try:
+                result = fn(page, item)
+            except Exception as e:
+                raise DateFailed({'item': item, 'status': 'error', 'error': f'{type(e).__name__}: {e}',
+                                  'seconds': round(time.perf_counter() - started, 2), 'worker': worker})
+            result.update(item=item, seconds=round(time.perf_counter() - started, 2), worker=worker)
+            return result
+        return job
+
+    def run(self, items, fn, label='date'):
+        """items を1件ずつ fn(page, item) で処理し、結果（status / seconds / worker 付きの辞書）のリストを返す"""
+        self.pool.resize(min(self.workers, max(1, len(items))))
+        futures = {self.pool.submit(self._wrap(fn, item), label=f'{label}:{item}'): item for item in items}
+        retried = set()
+        results = []
+        while futures:
+            done, _ = wait(list(futures), timeout=5, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = futures.pop(future)
+                try:
+                    result = future.result()
+                except DateFailed as e:
+                    result = e.result
+                except Exception as e:
+                    result = {'item': item, 'status': 'error', 'error': f'{type(e).__name__}: {e}',
+                              'seconds': None, 'worker': None}
+                log_date_result(result)
+                self._observe(result)
+                if result['status'] in FAILED and item not in retried:
+                    retried.add(item)
+                    futures[self.pool.submit(self._wrap(fn, item), label=f'{label}:{item}:retry')] = item
+                    continue
+                results.append(result)
+            if done:
+                self._adjust(len(futures))
+        return results
+
+    def _observe(self, result):
+        self.recent.append((result['status'], result.get('seconds')))
+        self.done_since_change += 1
+
+    def _latency(self):
+        """直近で実際にページを処理した日付の所要時間の中央値"""
+        seconds = [s for status, s in self.recent if status == 'ok' and s is not None]
+        return statistics.median(seconds) if len(seconds) >= 2 else None
+
+    def _adjust(self, remaining):
+        latency = self._latency()
+        if latency is not None and (self.baseline is None or latency < self.baseline):
+            self.baseline = latency
+        failures = sum(1 for status, _ in self.recent if status in FAILED)
+        throttled = any(status == 'throttled' for status, _ in self.recent)
+        free = free_memory_mb()
+        target, reason = self.workers, None
+
+        if throttled or failures >= 2:
+            target, reason = self.workers // 2, 'throttled' if throttled else f'errors {failures}'
+        elif free is not None and free < self.min_free_mb:
+            target, reason = self.workers - 1, f'memory {free}MB'
+        elif latency is not None and self.baseline and latency > self.baseline * 2:
+            target, reason = self.workers - 1, f'latency {latency:.1f}s (base {self.baseline:.1f}s)'
+        elif (self.done_since_change >= self.workers and remaining > self.workers and latency is not None
+              and latency <= self.baseline * 1.5 and (free is None or free >= self.min_free_mb + self.lane_mb)):
+            # 残りの日付がレーン数以下なら増やしても待つだけなので増やさない
+            target, reason = self.workers + 1, f'grow latency {latency:.1f}s free {free}MB'
+
+        target = max(self.min_workers, min(target, self.max_workers))
+        if target == self.workers:
+            return
+        change = {'from': self.workers, 'to': target, 'reason': reason, 'remaining': remaining}
+        print('[SCRAPE-WORKERS] ' + json.dumps(change, ensure_ascii=False), flush=True)
+        self.changes.append(change)
+        self.workers = target
+        self.pool.resize(target)
+        self.done_since_change = 0
+        self.recent.clear()
@@ -0,0 +1,159 @@
+"""予約詳細（電話番号・メニュー・予約経路）の補完ステージ
+
+一覧の取得がすべて終わってから、詳細が必要な予約の booking_id を重複なしで集め、
+- 前回までに詳細ページから取得済み（data/detail_cache.json）の予約はキャッシュの値を使う
+- 既存の 8weeks_bookings に電話番号・予約経路が入っている予約は開かない
+残りだけをブラウザプールのページ SCRAPE_DETAIL_PAGES 枚（高速版は SCRAPE_DETAIL_PAGES_FAST 枚）で並行して取得する。
+取得結果（空だった項目も含む）はキャッシュに保存し、次回以降は同じ予約の詳細ページを開かない。
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DETAIL_CACHE_FILE = os.getenv('SCRAPE_DETAIL_CACHE_FILE', os.path.join(APP_DIR, 'data', 'detail_cache.json'))
+# 詳細ページを同時に開く枚数（一覧のスクレイピングのレーン数とは別枠）
+SCRAPE_DETAIL_PAGES = int(os.getenv('SCRAPE_DETAIL_PAGES', '2'))
+# 高速版（14日以内）の枚数。新規予約の電話番号・予約経路を次の通常版まで待たせないよう少しだけ開く
+SCRAPE_DETAIL_PAGES_FAST = int(os.getenv('SCRAPE_DETAIL_PAGES_FAST', '1'))
+
+DETAIL_FIELDS = ('phone', 'menu', 'booking_source')
+
+
+def valid_menu(menu):
+    """一覧・キャッシュのメニューとして使える値か（詳細ページの本文を丸ごと拾ったものは除く）"""
+    return bool(menu) and '\n' not in menu and '来店日' not in menu and len(menu) <= 200
+
+
+class DetailCache:
+    """booking_id → 詳細ページの取得結果（ワーカースレッド間で共有、commit()でファイルに保存）"""
+
+    def __init__(self, path=DETAIL_CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    @classmethod
+    def load(cls, path=DETAIL_CACHE_FILE):
+        cache = cls(path)
+        try:
+            with open(path, 'r') as f:
+                cache._entries = json.load(f)
+        except (OSError, ValueError):
+            cache._entries = {}
+        return cache
+
+    def get(self, booking_id):
+        with self._lock:
+            return self._entries.get(booking_id)
+
+    def put(self, booking_id, details, visit_date):
+        with self._lock:
+            self._entries[booking_id] = {**{k: details.get(k) for k in DETAIL_FIELDS},
+                                         'date': visit_date, 'fetched_at': time.time()}
+
+    def commit(self, keep_from=None):
+        """ファイルに保存（来店日が keep_from より前の予約は捨てる）"""
+        with self._lock:
+            if keep_from:
+                self._entries = {k: v for k, v in self._entries.items() if (v.get('date') or keep_from) >= keep_from}
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f'{self.path}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(self._entries, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+def apply_details(booking, details):
+    """取得できた項目だけ上書き"""
+    for field in DETAIL_FIELDS:
+        if details.get(field):
+            booking[field] = details[field]
+
+
+class EnrichmentStage:
+    """詳細が必要な予約を補完する（fetch(page, booking_id) → 詳細の辞書、失敗時は例外）
+
+    pages=0 はキャッシュ・既存データの反映だけ行い、詳細ページは開かない。
+    """
+
+    def __init__(self, pool, fetch, cache=None, pages=SCRAPE_DETAIL_PAGES):
+        self.pool = pool
+        self.fetch = fetch
+        self.cache = cache if cache is not None else DetailCache.load()
+        self.pages = max(0, pages)
+        self.stats = {'targets': 0, 'cached': 0, 'known': 0, 'fetched': 0, 'errors': 0, 'not_fetched': 0,
+                      'seconds': 0.0}
+        # 取得エラー・枚数の上限で詳細を取れなかった booking_id（次のランで取り直す）
+        self.unfinished = set()
+
+    def run(self, bookings, existing_cache):
+        """bookings（needs_detail の付いた予約）をその場で補完する"""
+        started = time.perf_counter()
+        by_id = {}
+        for b in bookings:
+            if b.get('needs_detail'):
+                by_id.setdefault(b['booking_id'], []).append(b)
+        self.stats['targets'] = len(by_id)
+
+        pending = deque()
+        for booking_id, rows in by_id.items():
+            cached = self.cache.get(booking_id)
+            existing = existing_cache.get(booking_id) or {}
+            if cached is not None:
+                details, key = cached, 'cached'
+            elif existing.get('phone') and existing.get('booking_source'):
+                # 以前のランで詳細まで取得済み（メニューが空なのは詳細ページにも無かったため）
+                details, key = existing, 'known'
+            else:
+                pending.append(booking_id)
+                continue
+            self.stats[key] += 1
+            for b in rows:
+                apply_details(b, details)
+
+        if pending and self.pages:
+            lock = threading.Lock()
+
+            def worker(page):
+                while True:
+                    with lock:
+                        if not pending:
+                            return
+                        booking_id = pending.popleft()
+                    rows = by_id[booking_id]
+                    try:
+                        details = self.fetch(page, booking_id)
+                    except Exception as e:
+                        print(f"[ENRICH] {booking_id} 取得エラー: {e}", flush=True)
+                        with lock:
+                            self.stats['errors'] += 1
+                            self.unfinished.add(booking_id)
+                        continue
+                    for b in rows:
+                        apply_details(b, details)
+                    self.cache.put(booking_id, details, (rows[0].get('visit_datetime') or '')[:10].replace('-', ''))
+                    with lock:
+                        self.stats['fetched'] += 1
+
+            futures = [self.pool.submit(worker, label=f'enrich-{i}') for i in range(min(self.pages, len(pending)))]
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"[ENRICH] ブラウザエラー: {e}", flush=True)
+
+        self.stats['not_fetched'] = len(pending)
+        self.unfinished.update(pending)
+        for rows in by_id.values():
+            for b in rows:
+                b['needs_detail'] = False
+        self.stats['seconds'] = round(time.perf_counter() - started, 2)
+        print(f"[ENRICH] {json.dumps(self.stats, ensure_ascii=False)}", flush=True)
+        return self.stats
@@ -0,0 +1,73 @@
+"""CSV / NDJSON のストリーミング出力
+
+Supabaseのテーブルはキー列の昇順に EXPORT_PAGE_SIZE 件ずつ（key=gt.<前ページ最後の値>）取得し、
+取得した行からすぐ書き出す。全件をメモリに載せないので、件数が増えても使用メモリは一定で、
+ダウンロードは1ページ目の取得直後に始まる。
+"""
+import csv
+import itertools
+import json
+import os
+from io import StringIO
+from urllib.parse import quote
+
+from utils.supabase_client import supabase
+
+EXPORT_PAGE_SIZE = int(os.getenv('EXPORT_PAGE_SIZE', '1000'))
+
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8-sig', 'csv'),
+    'ndjson': ('application/x-ndjson; charset=utf-8', 'ndjson'),
+}
+
+
+def keyset_rows(table, select='*', key='id', filters=None, page_size=EXPORT_PAGE_SIZE):
+    """table の行を key の昇順にページ単位で取得して1行ずつ返す（取得失敗は RuntimeError）"""
+    last = None
+    while True:
+        path = f'{table}?select={select}&order={key}.asc&limit={page_size}'
+        if filters:
+            path += f'&{filters}'
+        if last is not None:
+            path += f'&{key}=gt.{quote(str(last), safe="")}'
+        res = supabase.get(path, timeout=(3.05, 60))
+        if res.status_code != 200:
+            raise RuntimeError(f'{table} 取得失敗: {res.status_code} - {res.text[:100]}')
+        rows = res.json()
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last = rows[-1][key]
+
+
+def _line(values):
+    buf = StringIO()
+    csv.writer(buf).writerow(values)
+    return buf.getvalue()
+
+
+def csv_stream(rows, columns=None, labels=None):
+    """行（辞書）を CSV の行文字列として返す。columns 省略時は最初の行のキー順"""
+    rows = iter(rows)
+    try:
+        first = next(rows, None)
+        if columns is None:
+            columns = list(first.keys()) if first else []
+        if labels or columns:
+            yield _line(labels or columns)
+        if first is None:
+            return
+        for row in itertools.chain([first], rows):
+            yield _line(['' if row.get(c) is None else row.get(c) for c in columns])
+    except Exception as e:
+        # ヘッダー送信後はステータスを変えられないので、ログに残して打ち切る
+        print(f"[EXPORT] CSV出力中断: {e}", flush=True)
+
+
+def ndjson_stream(rows):
+    """行（辞書）を1行1JSONで返す"""
+    try:
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False, default=str) + '\n'
+    except Exception as e:
+        print(f"[EXPORT] NDJSON出力中断: {e}", flush=True)
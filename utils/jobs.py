@@ -0,0 +1,96 @@
+"""管理画面から起動する裏処理の進捗管理
+
+start() は処理をデーモンスレッドで実行してジョブIDを返すだけで、画面はすぐ戻る。
+処理関数は job.update(...) で段階・件数を書き込み、画面は /api/jobs/<id> をポーリングして表示する。
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# 状態を保持する完了済みジョブ数
+JOBS_KEEP = 200
+
+
+class Job:
+    """1件の裏処理（progress は処理関数が自由に書き込む辞書）"""
+
+    def __init__(self, kind, title):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.title = title
+        self.status = 'queued'
+        self.stage = None
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def update(self, stage=None, **progress):
+        with self._lock:
+            if stage:
+                self.stage = stage
+            self.progress.update(progress)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'id': self.id,
+                'kind': self.kind,
+                'title': self.title,
+                'status': self.status,
+                'stage': self.stage,
+                'progress': dict(self.progress),
+                'result': self.result,
+                'error': self.error,
+                'created_at': self.created_at,
+                'finished_at': self.finished_at,
+                'elapsed': round((self.finished_at or time.time()) - self.created_at, 2),
+            }
+
+
+class JobRegistry:
+    """ジョブの起動と状態参照（スレッドセーフ）"""
+
+    def __init__(self, keep=JOBS_KEEP):
+        self.keep = keep
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, kind, title, fn, *args, **kwargs):
+        """fn(job, *args, **kwargs) を裏で実行してジョブIDを返す（戻り値は job.result）"""
+        job = Job(kind, title)
+        with self._lock:
+            self._jobs[job.id] = job
+            finished = [k for k, j in self._jobs.items() if j.finished_at]
+            for k in finished[:max(0, len(finished) - self.keep)]:
+                del self._jobs[k]
+        threading.Thread(target=self._run, args=(job, fn, args, kwargs), name=f'job-{kind}', daemon=True).start()
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        with job._lock:
+            job.status = 'running'
+        try:
+            result = fn(job, *args, **kwargs)
+            status, error = 'done', None
+        except Exception as e:
+            print(f"[JOB] {job.kind} {job.id} エラー: {e}", flush=True)
+            result, status, error = None, 'failed', str(e)
+        with job._lock:
+            job.result = result
+            job.status = status
+            job.error = error
+            job.finished_at = time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job.to_dict() if job else None
+
+    def recent(self, kind=None, limit=20):
+        with self._lock:
+            jobs = [j for j in reversed(self._jobs.values()) if kind is None or j.kind == kind]
+        return [j.to_dict() for j in jobs[:limit]]
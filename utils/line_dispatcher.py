@@ -0,0 +1,295 @@
+"""LINE送信ディスパッチャ
+
+push() / multicast() はキューに積んでメッセージIDを返すだけで、HTTPSリクエストは
+ワーカースレッドが行う。送信はトークンバケットで LINE_PUSH_RATE 件/秒に抑え、
+同じ文面を複数人に送るときは multicast（最大500人/リクエスト）にまとめる。
+429・5xx・タイムアウトは指数バックオフでワーカー側が再送（X-Line-Retry-Key で二重送信を防ぐ）。
+未送信のメッセージは outbox_file に書き出し、再起動後に送り直す（トークン自体は保存しない）。
+Webプロセスは LINE_OUTBOX_FILE、タスクワーカーは LINE_WORKER_OUTBOX_FILE を使い、互いの未送信分は送り直さない。
+"""
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import requests
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINE_PUSH_URL = 'https://api.line.me/v2/bot/message/push'
+LINE_MULTICAST_URL = 'https://api.line.me/v2/bot/message/multicast'
+MULTICAST_LIMIT = 500
+
+LINE_PUSH_RATE = float(os.getenv('LINE_PUSH_RATE', '20'))
+LINE_PUSH_BURST = int(os.getenv('LINE_PUSH_BURST', '10'))
+LINE_DISPATCH_WORKERS = int(os.getenv('LINE_DISPATCH_WORKERS', '4'))
+LINE_OUTBOX_FILE = os.getenv('LINE_OUTBOX_FILE', os.path.join(APP_DIR, 'data', 'line_outbox.json'))
+LINE_WORKER_OUTBOX_FILE = os.getenv('LINE_WORKER_OUTBOX_FILE', os.path.join(APP_DIR, 'data', 'line_outbox_worker.json'))
+# 状態を保持する完了済みメッセージ数
+LINE_STATUS_KEEP = 1000
+
+FINAL_STATES = ('sent', 'failed')
+
+
+class TokenBucket:
+    """rate 件/秒、最大 burst 件まで貯められるトークンバケット（スレッドセーフ）"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate if self.rate > 0 else 0.1
+            time.sleep(wait)
+
+
+class LineDispatcher:
+    """送信キュー＋ワーカー。tokens={'customer': トークン, ...} はアウトボックス保存用の名前付け"""
+
+    def __init__(self, tokens=None, rate=LINE_PUSH_RATE, burst=LINE_PUSH_BURST,
+                 workers=LINE_DISPATCH_WORKERS, outbox_file=LINE_OUTBOX_FILE):
+        self.tokens = {name: token for name, token in (tokens or {}).items() if token}
+        self.bucket = TokenBucket(rate, burst)
+        self.workers = max(1, workers)
+        self.outbox_file = outbox_file
+        self._jobs = OrderedDict()
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+        self.stats = {'queued': 0, 'sent': 0, 'failed': 0, 'retries': 0, 'requests': 0}
+        self._restore()
+
+    # ===== 呼び出し側 =====
+    def push(self, to, text, token=None, max_attempts=3):
+        """1人に送信（キューに積んでメッセージIDを返す）"""
+        return self._enqueue([to], text, token, max_attempts)
+
+    def multicast(self, user_ids, text, token=None, max_attempts=3):
+        """同じ文面を複数人に送信（重複を除いて500人ずつ multicast、1人なら push）"""
+        return self._enqueue(list(dict.fromkeys(u for u in user_ids if u)), text, token, max_attempts)
+
+    def status(self, message_id):
+        with self._cond:
+            job = self._jobs.get(message_id)
+            return self._public(job) if job else None
+
+    def wait(self, message_id, timeout=None):
+        """送信完了（sent/failed）まで待って状態を返す（タイムアウト時は途中の状態）"""
+        deadline = time.monotonic() + timeout if timeout else None
+        with self._cond:
+            while True:
+                job = self._jobs.get(message_id)
+                if job is None or job['status'] in FINAL_STATES:
+                    return job['status'] if job else None
+                remaining = deadline - time.monotonic() if deadline else None
+                if remaining is not None and remaining <= 0:
+                    return job['status']
+                self._cond.wait(remaining)
+
+    def drain(self, timeout=None):
+        """未送信のメッセージが無くなるまで待つ（終了前のCLI用）。残った件数を返す"""
+        deadline = time.monotonic() + timeout if timeout else None
+        with self._cond:
+            while True:
+                pending = sum(1 for j in self._jobs.values() if j['status'] not in FINAL_STATES)
+                remaining = deadline - time.monotonic() if deadline else None
+                if not pending or (remaining is not None and remaining <= 0):
+                    return pending
+                self._cond.wait(remaining)
+
+    def snapshot(self):
+        with self._cond:
+            pending = [j for j in self._jobs.values() if j['status'] not in FINAL_STATES]
+            return {
+                'workers': self.workers,
+                'rate': self.bucket.rate,
+                'pending': len(pending),
+                'retrying': sum(1 for j in pending if j['status'] == 'retrying'),
+                **self.stats,
+            }
+
+    # ===== 内部 =====
+    def _channel(self, token):
+        for name, value in self.tokens.items():
+            if value == token:
+                return name
+        return None
+
+    def _enqueue(self, recipients, text, token, max_attempts):
+        message_id = uuid.uuid4().hex[:16]
+        job = {
+            'id': message_id,
+            'recipients': recipients,
+            'text': text,
+            'token': token,
+            'channel': self._channel(token),
+            'chunks': [
+                {'to': recipients[i:i + MULTICAST_LIMIT], 'retry_key': str(uuid.uuid4())}
+                for i in range(0, len(recipients), MULTICAST_LIMIT)
+            ],
+            'attempts': 0,
+            'max_attempts': max(1, max_attempts),
+            'status': 'queued',
+            'error': None,
+            'created_at': time.time(),
+            'finished_at': None,
+        }
+        with self._cond:
+            self._jobs[message_id] = job
+            self.stats['queued'] += 1
+            if not job['chunks']:
+                self._finish(job, 'sent')
+            else:
+                self._schedule(job, 0)
+                self._save_outbox()
+            self._ensure_workers()
+        return message_id
+
+    def _schedule(self, job, delay):
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), job['id']))
+        # wait() の待機者とワーカーが同じ条件変数を使うため全員起こす
+        self._cond.notify_all()
+
+    def _finish(self, job, status, error=None):
+        job['status'] = status
+        job['error'] = error
+        job['finished_at'] = time.time()
+        job['token'] = None
+        self.stats[status] += 1
+        # 完了済みは古いものから捨てる
+        done = [k for k, j in self._jobs.items() if j['status'] in FINAL_STATES]
+        for k in done[:max(0, len(done) - LINE_STATUS_KEEP)]:
+            del self._jobs[k]
+        self._cond.notify_all()
+
+    def _public(self, job):
+        return {k: job[k] for k in ('id', 'recipients', 'status', 'attempts', 'error', 'created_at', 'finished_at')}
+
+    def _ensure_workers(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f'line-dispatch-{i}', daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                if self._heap:
+                    due, _, message_id = self._heap[0]
+                    wait = due - time.monotonic()
+                    if wait <= 0:
+                        heapq.heappop(self._heap)
+                        job = self._jobs.get(message_id)
+                        if job and job['status'] not in FINAL_STATES:
+                            job['status'] = 'sending'
+                            job['attempts'] += 1
+                            return job
+                        continue
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            error, retryable = None, False
+            for chunk in list(job['chunks']):
+                error, retryable = self._send_chunk(job, chunk)
+                if error:
+                    break
+                with self._cond:
+                    job['chunks'].remove(chunk)
+            with self._cond:
+                if not error:
+                    self._finish(job, 'sent')
+                elif retryable and job['attempts'] < job['max_attempts']:
+                    job['status'] = 'retrying'
+                    job['error'] = error
+                    self.stats['retries'] += 1
+                    self._schedule(job, 2 ** (job['attempts'] - 1))
+                else:
+                    self._finish(job, 'failed', error)
+                    print(f"[LINE] 送信失敗 {job['id']}（{len(job['recipients'])}人）: {error}", flush=True)
+                self._save_outbox()
+
+    def _send_chunk(self, job, chunk):
+        """(エラー文字列 or None, 再送するか)"""
+        if os.getenv("TEST_MODE", "false").lower() == "true":
+            print(f"[テストモード] {','.join(u[:8] for u in chunk['to'])}... → {job['text'][:30]}...", flush=True)
+            return None, False
+        token = job['token'] or self.tokens.get(job['channel'])
+        if not token:
+            return 'LINEのトークンが設定されていません', False
+
+        multicast = len(chunk['to']) > 1
+        body = {
+            'to': chunk['to'] if multicast else chunk['to'][0],
+            'messages': [{'type': 'text', 'text': job['text']}],
+        }
+        headers = {
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/json',
+            'X-Line-Retry-Key': chunk['retry_key'],
+        }
+        self.bucket.acquire()
+        with self._cond:
+            self.stats['requests'] += 1
+        try:
+            res = requests.post(LINE_MULTICAST_URL if multicast else LINE_PUSH_URL,
+                                headers=headers, json=body, timeout=10)
+        except requests.exceptions.RequestException as e:
+            return f'通信エラー: {e}', True
+        # 409 は同じ X-Line-Retry-Key で受付済み（前回の試行が届いていた）
+        if res.status_code in (200, 409):
+            return None, False
+        return f'{res.status_code} - {res.text[:200]}', res.status_code == 429 or res.status_code >= 500
+
+    # ===== アウトボックス（未送信分の保存・復元）=====
+    def _save_outbox(self):
+        if not self.outbox_file:
+            return
+        pending = [
+            {'id': j['id'], 'recipients': [u for c in j['chunks'] for u in c['to']], 'text': j['text'],
+             'channel': j['channel'], 'max_attempts': j['max_attempts']}
+            for j in self._jobs.values() if j['status'] not in FINAL_STATES and j['channel']
+        ]
+        try:
+            os.makedirs(os.path.dirname(self.outbox_file), exist_ok=True)
+            tmp = f'{self.outbox_file}.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(pending, f, ensure_ascii=False)
+            os.replace(tmp, self.outbox_file)
+        except OSError as e:
+            print(f"[LINE] アウトボックス保存エラー: {e}", flush=True)
+
+    def _restore(self):
+        if not self.outbox_file:
+            return
+        try:
+            with open(self.outbox_file, 'r', encoding='utf-8') as f:
+                pending = json.load(f)
+        except (OSError, ValueError):
+            return
+        for p in pending:
+            token = self.tokens.get(p.get('channel'))
+            if token and p.get('recipients'):
+                self._enqueue(p['recipients'], p['text'], token, p.get('max_attempts', 3))
+        if pending:
+            print(f"[LINE] 未送信 {len(pending)}件をアウトボックスから再登録", flush=True)
@@ -0,0 +1,77 @@
+"""LINE送信の窓口（顧客用・スタッフ用チャネルのトークンと送信ヘルパー）
+
+ディスパッチャは最初の送信時に作る。未送信分のアウトボックス（保存・再起動後の再送）は
+enable_line_outbox() を呼んだプロセスだけが使う（Webは create_app()、タスクワーカーは別ファイル）。
+同じアウトボックスファイルを複数プロセスで使うと二重送信になる。
+"""
+import os
+import threading
+
+from utils.line_dispatcher import LineDispatcher
+
+
+LINE_BOT_TOKEN = os.getenv('LINE_CHANNEL_ACCESS_TOKEN')
+LINE_BOT_TOKEN_STAFF = os.getenv('LINE_CHANNEL_ACCESS_TOKEN_STAFF')
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+_outbox_file = None
+
+
+def enable_line_outbox(path):
+    """このプロセスの未送信分を path に保存し、ディスパッチャ作成時に復元する（ディスパッチャ作成前に呼ぶ）"""
+    global _outbox_file
+    with _dispatcher_lock:
+        if _dispatcher is not None and _dispatcher.outbox_file != path:
+            raise RuntimeError('LINEディスパッチャ作成後にアウトボックスは変更できません')
+        _outbox_file = path
+
+
+def get_line_dispatcher():
+    """LINE送信はすべてディスパッチャ経由（レート制限・multicast・ワーカー側での再送）"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = LineDispatcher(tokens={'customer': LINE_BOT_TOKEN, 'staff': LINE_BOT_TOKEN_STAFF},
+                                         outbox_file=_outbox_file)
+        return _dispatcher
+
+
+def send_line_message(user_id, message, token=None, max_retries=3):
+    """LINE送信（ディスパッチャに積んで結果を待つ。送信結果が必要な呼び出し用）"""
+    if token is None:
+        token = LINE_BOT_TOKEN
+    dispatcher = get_line_dispatcher()
+    message_id = dispatcher.push(user_id, message, token, max_attempts=max_retries)
+    return dispatcher.wait(message_id, timeout=60) == 'sent'
+
+
+def queue_line_message(user_id, message, token=None):
+    """LINE送信を登録してすぐ返す（メッセージIDで状態を確認できる）"""
+    return get_line_dispatcher().push(user_id, message, token or LINE_BOT_TOKEN)
+
+
+def queue_line_multicast(user_ids, message, token=None):
+    """同じ文面を複数人へ（multicastにまとめて登録してすぐ返す）"""
+    return get_line_dispatcher().multicast(user_ids, message, token or LINE_BOT_TOKEN)
+
+
+def notify_shop_booking_change(customer_name, old_datetime, new_datetime, staff_name=""):
+    """予約変更を店舗LINEに通知"""
+    message = f"""【予約変更通知】
+お客様: {customer_name}
+変更前: {old_datetime}
+変更後: {new_datetime}
+担当: {staff_name}
+
+※お客様がLIFFから変更しました"""
+    
+    # 本番モード: 全スタッフに送信
+    STAFF_IDS = [
+        "U9022782f05526cf7632902acaed0cb08",  # 神原良祐
+        "U1d1dfe1993f1857327678e37b607187a",  # test沙織
+        "U2c097f177a2c96b0732f6d15152d0d68",  # 太田由香利
+        "Ude9ef7ceb8f04d2e7a207aabec5591c5",  # HAL本店1
+    ]
+    return queue_line_multicast(STAFF_IDS, message, LINE_BOT_TOKEN_STAFF)
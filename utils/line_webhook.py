@@ -0,0 +1,180 @@
+"""LINE Webhook の受信キュー
+
+/webhook/line は署名を検証してイベントをキューに積み、すぐ 200 を返す。
+Supabase・LINE API を呼ぶ処理はワーカースレッドが行い、webhookEventId で重複処理を防ぐ
+（LINEの再送・同じリクエストの二重受信でも1回だけ処理する）。
+未処理のイベントは LINE_WEBHOOK_INBOX_FILE に書き出し、再起動後に処理し直す。
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINE_WEBHOOK_WORKERS = int(os.getenv('LINE_WEBHOOK_WORKERS', '2'))
+LINE_WEBHOOK_INBOX_FILE = os.getenv('LINE_WEBHOOK_INBOX_FILE', os.path.join(APP_DIR, 'data', 'line_webhook_inbox.json'))
+# 重複判定のために覚えておく処理済み webhookEventId の数
+LINE_WEBHOOK_SEEN_KEEP = 5000
+# 遅延の統計に使う直近の件数
+LINE_WEBHOOK_LATENCY_KEEP = 500
+
+
+def verify_signature(body, signature, secret):
+    """X-Line-Signature（本文の HMAC-SHA256 を base64）を検証"""
+    if not signature:
+        return False
+    digest = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).digest()
+    return hmac.compare_digest(base64.b64encode(digest).decode('ascii'), signature)
+
+
+def event_key(event):
+    """重複判定キー（webhookEventId が無い古い形式は内容から作る）"""
+    if event.get('webhookEventId'):
+        return event['webhookEventId']
+    raw = json.dumps(event, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return 'sha1:' + hashlib.sha1(raw).hexdigest()
+
+
+def _percentile(values, ratio):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))]
+
+
+class WebhookEventQueue:
+    """イベント単位の処理キュー（ワーカーはデーモンスレッド、初回enqueue時に起動）"""
+
+    def __init__(self, handler, workers=LINE_WEBHOOK_WORKERS, inbox_file=LINE_WEBHOOK_INBOX_FILE):
+        self.handler = handler    # handler(event) をワーカーで呼ぶ
+        self.workers = max(1, workers)
+        self.inbox_file = inbox_file
+        self._queue = queue.Queue()
+        self._pending = OrderedDict()    # key -> (event, 受信時刻)
+        self._running = {}        # 処理中（再起動で中断したら再処理する）
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._wait_ms = deque(maxlen=LINE_WEBHOOK_LATENCY_KEEP)
+        self._process_ms = deque(maxlen=LINE_WEBHOOK_LATENCY_KEEP)
+        self.stats = {'received': 0, 'duplicates': 0, 'processed': 0, 'failed': 0}
+        self._restore()
+
+    def enqueue(self, events):
+        """イベントを積んで、新規に登録した件数を返す（処理済み・処理待ちの同じIDは捨てる）"""
+        added = 0
+        with self._lock:
+            for event in events:
+                key = event_key(event)
+                self.stats['received'] += 1
+                if key in self._seen or key in self._pending or key in self._running:
+                    self.stats['duplicates'] += 1
+                    continue
+                self._pending[key] = (event, time.time())
+                self._queue.put(key)
+                added += 1
+            if added:
+                self._save_inbox()
+                self._ensure_workers()
+        return added
+
+    def depth(self):
+        with self._lock:
+            return len(self._pending) + len(self._running)
+
+    def status(self):
+        with self._lock:
+            wait, process = list(self._wait_ms), list(self._process_ms)
+            return {
+                'workers': self.workers,
+                'queued': len(self._pending),
+                'running': len(self._running),
+                **self.stats,
+                'wait_ms': self._summary(wait),
+                'process_ms': self._summary(process),
+            }
+
+    @staticmethod
+    def _summary(values):
+        if not values:
+            return {'count': 0, 'avg': None, 'p95': None, 'max': None}
+        return {
+            'count': len(values),
+            'avg': round(sum(values) / len(values), 1),
+            'p95': round(_percentile(values, 0.95), 1),
+            'max': round(max(values), 1),
+        }
+
+    def _ensure_workers(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f'line-webhook-{i}', daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _worker(self):
+        while True:
+            key = self._queue.get()
+            with self._lock:
+                item = self._pending.pop(key, None)
+                if item is None:
+                    self._queue.task_done()
+                    continue
+                event, received_at = item
+                self._running[key] = item
+            started = time.time()
+            ok = False
+            try:
+                self.handler(event)
+                ok = True
+            except Exception as e:
+                print(f"[WEBHOOK] イベント処理エラー {key}: {e}", flush=True)
+            finally:
+                finished = time.time()
+                with self._lock:
+                    self._running.pop(key, None)
+                    # 失敗しても再処理はしない（LINEには200を返済み、二重登録を避ける）
+                    self._seen[key] = finished
+                    while len(self._seen) > LINE_WEBHOOK_SEEN_KEEP:
+                        self._seen.popitem(last=False)
+                    self.stats['processed' if ok else 'failed'] += 1
+                    self._wait_ms.append((started - received_at) * 1000)
+                    self._process_ms.append((finished - started) * 1000)
+                    self._save_inbox()
+                self._queue.task_done()
+
+    # ===== 受信箱（未処理イベントの保存・復元）=====
+    def _save_inbox(self):
+        if not self.inbox_file:
+            return
+        pending = [
+            {'event': event, 'received_at': received_at}
+            for event, received_at in list(self._running.values()) + list(self._pending.values())
+        ]
+        try:
+            os.makedirs(os.path.dirname(self.inbox_file), exist_ok=True)
+            tmp = f'{self.inbox_file}.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(pending, f, ensure_ascii=False)
+            os.replace(tmp, self.inbox_file)
+        except OSError as e:
+            print(f"[WEBHOOK] 受信箱保存エラー: {e}", flush=True)
+
+    def _restore(self):
+        if not self.inbox_file:
+            return
+        try:
+            with open(self.inbox_file, 'r', encoding='utf-8') as f:
+                pending = json.load(f)
+        except (OSError, ValueError):
+            return
+        events = [p['event'] for p in pending if isinstance(p, dict) and p.get('event')]
+        if events:
+            self.enqueue(events)
+            print(f"[WEBHOOK] 未処理 {len(events)}件を受信箱から再登録", flush=True)
@@ -0,0 +1,189 @@
+"""メニュー名照合用の事前計算インデックス
+
+予約メニュー文字列 → salonboard_menus / salon_menus の行 を、
+メニュー数×キーワード数の総当たりではなく Aho-Corasick で len(文字列) に比例する時間で引く。
+インデックスはメニューテーブルの内容（キャッシュのETag）単位で作り直す。
+"""
+import re
+from bisect import bisect_right
+from collections import deque
+
+# 施術時間検索のフォールバックキーワード（優先順）
+DURATION_KEYWORDS = ['パリジェンヌ', 'まつ毛パーマ', '上まつ毛', '下まつげ', '上下', 'フラットラッシュ', 'ブラウン', 'パリエク', '3Dブロウ', 'リペア']
+
+# salon_menus の金額照合用（キー → salon_menus側で探す語、優先順）
+PRICE_KEYWORDS = {
+    'フラットラッシュ100本': ['フラットラッシュ100本'],
+    'フラットラッシュ120本': ['フラットラッシュ120本'],
+    'フラットラッシュ140本': ['フラットラッシュ140本'],
+    'フラットラッシュつけ放題': ['フラットラッシュつけ放題'],
+    'ブラウンニュアンスカラー120本': ['ブラウンニュアンスカラー120本'],
+    'ブラウンニュアンスカラー140本': ['ブラウンニュアンスカラー140本'],
+    'ブラウンニュアンスカラーつけ放題': ['ブラウンニュアンスカラーつけ放題'],
+    'パリジェンヌラッシュリフト': ['パリジェンヌラッシュリフト', 'パリジェンヌ'],
+    '上下パリジェンヌ': ['上下パリジェンヌ'],
+    '上まつ毛パーマ': ['上まつ毛パーマ', '上まつげパーマ'],
+    '上下まつ毛パーマ': ['上下まつ毛パーマ', '上下まつげパーマ'],
+    '下まつげパーマ': ['下まつげパーマ', '下まつ毛パーマ'],
+    '眉ワックス': ['眉ワックス', '3Dブロウワックス'],
+    'パリエク120本': ['パリエク120本'],
+    'パリエク140本': ['パリエク140本'],
+    'パリエク付け放題': ['パリエク付け放題', 'パリエクつけ放題'],
+    'リペア': ['リペア'],
+}
+
+_BRACKETS = re.compile(r'【[^】]+】|《[^》]+》')
+_SEP = '\x00'
+
+
+def clean_menu_name(name):
+    """【...】《...》を除いたメニュー名"""
+    return _BRACKETS.sub('', name or '').strip()
+
+
+class AhoCorasick:
+    """複数パターンの同時部分一致検索（純Python）"""
+
+    def __init__(self, patterns=()):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for i, p in enumerate(patterns):
+            self.add(p, i)
+        self.build()
+
+    def add(self, pattern, value):
+        if not pattern:
+            return
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(value)
+
+    def build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find_all(self, text):
+        """text 中に現れるパターンの value を（重複なしで）返す"""
+        found = set()
+        node = 0
+        goto, fail, out = self._goto, self._fail, self._out
+        for ch in text or '':
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+
+class MenuIndex:
+    """メニュー行リストから作る照合インデックス
+
+    match() の優先順は従来の線形走査と同じ:
+      1. 直接一致 … メニュー名が問い合わせに含まれる／問い合わせがメニュー名に含まれる（先頭の行）
+      2. キーワード … 問い合わせに含まれる最優先キーワードの語を名前に含む先頭の行
+    """
+
+    def __init__(self, menus, keywords=DURATION_KEYWORDS, clean=False):
+        self.menus = list(menus or [])
+        self.clean = clean
+        self.names = [self._normalize(m.get('name')) for m in self.menus]
+
+        # 1a. メニュー名 ⊂ 問い合わせ
+        self._names_ac = AhoCorasick(self.names)
+        # 1b. 問い合わせ ⊂ メニュー名：連結文字列に対する str.find ＋ 二分探索で行番号へ
+        self._haystack = _SEP.join(self.names)
+        self._starts = []
+        pos = 0
+        for n in self.names:
+            self._starts.append(pos)
+            pos += len(n) + 1
+
+        # 2. キーワード → 該当する先頭の行（構築時に解決しておく）
+        if isinstance(keywords, dict):
+            keywords = list(keywords.items())
+        else:
+            keywords = [(k, [k]) for k in keywords]
+        self._keywords = [k for k, _ in keywords]
+        self._keyword_rows = [self._first_containing(words) for _, words in keywords]
+        self._keywords_ac = AhoCorasick(self._keywords)
+
+    def _normalize(self, name):
+        return clean_menu_name(name) if self.clean else (name or '')
+
+    def _first_containing(self, words):
+        raw = [m.get('name') or '' for m in self.menus]
+        for w in words:
+            for i, n in enumerate(raw):
+                if w in n:
+                    return i
+        return None
+
+    def _row_at(self, pos):
+        return bisect_right(self._starts, pos) - 1
+
+    def match_direct(self, query):
+        q = self._normalize(query)
+        if not q:
+            return None
+        rows = self._names_ac.find_all(q)
+        pos = self._haystack.find(q)
+        if pos >= 0 and _SEP not in q:
+            rows.add(self._row_at(pos))
+        return self.menus[min(rows)] if rows else None
+
+    def match_keyword(self, query):
+        ranks = sorted(self._keywords_ac.find_all(self._normalize(query)))
+        for rank in ranks:
+            row = self._keyword_rows[rank]
+            if row is not None:
+                return self.menus[row]
+        return None
+
+    def match(self, query, keyword_first=False):
+        """一致した行を返す（なければ None）"""
+        order = (self.match_keyword, self.match_direct) if keyword_first else (self.match_direct, self.match_keyword)
+        for fn in order:
+            m = fn(query)
+            if m is not None:
+                return m
+        return None
+
+    def duration_for(self, query, default=60):
+        m = self.match(query)
+        return m['duration'] if m and m.get('duration') else default
+
+
+class IndexByEtag:
+    """キャッシュのETagが変わった時だけインデックスを作り直す"""
+
+    def __init__(self, **options):
+        self.options = options
+        self._state = (None, None)
+
+    def get(self, entry):
+        if entry is None:
+            return None
+        etag, index = self._state
+        if entry.etag != etag:
+            # 同時に作り直しても結果は同じなのでロック不要（タプルの差し替えのみ）
+            index = MenuIndex(entry.value, **self.options)
+            self._state = (entry.etag, index)
+        return index
@@ -0,0 +1,350 @@
+"""リマインド通知のパイプライン
+
+1. 準備：顧客・対象日の予約・本日分の reminder_logs をそれぞれ1クエリで取得
+2. 計画：送信先と文面をメモリ上で組み立てる（本日送信済み・テストモード対象外は除外）
+3. 送信：レート制限付きの並列送信（REMINDER_SEND_RATE 件/秒、REMINDER_SEND_WORKERS 並列）
+4. 記録：reminder_logs に一括INSERT
+dry_run=True なら 1・2 だけ行い、送信計画と所要時間を返す。
+"""
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+from utils.customer_index import CustomerIndex
+from utils.supabase_client import supabase
+
+JST = timezone(timedelta(hours=9))
+REMINDER_SEND_RATE = float(os.getenv('REMINDER_SEND_RATE', '5'))
+REMINDER_SEND_WORKERS = int(os.getenv('REMINDER_SEND_WORKERS', '4'))
+
+# テストモード: 神原良祐とtest沙織のみ
+TEST_PHONES = ["09015992055", "09012345678"]
+# 送信失敗を通知するスタッフ
+FAILURE_NOTIFY_IDS = [
+    "U9022782f05526cf7632902acaed0cb08",  # 神原良祐
+    "U1d1dfe1993f1857327678e37b607187a",  # test沙織
+    "U2c097f177a2c96b0732f6d15152d0d68",  # 太田由香利
+    "Ude9ef7ceb8f04d2e7a207aabec5591c5",  # HAL本店1
+]
+
+
+def format_visit_datetime(dt_str):
+    """予約日時を「12月16日(火)11:30〜」形式に"""
+    # 新形式: 2025-12-16 11:30:00
+    if " " in dt_str and "-" in dt_str:
+        parts = dt_str.split(" ")
+        date_part = parts[0]  # 2025-12-16
+        time_part = parts[1][:5]  # 11:30
+        y, month, day = date_part.split("-")
+        weekdays = ["月", "火", "水", "木", "金", "土", "日"]
+        d = date(int(y), int(month), int(day))
+        time_part_formatted = time_part.lstrip("0") if time_part.startswith("0") else time_part
+        return f"{int(month)}月{int(day)}日({weekdays[d.weekday()]}){time_part_formatted}〜"
+    # 旧形式: 12/16 11:30
+    m = re.match(r'(\d+)/(\d+)(\d{2}:\d{2})', dt_str)
+    if m:
+        month, day, tm = m.groups()
+        weekdays = ['月', '火', '水', '木', '金', '土', '日']
+        d = date(2025, int(month), int(day))
+        return f"{month}月{day}日({weekdays[d.weekday()]}){tm}〜"
+    return dt_str
+
+
+def clean_menu(m):
+    """メニュー名から金額・タグ・装飾を除いて先頭の1メニューだけにする"""
+    has_off_shampoo = 'オフあり+アイシャンプー' in m or 'オフあり＋アイシャンプー' in m
+    # 金額・点数を先に削除
+    m = re.sub(r'[¥￥][0-9,]+\s*円?', '', m)
+    m = re.sub(r'\d+[,\d]*\s*円', '', m)
+    m = re.sub(r'\d+点\s*', '', m)
+    exclude = ['【全員】', '【次回】', '【リピーター様】', '【4週間以内】', '【ご新規】',
+        'オフあり+アイシャンプー', 'オフあり＋アイシャンプー', '次世代まつ毛パーマ', 'ダメージレス',
+        '(4週間以内 )', '(4週間以内)', '(アイシャンプー・トリートメント付き)', '(アイシャンプー・トリートメント付)', '(SP・TR付)',
+        '(まゆげパーマ)', '(眉毛Wax)', '＋メイク付', '+メイク付',
+        'カラー変更', '束感★', '【まつげエクステ】', '【その他まつげメニュー】', '【付替オフ】', '◇']
+    for w in exclude:
+        m = m.replace(w, '')
+    m = re.sub(r'\(ｸｰﾎﾟﾝ\)', '', m)
+    m = re.sub(r'《[^》]*》', '', m)
+    m = re.sub(r'【[^】]*】', '', m)
+    m = re.sub(r'◇', '', m)
+    # / で分割して重複削除
+    parts = re.split(r'\s*/\s*', m)
+    seen = []
+    for p in parts:
+        p = p.strip().strip('　').strip()
+        if p and p not in seen and len(p) > 2:
+            seen.append(p)
+    m = seen[0] if seen else ''
+    m = re.sub(r'\s+', ' ', m).strip()
+    if has_off_shampoo and m:
+        m = f'{m}（オフあり+アイシャンプー）'
+    return m
+
+
+def build_message(booking, customer_name, days):
+    """予約1件分のリマインド文面（送らない場合は None）"""
+    visit_dt = booking.get('visit_datetime', '')
+    staff = booking.get('staff', '')
+    formatted_dt = format_visit_datetime(visit_dt)
+    cleaned_menu = clean_menu(booking.get('menu', ''))
+    staff_surname = staff.split('　')[0].split(' ')[0] if staff else ''
+    staff_line = f"担当：{staff_surname}（指名料￥300）" if staff_surname and booking.get('is_designated', False) else ""
+
+    # staff_on_duty=falseの場合：3日前は変更催促、7日前は送信なし
+    if not booking.get('staff_on_duty', True):
+        if days != 3:
+            return None
+        return f"""{customer_name} 様
+ご予約変更の件でご連絡しました♪
+
+ご予約変更完了の期日は
+【本日中】となっております💦
+
+本日中にご変更手続きが完了しない場合、
+【次回予約特典】が失効となります。
+
+失効となった際、次回のご予約は
+【通常料金】でのご案内となります😭
+
+スムーズなご案内のためにも、
+お早めのご予約変更の完了されることを
+オススメしております。
+
+お手すきの際にご確認のほど、
+どうぞよろしくお願いいたします🙇‍♀️"""
+    if days == 3:
+        return f"""{customer_name} 様
+ご予約【3日前】のお知らせ🕊️
+【本店】
+{formatted_dt}
+{cleaned_menu}
+{(staff_line + chr(10) + chr(10)) if staff_line else chr(10)}下記はすべてのお客様に気持ちよくご利用いただくためのご案内です。
+ご理解とご協力をお願いいたします🙇‍♀️
+
+■ 遅刻について
+スタッフ判断でメニュー変更や日時変更となる場合があり
+
+＜次回予約特典が失効＞
+◉予約日から3日前まで
+※ご予約日の前倒し・同日時間変更は適用のまま
+◉最終来店日から3ヶ月経過
+
+＜キャンセル料＞
+◾️次回予約特典
+当日変更：施術代金の50％
+◾️通常予約
+前日変更：施術代金の50％
+当日変更：施術代金の100％"""
+    return f"""{customer_name} 様
+ご予約日【7日前】のお知らせ🕊️
+{formatted_dt}
+{cleaned_menu}
+{(staff_line + chr(10) + chr(10)) if staff_line else chr(10)}「マツエクが残っている」
+「カールが残っている」
+「眉毛の手入れをした…」
+「仕事が入った」
+など、ご予約日延期は、お早めにご協力をお願いします✨
+
+＜次回予約特典が失効＞
+◉予約日から3日前まで
+※ご予約日の前倒し・同日時間変更は適用のまま
+◉最終来店日から3ヶ月経過
+
+＜キャンセル料＞
+◾️次回予約特典
+当日変更：施術代金の50％
+◾️通常予約
+前日変更：施術代金の50％
+当日変更：施術代金の100％"""
+
+
+class RateLimiter:
+    """rate 件/秒を超えないよう acquire() で待たせる（スレッド間で共有）"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def load_context(target_days, today):
+    """顧客・対象日の予約・本日の送信ログを1クエリずつ取得（失敗時は None）"""
+    cust_response = supabase.get('customers?select=*')
+    if cust_response.status_code != 200:
+        return None
+    customers = cust_response.json()
+
+    dates = [(today + timedelta(days=d)).strftime("%Y-%m-%d") for d in target_days]
+    likes = ','.join(f'visit_datetime.like.{d}*' for d in dates)
+    book_response = supabase.get(f'8weeks_bookings?or=({likes})&select=*')
+    bookings = book_response.json() if book_response.status_code == 200 else None
+
+    # 本日送信済み（成功・失敗とも）の (電話番号, 何日前) は再送しない
+    today_str = today.strftime("%Y-%m-%d")
+    days_list = ','.join(str(d) for d in target_days)
+    log_response = supabase.get(f'reminder_logs?sent_at=gte.{today_str}T00:00:00&days_ahead=in.({days_list})&select=phone,days_ahead')
+    if log_response.status_code != 200:
+        print(f"[リマインド] 送信ログ取得失敗: {log_response.status_code}", flush=True)
+        return None
+    sent = {(r.get('phone') or '', r.get('days_ahead')) for r in log_response.json()}
+
+    by_date = {d: [] for d in dates}
+    for b in bookings or []:
+        day = by_date.get((b.get('visit_datetime') or '')[:10])
+        if day is not None:
+            day.append(b)
+    return {
+        'customers': customers,
+        'bookings': by_date if bookings is not None else None,
+        'sent': sent,
+    }
+
+
+def build_plan(context, target_days, today, test_mode=True, force_recipient=None):
+    """(送信計画リスト, 結果カウンタ) をメモリ上で組み立てる"""
+    results = {}
+    for d in target_days:
+        results[f"{d}days" if d > 0 else "today"] = {"sent": 0, "failed": 0, "no_match": 0}
+
+    index = CustomerIndex(context['customers'])
+    sent = set(context['sent'])
+
+    plan = []
+    for days in target_days:
+        label = f"{days}days" if days > 0 else "today"
+        if context['bookings'] is None:
+            continue
+        for booking in context['bookings'][(today + timedelta(days=days)).strftime("%Y-%m-%d")]:
+            customer_name = booking.get('customer_name', '').split('\n')[0].replace('★', '').strip()
+            phone = booking.get('phone', '') or ''
+
+            customer = index.customer_by_phone(phone) if phone else None
+            if customer is None:
+                customer = index.customer_by_name(customer_name)
+            if not customer or not customer.get('line_user_id'):
+                results[label]["no_match"] += 1
+                continue
+
+            message = build_message(booking, customer_name, days)
+            if message is None:
+                print(f"[リマインド] スキップ: {customer_name}（担当: {booking.get('staff', '')} は休日、{days}日前のため送信なし）", flush=True)
+                continue
+            if not booking.get('staff_on_duty', True):
+                print(f"[リマインド] 変更催促メッセージ: {customer_name}（担当: {booking.get('staff', '')} は休日）", flush=True)
+
+            # 重複送信チェック（本日送信済み／同じラン内の同一電話番号）
+            if (phone, days) in sent:
+                continue
+            if test_mode and phone not in TEST_PHONES:
+                continue
+            sent.add((phone, days))
+
+            plan.append({
+                'label': label,
+                'days': days,
+                'phone': phone,
+                'customer_name': customer_name,
+                'recipient': force_recipient if force_recipient else customer['line_user_id'],
+                'message': message,
+            })
+    return plan, results
+
+
+def send_plan(plan, send, rate=REMINDER_SEND_RATE, workers=REMINDER_SEND_WORKERS):
+    """計画どおりに並列送信し、各エントリに status（sent/failed）を付ける"""
+    limiter = RateLimiter(rate)
+
+    def deliver(entry):
+        limiter.acquire()
+        try:
+            ok = send(entry['recipient'], entry['message'])
+        except Exception as e:
+            print(f"[リマインド] 送信エラー: {entry['customer_name']} - {e}", flush=True)
+            ok = False
+        entry['status'] = 'sent' if ok else 'failed'
+
+    if not plan:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(plan)))) as executor:
+        list(executor.map(deliver, plan))
+
+
+def write_logs(plan):
+    """送信結果を reminder_logs に一括INSERT"""
+    rows = [{'phone': e['phone'], 'customer_name': e['customer_name'], 'days_ahead': e['days'], 'status': e['status']}
+            for e in plan if e.get('status')]
+    if not rows:
+        return True
+    res = supabase.insert('reminder_logs', rows)
+    if res.status_code not in [200, 201]:
+        print(f"[リマインド] ログ保存失敗: {res.status_code} - {res.text[:100]}", flush=True)
+        return False
+    return True
+
+
+def run_reminders(send, test_mode=True, target_days=None, force_recipient=None, dry_run=False, notify=None):
+    """リマインド送信（準備→計画→送信→記録）。dry_run なら計画と所要時間だけ返す
+
+    send(宛先, 文面) は送信結果を返す関数、notify(宛先リスト, 文面) は失敗通知用（待たない送信）
+    """
+    if target_days is None:
+        target_days = [3, 7]
+    today = datetime.now(JST)
+    timing = {}
+
+    started = time.perf_counter()
+    context = load_context(target_days, today)
+    if context is None:
+        return {"error": "顧客データ取得失敗"}
+    timing['load'] = round(time.perf_counter() - started, 3)
+
+    t = time.perf_counter()
+    plan, results = build_plan(context, target_days, today, test_mode, force_recipient)
+    timing['plan'] = round(time.perf_counter() - t, 3)
+
+    if dry_run:
+        timing['total'] = round(time.perf_counter() - started, 3)
+        print(f"[リマインド] dry-run: {len(plan)}件 {timing}", flush=True)
+        return {
+            'dry_run': True,
+            'timing': timing,
+            'results': results,
+            'plan': [{k: e[k] for k in ('label', 'phone', 'customer_name', 'recipient', 'message')} for e in plan],
+        }
+
+    t = time.perf_counter()
+    send_plan(plan, send)
+    timing['send'] = round(time.perf_counter() - t, 3)
+
+    t = time.perf_counter()
+    write_logs(plan)
+    timing['log'] = round(time.perf_counter() - t, 3)
+
+    for entry in plan:
+        results[entry['label']][entry['status']] += 1
+        if entry['status'] == 'failed':
+            notify_message = f"❌ リマインド送信失敗\n{entry['customer_name']}様（{entry['days']}日前）"
+            if notify:
+                notify(FAILURE_NOTIFY_IDS, notify_message)
+                continue
+            for staff_id in FAILURE_NOTIFY_IDS:
+                try:
+                    send(staff_id, notify_message)
+                except Exception:
+                    pass
+
+    timing['total'] = round(time.perf_counter() - started, 3)
+    print(f"[リマインド] 送信{len(plan)}件 {timing}", flush=True)
+    return results
@@ -0,0 +1,152 @@
+"""ブラウザを使わない SalonBoard の予約一覧・スケジュール取得（HTTPのみ）
+
+ブラウザのログインで保存した session_cookies.json と、実ブラウザから記録した captured_headers.json の
+ヘッダーを1つの requests.Session（コネクションプール付き）に載せて reserveList/searchDate・salonSchedule を取得し、
+extract_list_html / extract_schedule_html でブラウザ版と同じ形のデータにする。
+前回のレスポンスの ETag / Last-Modified があれば条件付きリクエストにし、304 は「変化なし」として扱う。
+ログイン画面への転送・429/503・JSで描画される（HTMLに一覧テーブル・スタッフ行が無い）ページは
+NeedsBrowser を送出し、呼び出し側がその日付だけブラウザで取り直す。
+"""
+import json
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.browser_pool import APP_DIR, CONTEXT_OPTIONS, COOKIE_FILE
+from utils.salonboard_parse import extract_list_html, extract_schedule_html
+
+CAPTURED_HEADERS_FILE = os.path.join(APP_DIR, 'captured_headers.json')
+# http: 一覧・スケジュールをHTTPで取得し、必要な日付だけブラウザ / browser: すべてブラウザ
+SCRAPE_ENGINE = os.getenv('SCRAPE_ENGINE', 'http')
+SCRAPE_HTTP_WORKERS = int(os.getenv('SCRAPE_HTTP_WORKERS', '4'))
+HTTP_TIMEOUT = (5, 30)
+
+LIST_URL = 'https://salonboard.com/KLP/reserve/reserveList/searchDate?date={date}'
+SCHEDULE_URL = 'https://salonboard.com/KLP/schedule/salonSchedule/?date={date}'
+THROTTLE_STATUS = (429, 503)
+# 記録したヘッダーのうちリクエストごとに変わるもの・requests 側で付けるものは使わない
+SKIP_HEADERS = {'cookie', 'content-length', 'content-type', 'origin', 'referer', 'host'}
+
+
+class NeedsBrowser(Exception):
+    """このページはHTTPだけでは取得できない（reason: login / throttled / no-table / no-rows / HTTP xxx）"""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def load_captured_headers(path=CAPTURED_HEADERS_FILE):
+    """記録したリクエストのうち、ページ遷移（GET・upgrade-insecure-requests 付き）のヘッダー"""
+    try:
+        with open(path, 'r') as f:
+            captured = json.load(f)
+    except (OSError, ValueError):
+        captured = []
+    for entry in captured:
+        headers = entry.get('headers') or {}
+        if entry.get('method') == 'GET' and 'upgrade-insecure-requests' in headers:
+            return {k: v for k, v in headers.items() if k.lower() not in SKIP_HEADERS and not k.startswith(':')}
+    return {'user-agent': CONTEXT_OPTIONS['user_agent']}
+
+
+def _validators(response):
+    """次回の条件付きリクエスト用（どちらも無ければ None）"""
+    etag = response.headers.get('ETag')
+    modified = response.headers.get('Last-Modified')
+    if not etag and not modified:
+        return None
+    return {'etag': etag, 'last_modified': modified}
+
+
+class SalonBoardHttp:
+    """ワーカースレッド間で共有するHTTPセッション（ログイン切れを検知したら以降はすべてブラウザに回す）"""
+
+    def __init__(self, cookie_file=COOKIE_FILE, headers_file=CAPTURED_HEADERS_FILE, pool_size=SCRAPE_HTTP_WORKERS):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.session.mount('https://', adapter)
+        self.session.headers.update(load_captured_headers(headers_file))
+        self.session.headers.setdefault('accept-language', 'ja-JP,ja;q=0.9')
+        self.cookies = self._load_cookies(cookie_file)
+        self.disabled = None
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'not_modified': 0, 'bytes': 0}
+
+    def _load_cookies(self, cookie_file):
+        try:
+            with open(cookie_file, 'r') as f:
+                cookies = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[HTTP] クッキー読み込み失敗: {e}", flush=True)
+            return 0
+        for c in cookies:
+            self.session.cookies.set(c['name'], c['value'], domain=c.get('domain'), path=c.get('path', '/'))
+        return len(cookies)
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def get(self, url, validators=None):
+        """ページを取得（304 は None を返す）"""
+        if self.disabled:
+            raise NeedsBrowser(self.disabled)
+        headers = {}
+        if validators:
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
+        self._count('requests')
+        res = self.session.get(url, headers=headers, timeout=HTTP_TIMEOUT)
+        if res.status_code == 304:
+            self._count('not_modified')
+            return None
+        if res.status_code in THROTTLE_STATUS:
+            raise NeedsBrowser('throttled')
+        if 'login' in res.url.lower():
+            # ログイン画面に転送された＝Cookieが切れている：残りの日付もブラウザでログインし直して取る
+            self.disabled = 'login'
+            raise NeedsBrowser('login')
+        if res.status_code != 200:
+            raise NeedsBrowser(f'HTTP {res.status_code}')
+        self._count('bytes', len(res.content))
+        return res
+
+    def fetch_day(self, date_str, saved=None):
+        """日付の一覧行・スケジュールデータ
+
+        {'list': 行 or None, 'schedule': データ or None, 'not_modified': bool, 'validators': {'list': ..., 'schedule': ...}}
+        saved（前回のフィンガープリント記録）の validators で条件付きリクエストにし、
+        一覧・スケジュールとも 304 なら not_modified=True（中身は取らない）。片方だけ 304 なら取り直す。
+        """
+        previous = (saved or {}).get('http') or {}
+        list_url = LIST_URL.format(date=date_str)
+        schedule_url = SCHEDULE_URL.format(date=date_str)
+        list_res = self.get(list_url, previous.get('list'))
+        schedule_res = self.get(schedule_url, previous.get('schedule'))
+        if list_res is None and schedule_res is None:
+            return {'list': None, 'schedule': None, 'not_modified': True, 'validators': previous}
+        if list_res is None:
+            list_res = self.get(list_url)
+        if schedule_res is None:
+            schedule_res = self.get(schedule_url)
+
+        # 文字コードはHTMLのmetaから判定させる（Content-Type に charset が無いと requests は latin-1 とみなす）
+        rows = extract_list_html(list_res.content)
+        if rows is None:
+            raise NeedsBrowser('no-table')
+        schedule = extract_schedule_html(schedule_res.content)
+        if schedule['staff'] and not schedule['rows']:
+            # スタッフはいるのにスケジュール行が無い＝JSで描画されるページ
+            raise NeedsBrowser('no-rows')
+        validators = {'list': _validators(list_res), 'schedule': _validators(schedule_res)}
+        return {'list': rows, 'schedule': schedule, 'not_modified': False,
+                'validators': {k: v for k, v in validators.items() if v}}
+
+    def report(self):
+        with self._lock:
+            return {**self.stats, 'disabled': self.disabled}
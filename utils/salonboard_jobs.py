@@ -0,0 +1,233 @@
+"""SalonBoardを操作するタスクの種類（キャンセル・日時変更・スクレイピング・空き枠再取得・電話番号補完・Cookie更新）
+
+@task_queue.task(...) の登録だけを行い、Flaskアプリ・Blueprint・LINE Webhookのキューは読み込まない。
+タスクワーカー（task_worker.py）はこのモジュールだけを import して取り出しを始める。
+Webからは enqueue_*() か task_queue.enqueue() で登録する。
+"""
+import os
+
+from utils.browser_pool import ensure_logged_in, login_to_salonboard, save_cookies
+from utils.line_sender import notify_shop_booking_change, send_line_message
+from utils.salonboard_tasks import (PRIORITY_BACKGROUND, PRIORITY_CUSTOMER, PRIORITY_SCRAPE, PRIORITY_SLOT_REFRESH,
+                                    SALONBOARD, browser_pool, task_queue)
+from utils.slot_refresh import SLOT_REFRESH_KIND, SLOT_REFRESH_TIMEOUT
+from utils.supabase_client import supabase
+from utils.task_queue import Preempted
+
+SCRAPE_TIMEOUT = 1800
+
+
+@task_queue.task('cancel_booking', priority=PRIORITY_CUSTOMER, resource=SALONBOARD,
+                 max_attempts=2, retry_delay=30, timeout=600)
+def run_cancel_task(payload, ctx):
+    """キャンセルを実行（失敗したら30秒後に1回だけ再試行）"""
+    from cancel_booking import cancel_booking
+    return bool(cancel_booking(payload['booking_id'], payload.get('line_user_id') or '', pool=browser_pool))
+
+
+@task_queue.task('change_booking', priority=PRIORITY_CUSTOMER, resource=SALONBOARD, timeout=600)
+def run_change_task(payload, ctx):
+    """予約日時変更を実行"""
+    return execute_change(payload['booking_id'], payload['new_date'], payload['new_time'], payload.get('line_user_id'))
+
+
+def execute_change(booking_id, new_date, new_time, line_user_id):
+    """予約変更を実行（常駐ブラウザプールのページを借りる）。成功したら True"""
+    
+    try:
+        res = supabase.get(f'8weeks_bookings?booking_id=eq.{booking_id}')
+        bookings = res.json()
+        if not bookings:
+            print(f'[予約変更エラー] 予約が見つかりません: {booking_id}')
+            return False
+        
+        booking = bookings[0]
+        old_datetime = booking.get('visit_datetime', '')
+        customer_name = booking.get('customer_name', '')
+        
+        def change_on_page(page):
+            # プールのコンテキストはログイン済み（セッション切れ時のみ再ログイン）
+            url = f'https://salonboard.com/KLP/reserve/ext/extReserveChange/?reserveId={booking_id}'
+            print(f'[予約変更] URL: {url}', flush=True)
+            if not ensure_logged_in(page, url):
+                print(f'[予約変更エラー] ログイン失敗', flush=True)
+                return False
+            print(f'[予約変更] ページ読み込み完了、URL: {page.url}', flush=True)
+            page.wait_for_timeout(5000)
+            print(f'[予約変更] 現在のページタイトル: {page.title()}', flush=True)
+            
+            print(f'[予約変更] 日付セレクタ検索中...', flush=True)
+            date_input = page.query_selector('input[name="rsvDate"]')
+            if not date_input:
+                print(f'[予約変更エラー] 日付入力欄が見つかりません', flush=True)
+                return False
+            current_date = date_input.get_attribute('value')
+            print(f'[予約変更] 現在の日付: {current_date}, 新しい日付: {new_date}', flush=True)
+            if current_date != new_date:
+                print(f'[予約変更] カレンダー要素検索中...', flush=True)
+                cal_input = page.query_selector('.calendar_readonly')
+                print(f'[予約変更] .calendar_readonly: {cal_input}', flush=True)
+                if not cal_input:
+                    cal_input = page.query_selector('input.calendar, input[readonly], .hasDatepicker')
+                    print(f'[予約変更] 代替セレクタ: {cal_input}', flush=True)
+                if cal_input:
+                    print(f'[予約変更] カレンダークリック', flush=True)
+                    cal_input.click()
+                    page.wait_for_timeout(2000)
+                    print(f'[予約変更] カレンダーポップアップ検索中...', flush=True)
+                    target_day = new_date[-2:]
+                    if target_day.startswith('0'):
+                        target_day = target_day[1:]
+                    print(f'[予約変更] 選択する日: {target_day}', flush=True)
+                    calendar = page.query_selector('.mod_popup_02.js_calendar')
+                    print(f'[予約変更] .mod_popup_02.js_calendar: {calendar}', flush=True)
+                    if not calendar:
+                        calendar = page.query_selector('.ui-datepicker, .calendar-popup, #ui-datepicker-div')
+                        print(f'[予約変更] 代替カレンダー: {calendar}', flush=True)
+                    if calendar:
+                        tds = calendar.query_selector_all('td')
+                        print(f'[予約変更] td数: {len(tds)}', flush=True)
+                        clicked = False
+                        for i, td in enumerate(tds):
+                            text = td.inner_text().strip()
+                            visible = td.is_visible()
+                            if text == target_day:
+                                print(f'[予約変更] td[{i}] text={text} visible={visible}', flush=True)
+                                if visible:
+                                    td.click()
+                                    print(f'[予約変更] td[{i}]クリック実行', flush=True)
+                                    clicked = True
+                                    page.wait_for_timeout(1000)
+                                    break
+                        if not clicked:
+                            print(f'[予約変更] 日付{target_day}がクリックできなかった', flush=True)
+            
+            print(f'[予約変更] 日付クリック後、時間設定開始', flush=True)
+            hour, minute = new_time.split(':')
+            print(f'[予約変更] hour={hour}, minute={minute}', flush=True)
+            
+            # rsvHour存在確認
+            rsv_hour = page.query_selector('#rsvHour')
+            print(f'[予約変更] #rsvHour: {rsv_hour}', flush=True)
+            if rsv_hour:
+                page.select_option('#rsvHour', hour)
+                print(f'[予約変更] rsvHour設定完了', flush=True)
+            
+            rsv_minute = page.query_selector('#rsvMinute')
+            print(f'[予約変更] #rsvMinute: {rsv_minute}', flush=True)
+            if rsv_minute:
+                page.select_option('#rsvMinute', minute)
+                print(f'[予約変更] rsvMinute設定完了', flush=True)
+            page.wait_for_timeout(500)
+            
+            confirm_btn = page.query_selector('button:has-text("確定する"), a:has-text("確定する")')
+            if confirm_btn:
+                confirm_btn.click()
+                page.wait_for_timeout(3000)
+            
+            return True
+        
+        if not browser_pool.run(change_on_page, label=f'change:{booking_id}'):
+            return False
+        
+        new_datetime = f'{new_date[:4]}/{new_date[4:6]}/{new_date[6:]} {new_time}'
+        notify_shop_booking_change(customer_name, old_datetime, new_datetime)
+        
+        # 顧客にLINE通知
+        if line_user_id:
+            send_line_message(line_user_id, f'予約変更が完了しました。\n新しい日時: {new_datetime}')
+        
+        print(f'[予約変更完了] {customer_name} -> {new_datetime}')
+        return True
+        
+    except Exception as e:
+        print(f'[予約変更エラー] {e}')
+        import traceback
+        traceback.print_exc()
+        if line_user_id:
+            send_line_message(line_user_id, '予約変更中にエラーが発生しました。サロンにお問い合わせください。')
+        return False
+
+
+def enqueue_scrape(days_limit=56, full=False):
+    """8週間スクレイピングをタスクキューに登録（同じ条件のものが待機中・実行中なら登録しない）"""
+    days_limit = int(days_limit)
+    return task_queue.enqueue('scrape_range', {'days_limit': days_limit, 'full': bool(full)},
+                              dedupe_key=f'scrape_range:{days_limit}:{int(bool(full))}')
+
+
+@task_queue.task('scrape_range', priority=PRIORITY_SCRAPE, resource=SALONBOARD, timeout=SCRAPE_TIMEOUT + 300,
+                 preemptible=True, invalidates=('available_slots',))
+def run_scrape_range(payload, ctx):
+    """scrape_8weeks_v4.main を別プロセスで実行（キャンセル等が待っていたらプロセスを止めて譲る）"""
+    import signal
+    import subprocess
+    import time
+    
+    days_limit = int(payload.get('days_limit', 56))
+    # full=True なら差分検出を使わず全日付を解析し直す
+    incremental = 'False' if payload.get('full') else 'None'
+    proc = subprocess.Popen(
+        ['python3', '-c', f'from scrape_8weeks_v4 import main; main(days_limit={days_limit}, incremental={incremental})'],
+        start_new_session=True)
+    started = time.monotonic()
+    try:
+        while proc.poll() is None:
+            if ctx.should_yield():
+                raise Preempted('優先度の高いタスクが待機中')
+            if time.monotonic() - started > SCRAPE_TIMEOUT:
+                raise TimeoutError(f'{SCRAPE_TIMEOUT}秒を超過')
+            time.sleep(2)
+    finally:
+        # ブラウザごと止める（プロセスグループ単位）
+        if proc.poll() is None:
+            os.killpg(proc.pid, signal.SIGTERM)
+            try:
+                proc.wait(20)
+            except subprocess.TimeoutExpired:
+                os.killpg(proc.pid, signal.SIGKILL)
+                proc.wait()
+    if proc.returncode != 0:
+        raise RuntimeError(f'スクレイピング終了コード {proc.returncode}')
+    return {'days_limit': days_limit, 'full': bool(payload.get('full'))}
+
+
+@task_queue.task(SLOT_REFRESH_KIND, priority=PRIORITY_SLOT_REFRESH, resource=SALONBOARD,
+                 timeout=SLOT_REFRESH_TIMEOUT, invalidates=('available_slots',))
+def run_slot_refresh_task(payload, ctx):
+    """空き枠の単日再取得（登録は slot_refresh_queue.enqueue()）"""
+    from scrape_8weeks_v4 import refresh_day
+    return refresh_day(payload['date'], pool=browser_pool) > 0
+
+
+def fill_phone_from_salonboard():
+    """電話番号が空のBE予約をSalonBoardから補完（常駐ブラウザプールで実行）"""
+    from scrape_phone_fill import main as phone_fill_main
+    phone_fill_main(pool=browser_pool)
+    print("[PHONE-FILL] スクリプト完了", flush=True)
+
+
+@task_queue.task('phone_fill', priority=PRIORITY_BACKGROUND, resource=SALONBOARD, timeout=1800)
+def run_phone_fill_task(payload, ctx):
+    fill_phone_from_salonboard()
+
+
+def enqueue_phone_fill():
+    return task_queue.enqueue('phone_fill', dedupe_key='phone_fill')
+
+
+@task_queue.task('cookie_refresh', priority=PRIORITY_BACKGROUND, resource=SALONBOARD, timeout=300)
+def run_cookie_refresh_task(payload, ctx):
+    """SalonBoardに再ログインしてCookieを更新"""
+    def relogin(page):
+        if not login_to_salonboard(page):
+            raise Exception('ログイン失敗')
+        return save_cookies(page.context)
+
+    count = browser_pool.run(relogin, timeout=180, label='refresh-cookie')
+    print(f"[Cookie更新] 完了: {count}個のCookieを保存", flush=True)
+    return {'cookies_count': count}
+
+
+def enqueue_cookie_refresh():
+    return task_queue.enqueue('cookie_refresh', dedupe_key='cookie_refresh')
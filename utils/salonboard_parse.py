@@ -0,0 +1,249 @@
+"""SalonBoard の予約一覧・スケジュール・予約詳細画面の抽出と解析
+
+ページからの取り出しは page.evaluate 1回（LIST_EXTRACT_JS / SCHEDULE_EXTRACT_JS / DETAIL_EXTRACT_JS）で
+素のデータ（文字列・真偽値のリスト）だけを受け取り、解析はすべてPython側で行う。
+保存済みHTML・HTTPで取得したHTMLからは extract_*_html() で同じ形のデータを作れる（ベンチマーク・HTTP取得用）。
+"""
+import json
+import re
+
+from utils.slot_engine import free_intervals, slot_dicts, staff_hours, to_minutes
+
+# 予約一覧テーブル（th#comingDate を含むtable）の各行：テーブルが無ければ null
+LIST_EXTRACT_JS = """() => {
+    const t = [...document.querySelectorAll('table')].find(t => t.querySelector('th#comingDate'));
+    if (!t) return null;
+    const rows = [];
+    for (const tr of t.querySelectorAll('tbody tr')) {
+        const c = tr.querySelectorAll('td');
+        if (c.length < 4) continue;
+        const a = c[2].querySelector("a[href*='reserveId=']");
+        const n = c[2].querySelector('p.wordBreak');
+        rows.push({
+            time: c[0].textContent,
+            status: c[1].textContent,
+            href: a ? a.getAttribute('href') : null,
+            name: n ? n.textContent : '',
+            staff: c[3].textContent,
+        });
+    }
+    return rows;
+}"""
+
+# スタッフ一覧とスタッフ行（先頭時刻・予約/ToDoの時間帯・休日・ToDoのstyle）
+SCHEDULE_EXTRACT_JS = """() => {
+    const staff = [...document.querySelectorAll('#stockNameList option')].map(o => ({
+        value: o.getAttribute('value') || '',
+        name: o.innerText,
+    }));
+    const rows = [...document.querySelectorAll('.jscScheduleMainTableStaff .scheduleMainTableLine')].map(r => {
+        const first = r.querySelector('.scheduleTime');
+        return {
+            first_time: first ? first.innerText : null,
+            reservations: [...r.querySelectorAll('.scheduleReservation, .scheduleToDo')].map(e => {
+                const z = e.querySelector('.scheduleTimeZoneSetting');
+                return z ? z.innerText : null;
+            }),
+            day_off: r.querySelector('.isDayOff') !== null,
+            todo_styles: [...r.querySelectorAll('.scheduleToDo')].map(e => e.getAttribute('style') || ''),
+        };
+    });
+    return {staff: staff, rows: rows};
+}"""
+
+
+# 予約詳細：「電話番号」を含む一番内側の行（tr / .row / div）のテキストと本文全体のテキスト
+DETAIL_EXTRACT_JS = """() => {
+    const sel = 'tr, .row, div';
+    const phoneRows = [...document.querySelectorAll(sel)]
+        .filter(e => e.innerText.includes('電話番号'))
+        .filter(e => ![...e.querySelectorAll(sel)].some(c => c.innerText.includes('電話番号')))
+        .map(e => e.innerText);
+    return {phone_rows: phoneRows, body: document.body ? document.body.innerText : ''};
+}"""
+
+# 詳細ページ本文から拾うメニューの見出し
+DETAIL_MENU_PATTERNS = (
+    r'【まつげエクステ】[^【\n]+',
+    r'【その他まつげメニュー】[^【\n]+',
+    r'【付替オフ】[^【\n]+',
+    r'【次回】[^【\n]+',
+)
+PHONE_RE = re.compile(r'0[0-9]{9,10}')
+
+
+_parser = None
+
+
+def _soup(html):
+    """lxml が入っていれば lxml（速い）、無ければ標準の html.parser で解析"""
+    global _parser
+    from bs4 import BeautifulSoup, FeatureNotFound
+    if _parser is None:
+        try:
+            BeautifulSoup('', 'lxml')
+            _parser = 'lxml'
+        except FeatureNotFound:
+            _parser = 'html.parser'
+    return BeautifulSoup(html, _parser)
+
+
+def extract_list_html(html):
+    """保存済みHTMLから LIST_EXTRACT_JS と同じ形の行リストを作る"""
+    soup = _soup(html)
+    table = next((t for t in soup.find_all('table') if t.select_one('th#comingDate')), None)
+    if table is None:
+        return None
+    rows = []
+    for tr in table.select('tbody tr'):
+        cells = tr.find_all('td')
+        if len(cells) < 4:
+            continue
+        link = cells[2].select_one("a[href*='reserveId=']")
+        name = cells[2].select_one('p.wordBreak')
+        rows.append({
+            'time': cells[0].get_text(),
+            'status': cells[1].get_text(),
+            'href': link.get('href') if link else None,
+            'name': name.get_text() if name else '',
+            'staff': cells[3].get_text(),
+        })
+    return rows
+
+
+def extract_schedule_html(html):
+    """保存済みHTMLから SCHEDULE_EXTRACT_JS と同じ形のデータを作る"""
+    soup = _soup(html)
+    staff = [{'value': o.get('value') or '', 'name': o.get_text()} for o in soup.select('#stockNameList option')]
+    rows = []
+    for r in soup.select('.jscScheduleMainTableStaff .scheduleMainTableLine'):
+        first = r.select_one('.scheduleTime')
+        reservations = []
+        for e in r.select('.scheduleReservation, .scheduleToDo'):
+            z = e.select_one('.scheduleTimeZoneSetting')
+            reservations.append(z.get_text() if z else None)
+        rows.append({
+            'first_time': first.get_text() if first else None,
+            'reservations': reservations,
+            'day_off': r.select_one('.isDayOff') is not None,
+            'todo_styles': [e.get('style') or '' for e in r.select('.scheduleToDo')],
+        })
+    return {'staff': staff, 'rows': rows}
+
+
+def extract_detail_html(html):
+    """保存済みHTMLから DETAIL_EXTRACT_JS と同じ形のデータを作る"""
+    soup = _soup(html)
+    sel = 'tr, .row, div'
+    phone_rows = [e.get_text('\n') for e in soup.select(sel)
+                  if '電話番号' in e.get_text() and not any('電話番号' in c.get_text() for c in e.select(sel))]
+    return {'phone_rows': phone_rows, 'body': soup.body.get_text('\n') if soup.body else soup.get_text('\n')}
+
+
+def parse_reserve_rows(rows, target_date):
+    """一覧の行から受付待ちの予約だけを取り出す（booking_id・顧客名・日時・スタッフ・指名）"""
+    bookings = []
+    for row in rows or []:
+        if '受付待ち' not in (row.get('status') or ''):
+            continue
+        id_match = re.search(r'reserveId=([A-Z]{2}\d+)', row.get('href') or '')
+        if not id_match:
+            continue
+
+        customer_name = re.sub(r'[★☆♪♡⭐️🦁]', '', (row.get('name') or '').strip()).strip()
+
+        time_match = re.search(r'(\d{1,2}:\d{2})', (row.get('time') or '').strip())
+        time_only = time_match.group(1) if time_match else "00:00"
+
+        staff_text = (row.get('staff') or '').strip()
+        bookings.append({
+            'booking_id': id_match.group(1),
+            'customer_name': customer_name,
+            'visit_datetime': f"{target_date.strftime('%Y-%m-%d')} {time_only}:00",
+            'staff': re.sub(r'^[\(（]指[\)）]', '', staff_text).strip(),
+            'is_designated': staff_text.startswith('(指)') or staff_text.startswith('（指）'),
+        })
+    return bookings
+
+
+def _is_day_off(row):
+    """.isDayOff、または終日をカバーするToDo（styleなし／width>=1000）があれば休日"""
+    if row.get('day_off'):
+        return True
+    for style in row.get('todo_styles') or []:
+        if not style or 'left' not in style or 'width' not in style:
+            return True
+        width_match = re.search(r'width:\s*(\d+)', style)
+        if width_match and int(width_match.group(1)) >= 1000:
+            return True
+    return False
+
+
+def _booked_ranges(row):
+    """予約・ToDoの ["H:MM", "H:MM"] を (開始分, 終了分) に"""
+    booked = []
+    for text in row.get('reservations') or []:
+        if not text:
+            continue
+        try:
+            times = json.loads(text)
+        except ValueError:
+            continue
+        if isinstance(times, list) and len(times) >= 2:
+            start, end = to_minutes(times[0]), to_minutes(times[1])
+            if start is not None and end is not None:
+                booked.append((start, end))
+    return booked
+
+
+def parse_schedule(data, date_str):
+    """スケジュールの抽出データから available_slots の行リストを作る"""
+    if not data:
+        return []
+    staff_list = [
+        {'id': s['value'].split('_')[1], 'name': s['name']}
+        for s in data.get('staff') or [] if s.get('value', '').startswith('STAFF_')
+    ]
+    slots = []
+    for staff_info, row in zip(staff_list, data.get('rows') or []):
+        # 開始はスケジュールの先頭時刻（時単位）、閉店は SLOT_CLOSE_TIME（スタッフ別設定があれば優先）
+        first = to_minutes(row.get('first_time'))
+        open_min, close_min = staff_hours(staff_info['id'], first // 60 * 60 if first is not None else None)
+
+        is_day_off = _is_day_off(row)
+        slots.append({
+            'date': date_str,
+            'staff_id': staff_info['id'],
+            'staff_name': staff_info['name'],
+            'is_day_off': is_day_off,
+            'slots': [] if is_day_off else slot_dicts(free_intervals(_booked_ranges(row), open_min, close_min)),
+        })
+    return slots
+
+
+def parse_detail(data):
+    """予約詳細の抽出データ → {'phone', 'menu', 'booking_source'}"""
+    result = {'phone': '', 'menu': '', 'booking_source': None}
+    if not data:
+        return result
+    for text in data.get('phone_rows') or []:
+        match = PHONE_RE.search(text.replace('-', ''))
+        if match:
+            result['phone'] = match.group()
+            break
+
+    body = data.get('body') or ''
+    menu_parts = []
+    for pattern in DETAIL_MENU_PATTERNS:
+        for match in re.findall(pattern, body):
+            clean = match.strip()
+            if clean and len(clean) > 5 and clean not in menu_parts:
+                menu_parts.append(clean)
+    if menu_parts:
+        result['menu'] = ' / '.join(menu_parts[:3])[:300]
+
+    if '次回予約' in body:
+        result['booking_source'] = '次回'
+    elif 'NHPB' in body or 'ホットペッパー' in body:
+        result['booking_source'] = 'NHPB'
+    return result
@@ -0,0 +1,81 @@
+"""SalonBoardを操作する処理の共有状態
+
+常駐ブラウザプール・空き枠の単日再取得の登録窓口・裏処理の永続キュー
+（キャンセル／日時変更／スクレイピング／空き枠再取得／電話番号補完／Cookie更新）。
+タスクの種類は utils/salonboard_jobs.py で @task_queue.task(...) で定義し、Webからは task_queue.enqueue() で登録する。
+SalonBoardのセッションを使う処理はすべて resource=SALONBOARD のタスクにして同時に1件だけ実行する。
+"""
+import hmac
+import os
+
+import requests
+
+from utils.browser_pool import BrowserPool, TOP_URL as SALONBOARD_TOP_URL
+from utils.slot_refresh import SlotRefreshQueue
+from utils.slot_store import slot_store
+from utils.table_cache import table_cache
+from utils.task_queue import TaskQueue, TaskWorker
+
+# inline: gunicorn のワーカー内スレッドで実行 / external: 別プロセス（python3 task_worker.py）で実行
+TASK_WORKER = os.getenv('TASK_WORKER', 'inline')
+# external のワーカーが成功後にキャッシュ破棄を伝えるWebプロセスのURL
+TASK_WEB_URL = os.getenv('TASK_WEB_URL', f"http://127.0.0.1:{os.getenv('PORT', '10000')}")
+# キャッシュ破棄の依頼に付ける共有シークレット（X-Task-Secret ヘッダー。未設定なら依頼は受け付けない）
+TASK_WEB_SECRET = os.getenv('TASK_WEB_SECRET')
+
+SALONBOARD = 'salonboard'
+# 優先度（小さいほど先）：お客様の操作 → スクレイピング → 夜間の補完
+PRIORITY_CUSTOMER = 10
+PRIORITY_SCRAPE = 50
+# 空き枠の単日再取得はスクレイピングに譲る（スクレイピングでも空き枠は取り直される）
+PRIORITY_SLOT_REFRESH = 55
+PRIORITY_BACKGROUND = 60
+
+task_queue = TaskQueue()
+
+
+# SalonBoard操作用の常駐ブラウザプール（初回利用時に起動し、ログイン済みのまま保持）
+browser_pool = BrowserPool(warm_url=SALONBOARD_TOP_URL, name='app')
+
+
+# 空き枠の単日再取得（kind='slot_refresh' のタスクとして登録し、タスクワーカーが実行）
+slot_refresh_queue = SlotRefreshQueue(task_queue)
+
+
+def invalidate_caches(tables):
+    """このプロセスのキャッシュを破棄（available_slots は日付別ブロブを作り直す）"""
+    for table in tables:
+        if table == 'available_slots':
+            slot_store.refresh()
+        else:
+            table_cache.invalidate(table)
+
+
+def task_secret_valid(value):
+    """X-Task-Secret ヘッダーの検証（TASK_WEB_SECRET 未設定なら常に False）"""
+    return bool(TASK_WEB_SECRET) and hmac.compare_digest(value or '', TASK_WEB_SECRET)
+
+
+def notify_web_invalidate(tables):
+    """別プロセスのワーカーから、Webプロセスのキャッシュ破棄を依頼する"""
+    for table in tables:
+        requests.post(f'{TASK_WEB_URL}/api/cron/invalidate-cache', params={'table': table},
+                      headers={'X-Task-Secret': TASK_WEB_SECRET or ''}, timeout=10)
+
+
+_worker = None
+
+
+def start_task_worker(external=False):
+    """タスクワーカーを起動（external=False はこのプロセスのスレッドで実行）。起動済みなら何もしない"""
+    global _worker
+    import utils.salonboard_jobs  # noqa: F401  （タスクの種類の登録）
+    if _worker is None:
+        _worker = TaskWorker(task_queue, on_invalidate=notify_web_invalidate if external else invalidate_caches)
+        _worker.start()
+    return _worker
+
+
+def stop_task_worker():
+    if _worker is not None:
+        _worker.stop()
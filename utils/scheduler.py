@@ -0,0 +1,373 @@
+"""単一リーダーの定期ジョブ実行（APScheduler）
+
+gunicorn のワーカーが何本あっても、定期ジョブを実行するのはリーダーに選ばれた1プロセスだけ。
+- リーダー選出：SCHEDULER_LOCK=file（既定）は同一ホスト内のファイルロック（flock）。
+  supabase はホストをまたいだリース（scheduler_leases の行を期限付きで取り合う）。
+  リーダーのプロセスが落ちると、待機中のプロセスが SCHEDULER_LEADER_CHECK 秒以内に引き継ぐ
+- 実行履歴：SQLite（data/scheduler.db）に1実行1行。リーダーになった時、前回の実行以降に逃した
+  cronジョブは猶予時間（misfire_grace）内なら1回だけ実行する（複数回分逃していてもまとめて1回）
+- ジョブごとのタイムアウト：超えたら timeout として記録し、その実行が終わるまで次回はスキップする
+
+supabase リース用のテーブル:
+    CREATE TABLE scheduler_leases (name text PRIMARY KEY, holder text NOT NULL, expires_at timestamptz NOT NULL);
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
+
+from utils.supabase_client import supabase
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEDULER_LOCK = os.getenv('SCHEDULER_LOCK', 'file')
+SCHEDULER_LOCK_FILE = os.getenv('SCHEDULER_LOCK_FILE', os.path.join(APP_DIR, 'data', 'scheduler.lock'))
+SCHEDULER_DB = os.getenv('SCHEDULER_DB', os.path.join(APP_DIR, 'data', 'scheduler.db'))
+# リーダー確認（リース更新）の間隔とリースの有効期間（秒）
+SCHEDULER_LEADER_CHECK = int(os.getenv('SCHEDULER_LEADER_CHECK', '15'))
+SCHEDULER_LEASE_TTL = int(os.getenv('SCHEDULER_LEASE_TTL', '60'))
+# ジョブごとに残す実行履歴の件数
+SCHEDULER_HISTORY_KEEP = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    holder TEXT,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    status TEXT NOT NULL,
+    error TEXT,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_job_runs_job ON job_runs (job_id, started_at);
+"""
+
+
+def make_holder():
+    """このプロセスの識別子（ホスト名:PID:乱数）"""
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+
+
+class FileLeaderLock:
+    """同一ホスト内のリーダー選出（flock。プロセスが終了すればOSが解放する）"""
+
+    def __init__(self, path=SCHEDULER_LOCK_FILE, holder=None):
+        self.path = path
+        self.holder = holder or make_holder()
+        self._fd = None
+
+    def acquire(self):
+        """リーダーなら True（取得済みなら保持を続ける）"""
+        import fcntl
+        if self._fd is not None:
+            return True
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, self.holder.encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        import fcntl
+        if self._fd is None:
+            return
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+    def current_holder(self):
+        try:
+            with open(self.path, 'r') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def describe(self):
+        return {'kind': 'file', 'path': self.path, 'holder': self.current_holder()}
+
+
+class SupabaseLeaderLock:
+    """ホストをまたいだリーダー選出（scheduler_leases の行を期限付きで保持し、期限前に延長する）"""
+
+    def __init__(self, name='scheduler', ttl=SCHEDULER_LEASE_TTL, holder=None):
+        self.name = name
+        self.ttl = ttl
+        self.holder = holder or make_holder()
+
+    @staticmethod
+    def _ts(dt):
+        return quote(dt.isoformat(), safe='')
+
+    def acquire(self):
+        """自分の行の延長か期限切れの行の奪取に成功したら True（通信エラーはリーダーでない扱い）"""
+        now = datetime.now(timezone.utc)
+        lease = {'holder': self.holder, 'expires_at': (now + timedelta(seconds=self.ttl)).isoformat()}
+        try:
+            res = supabase.update(
+                'scheduler_leases',
+                f'name=eq.{quote(self.name)}&or=(holder.eq.{quote(self.holder)},expires_at.lt.{self._ts(now)})',
+                lease, prefer='return=representation')
+            if res.status_code == 200 and res.json():
+                return True
+            res = supabase.insert('scheduler_leases', {'name': self.name, **lease})
+            return res.status_code == 201
+        except Exception as e:
+            print(f"[SCHEDULER] リース取得エラー: {e}", flush=True)
+            return False
+
+    def release(self):
+        try:
+            supabase.remove('scheduler_leases', f'name=eq.{quote(self.name)}&holder=eq.{quote(self.holder)}')
+        except Exception as e:
+            print(f"[SCHEDULER] リース解放エラー: {e}", flush=True)
+
+    def describe(self):
+        try:
+            rows = supabase.select('scheduler_leases', f'select=holder,expires_at&name=eq.{quote(self.name)}')
+        except Exception:
+            rows = []
+        return {'kind': 'supabase', 'name': self.name, 'ttl': self.ttl,
+                'holder': rows[0]['holder'] if rows else None,
+                'expires_at': rows[0]['expires_at'] if rows else None}
+
+
+def make_lock(kind=SCHEDULER_LOCK):
+    if kind == 'supabase':
+        return SupabaseLeaderLock()
+    return FileLeaderLock()
+
+
+class JobRunStore:
+    """ジョブの実行履歴（SQLite。接続はスレッドごと）"""
+
+    def __init__(self, path=SCHEDULER_DB):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def start(self, job_id, reason, holder, status='running', error=None):
+        with self._conn() as conn:
+            cur = conn.execute(
+                'INSERT INTO job_runs (job_id, reason, holder, started_at, status, error, finished_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, reason, holder, time.time(), status, error, time.time() if status != 'running' else None))
+            return cur.lastrowid
+
+    def finish(self, run_id, status, error=None, result=None):
+        if result is not None:
+            result = json.dumps(result, ensure_ascii=False, default=str)[:1000]
+        with self._conn() as conn:
+            conn.execute('UPDATE job_runs SET status = ?, error = ?, result = ?, finished_at = ? WHERE id = ?',
+                         (status, error, result, time.time(), run_id))
+
+    def interrupt_running(self, holder):
+        """前のリーダーが実行中のまま落ちた行を interrupted にする"""
+        with self._conn() as conn:
+            return conn.execute(
+                "UPDATE job_runs SET status = 'interrupted', finished_at = ? WHERE status = 'running' AND holder != ?",
+                (time.time(), holder)).rowcount
+
+    def last_started(self, job_id):
+        """最後に実行を開始した時刻（スキップは除く）"""
+        row = self._conn().execute(
+            "SELECT MAX(started_at) FROM job_runs WHERE job_id = ? AND status != 'skipped'", (job_id,)).fetchone()
+        return row[0]
+
+    def last_run(self, job_id):
+        row = self._conn().execute(
+            'SELECT * FROM job_runs WHERE job_id = ? ORDER BY id DESC LIMIT 1', (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def recent(self, job_id=None, limit=50):
+        sql, params = 'SELECT * FROM job_runs', []
+        if job_id:
+            sql += ' WHERE job_id = ?'
+            params.append(job_id)
+        sql += ' ORDER BY id DESC LIMIT ?'
+        params.append(limit)
+        return [dict(r) for r in self._conn().execute(sql, params)]
+
+    def prune(self, job_id, keep=SCHEDULER_HISTORY_KEEP):
+        with self._conn() as conn:
+            conn.execute(
+                'DELETE FROM job_runs WHERE job_id = ? AND id NOT IN '
+                '(SELECT id FROM job_runs WHERE job_id = ? ORDER BY id DESC LIMIT ?)', (job_id, job_id, keep))
+
+
+class LeaderScheduler:
+    """リーダーの間だけ APScheduler を動かす（ジョブは関数を直接呼ぶ）"""
+
+    def __init__(self, lock=None, store=None, timezone_name='Asia/Tokyo', check_interval=SCHEDULER_LEADER_CHECK):
+        self.lock = lock or make_lock()
+        self.store = store or JobRunStore()
+        self.timezone_name = timezone_name
+        self.check_interval = check_interval
+        self.jobs = OrderedDict()
+        self._scheduler = None
+        self._running = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.leader_since = None
+
+    def add_job(self, job_id, name, func, trigger, timeout=600, misfire_grace=600, enabled=True):
+        """trigger は APScheduler のトリガー。timeout 秒を超えた実行は timeout として記録する
+
+        enabled=False のジョブは一覧（status）には出すが、定期実行・取りこぼし実行はしない。
+        """
+        self.jobs[job_id] = {'id': job_id, 'name': name, 'func': func, 'trigger': trigger,
+                             'timeout': timeout, 'misfire_grace': misfire_grace, 'enabled': enabled}
+
+    # ===== リーダー選出 =====
+    def start(self):
+        """選出ループを起動（リーダーになったプロセスだけがジョブを実行する）"""
+        with self._lock:
+            if self._thread:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._elect_loop, name='scheduler-elect', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._step_down()
+
+    @property
+    def is_leader(self):
+        return self._scheduler is not None
+
+    def _elect_loop(self):
+        while not self._stop.is_set():
+            leader = self.lock.acquire()
+            if leader and not self.is_leader:
+                self._become_leader()
+            elif not leader and self.is_leader:
+                print("[SCHEDULER] リーダー権を失ったため停止", flush=True)
+                self._step_down()
+            self._stop.wait(self.check_interval)
+
+    def _become_leader(self):
+        from apscheduler.schedulers.background import BackgroundScheduler
+
+        scheduler = BackgroundScheduler(timezone=self.timezone_name)
+        for job in self.jobs.values():
+            if not job['enabled']:
+                continue
+            scheduler.add_job(self.run_job, trigger=job['trigger'], args=(job['id'],), id=job['id'], name=job['name'],
+                              misfire_grace_time=job['misfire_grace'], coalesce=True, max_instances=1,
+                              replace_existing=True)
+        scheduler.start()
+        self._scheduler = scheduler
+        self.leader_since = time.time()
+        interrupted = self.store.interrupt_running(self.lock.holder)
+        print(f"[SCHEDULER] リーダーとして開始: {self.lock.holder}（ジョブ{len(self.jobs)}件、"
+              f"中断扱い{interrupted}件）", flush=True)
+        self._catch_up()
+
+    def _step_down(self):
+        scheduler, self._scheduler = self._scheduler, None
+        self.leader_since = None
+        if scheduler is not None:
+            scheduler.shutdown(wait=False)
+        self.lock.release()
+
+    def _catch_up(self):
+        """前回の実行以降に逃した cron 実行が猶予時間内なら1回だけ実行（履歴のないジョブはしない）"""
+        from apscheduler.triggers.cron import CronTrigger
+
+        now = datetime.now(timezone.utc)
+        for job in self.jobs.values():
+            if not job['enabled'] or not isinstance(job['trigger'], CronTrigger):
+                continue
+            last = self.store.last_started(job['id'])
+            if last is None:
+                continue
+            since = max(datetime.fromtimestamp(last, timezone.utc) + timedelta(seconds=1),
+                        now - timedelta(seconds=job['misfire_grace']))
+            missed = job['trigger'].get_next_fire_time(None, since)
+            if missed and missed <= now:
+                print(f"[SCHEDULER] 取りこぼし実行: {job['id']}（予定 {missed.isoformat()}）", flush=True)
+                threading.Thread(target=self.run_job, args=(job['id'], 'catch-up'),
+                                 name=f"catch-up-{job['id']}", daemon=True).start()
+
+    # ===== 実行 =====
+    def run_job(self, job_id, reason='schedule'):
+        """ジョブを1回実行して履歴に残す（前回の実行が続いていればスキップ）"""
+        job = self.jobs[job_id]
+        with self._lock:
+            previous = self._running.get(job_id)
+            if previous is not None and previous.is_alive():
+                self.store.start(job_id, reason, self.lock.holder, status='skipped', error='前回の実行が継続中')
+                print(f"[SCHEDULER] {job_id} スキップ（前回の実行が継続中）", flush=True)
+                return
+            outcome = {}
+
+            def target():
+                try:
+                    outcome['result'] = job['func']()
+                except Exception as e:
+                    outcome['error'] = f'{type(e).__name__}: {e}'
+
+            worker = threading.Thread(target=target, name=f'job-{job_id}', daemon=True)
+            self._running[job_id] = worker
+        run_id = self.store.start(job_id, reason, self.lock.holder)
+        started = time.monotonic()
+        worker.start()
+        worker.join(job['timeout'])
+        if worker.is_alive():
+            status, error = 'timeout', f"{job['timeout']}秒を超過（処理は継続中）"
+        elif 'error' in outcome:
+            status, error = 'failed', outcome['error']
+        else:
+            status, error = 'success', None
+        self.store.finish(run_id, status, error, outcome.get('result'))
+        self.store.prune(job_id)
+        print(f"[SCHEDULER] {job_id} {status}（{time.monotonic() - started:.1f}秒）"
+              f"{' ' + error if error else ''}", flush=True)
+
+    def status(self):
+        scheduler = self._scheduler
+        jobs = []
+        for job in self.jobs.values():
+            scheduled = scheduler.get_job(job['id']) if scheduler else None
+            jobs.append({
+                'id': job['id'],
+                'name': job['name'],
+                'trigger': str(job['trigger']),
+                'enabled': job['enabled'],
+                'timeout': job['timeout'],
+                'misfire_grace': job['misfire_grace'],
+                'next_run_time': scheduled.next_run_time.isoformat() if scheduled and scheduled.next_run_time else None,
+                'last_run': self.store.last_run(job['id']),
+            })
+        return {
+            'leader': self.is_leader,
+            'holder': self.lock.holder,
+            'leader_since': self.leader_since,
+            'lock': self.lock.describe(),
+            'jobs': jobs,
+        }
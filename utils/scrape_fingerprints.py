@@ -0,0 +1,135 @@
+"""8週間スクレイピングの差分検出用フィンガープリント
+
+日付ごとに「予約一覧テーブルの行」と「スケジュールのスタッフ行」の抽出データのハッシュを保存し、
+前回と同じ日付は解析・詳細取得・DB書き込みを省く。
+近い日付ほど頻繁に、先の日付ほど間隔を空けて再訪する（SCRAPE_TIERS）。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FINGERPRINT_FILE = os.getenv('SCRAPE_FINGERPRINT_FILE', os.path.join(APP_DIR, 'data', 'scrape_fingerprints.json'))
+# 直近ランの集計（変化した日付・書き込み件数・所要時間）
+LAST_REPORT_FILE = os.path.join(APP_DIR, 'data', 'last_scrape_report.json')
+
+# "日数上限:再訪間隔秒" をカンマ区切り（例: 7日以内は毎回、21日以内は3時間、それ以降は12時間ごと）
+SCRAPE_TIERS = os.getenv('SCRAPE_TIERS', '7:0,21:10800,56:43200')
+
+
+def fingerprint(data):
+    """page.evaluate で取り出した一覧行・スケジュールデータ（JSON化できる値）のハッシュ"""
+    if data is None:
+        return None
+    text = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def parse_tiers(spec=SCRAPE_TIERS):
+    """[(日数上限, 再訪間隔秒), ...]（日数上限の昇順）"""
+    tiers = []
+    for part in spec.split(','):
+        if ':' in part:
+            days, interval = part.split(':', 1)
+            tiers.append((int(days), int(interval)))
+    return sorted(tiers)
+
+
+class FingerprintStore:
+    """日付別フィンガープリント（ワーカースレッド間で共有、commit()でファイルに保存）"""
+
+    def __init__(self, path=FINGERPRINT_FILE, tiers=None):
+        self.path = path
+        self.tiers = tiers if tiers is not None else parse_tiers()
+        self._lock = threading.Lock()
+        self._saved = {}
+        self._pending = {}
+        self.changed_dates = set()
+        self.unchanged_dates = set()
+        self.not_due_dates = set()
+        self.retry_dates = set()
+
+    @classmethod
+    def load(cls, path=FINGERPRINT_FILE, tiers=None):
+        store = cls(path, tiers)
+        try:
+            with open(path, 'r') as f:
+                store._saved = json.load(f)
+        except (OSError, ValueError):
+            store._saved = {}
+        return store
+
+    def interval_for(self, day_offset):
+        for max_days, interval in self.tiers:
+            if day_offset < max_days:
+                return interval
+        return 0
+
+    def due(self, date_str, day_offset, now=None):
+        """再訪間隔を過ぎていれば True（未記録の日付は常に True）"""
+        saved = self._saved.get(date_str)
+        if not saved:
+            return True
+        now = now or time.time()
+        if now - saved.get('checked_at', 0) >= self.interval_for(day_offset):
+            return True
+        with self._lock:
+            self.not_due_dates.add(date_str)
+        return False
+
+    def saved(self, date_str):
+        """前回保存した記録（無ければ None）"""
+        return self._saved.get(date_str)
+
+    def is_changed(self, date_str, kind, fp):
+        saved = self._saved.get(date_str) or {}
+        return fp is None or saved.get(kind) != fp
+
+    def mark(self, date_str, list_fp, schedule_fp, changed, http=None):
+        """このランで確認した日付を記録（changed=True は解析してDBに書いた日付、http はHTTP取得時の ETag 等）"""
+        now = time.time()
+        prev = self._saved.get(date_str) or {}
+        with self._lock:
+            self._pending[date_str] = {
+                'list': list_fp,
+                'schedule': schedule_fp,
+                'checked_at': now,
+                'changed_at': now if changed else prev.get('changed_at'),
+            }
+            if http:
+                self._pending[date_str]['http'] = http
+            (self.changed_dates if changed else self.unchanged_dates).add(date_str)
+
+    def retry(self, dates):
+        """次のランで必ず解析し直す日付（詳細を取り切れなかった予約がある等）。記録ごと消す"""
+        with self._lock:
+            for date_str in dates:
+                self._pending.pop(date_str, None)
+                self._saved.pop(date_str, None)
+                self.retry_dates.add(date_str)
+
+    def commit(self, keep_from=None):
+        """記録をファイルに保存（keep_from より前の日付は捨てる）"""
+        with self._lock:
+            merged = dict(self._saved)
+            merged.update(self._pending)
+            if keep_from:
+                merged = {d: v for d, v in merged.items() if d >= keep_from}
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f'{self.path}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(merged, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+            self._saved = merged
+            self._pending = {}
+
+    def report(self):
+        with self._lock:
+            return {
+                'changed_dates': sorted(self.changed_dates),
+                'unchanged_dates': sorted(self.unchanged_dates),
+                'not_due_dates': sorted(self.not_due_dates),
+                'retry_dates': sorted(self.retry_dates),
+            }
@@ -0,0 +1,134 @@
+"""空き枠計算（整数の分単位）
+
+スクレイパーのスケジュール解析と LIFF の空き枠API が共通で使う。
+- free_intervals(): 予約区間をマージし、営業時間内の隙間を粒度（既定10分）に丸めて返す
+- day_mask() / start_mask(): 空き区間を「粒度1マス＝1ビット」の整数ビットセットにし、
+  「D分のメニューを時刻Tに開始できるか」をシフトとANDでまとめて判定する
+"""
+import json
+import os
+
+SLOT_GRANULARITY = int(os.getenv('SLOT_GRANULARITY', '10'))
+SLOT_OPEN_TIME = os.getenv('SLOT_OPEN_TIME', '9:00')
+SLOT_CLOSE_TIME = os.getenv('SLOT_CLOSE_TIME', '19:00')
+# スタッフ別の営業時間 {"W000618247": ["10:00", "18:00"]}（未指定はスケジュールの先頭時刻〜SLOT_CLOSE_TIME）
+SLOT_STAFF_HOURS = os.getenv('SLOT_STAFF_HOURS', '{}')
+
+
+def to_minutes(text):
+    """'H:MM' → 0時からの分（解析できなければ None）"""
+    try:
+        hours, minutes = str(text).strip().split(':')[:2]
+        return int(hours) * 60 + int(minutes)
+    except (ValueError, AttributeError):
+        return None
+
+
+def format_minutes(minutes):
+    """分 → 'H:MM'（先頭ゼロなし、LIFFの時刻表示と同じ形式）"""
+    return f"{minutes // 60}:{minutes % 60:02d}"
+
+
+def _parse_staff_hours(spec):
+    try:
+        raw = json.loads(spec or '{}')
+    except ValueError:
+        print(f"[SLOTS] SLOT_STAFF_HOURS を解析できません: {spec}", flush=True)
+        return {}
+    hours = {}
+    for staff_id, pair in raw.items():
+        if isinstance(pair, (list, tuple)) and len(pair) == 2:
+            open_min, close_min = to_minutes(pair[0]), to_minutes(pair[1])
+            if open_min is not None and close_min is not None:
+                hours[str(staff_id)] = (open_min, close_min)
+    return hours
+
+
+STAFF_HOURS = _parse_staff_hours(SLOT_STAFF_HOURS)
+
+
+def staff_hours(staff_id=None, open_min=None):
+    """(開店分, 閉店分)。スタッフ別設定 > スケジュールの先頭時刻 > 既定値"""
+    if staff_id is not None and str(staff_id) in STAFF_HOURS:
+        return STAFF_HOURS[str(staff_id)]
+    if open_min is None:
+        open_min = to_minutes(SLOT_OPEN_TIME)
+    return open_min, to_minutes(SLOT_CLOSE_TIME)
+
+
+def merge_intervals(intervals):
+    """[(開始分, 終了分)] を開始順に並べ、重なり・接する区間をまとめる"""
+    merged = []
+    for start, end in sorted(i for i in intervals if i[1] > i[0]):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(s, e) for s, e in merged]
+
+
+def free_intervals(booked, open_min, close_min, granularity=SLOT_GRANULARITY):
+    """営業時間内の空き区間。開始は粒度に切り上げ、終了は切り下げ（閉店時刻はそのまま）"""
+    free = []
+    current = open_min
+    for start, end in merge_intervals(booked) + [(close_min, close_min)]:
+        if start > current:
+            gap_start = -(-current // granularity) * granularity
+            gap_end = close_min if start >= close_min else start // granularity * granularity
+            if gap_end > gap_start:
+                free.append((gap_start, gap_end))
+        current = max(current, end)
+        if current >= close_min:
+            break
+    return free
+
+
+def slot_dicts(intervals):
+    """[(開始分, 終了分)] → available_slots の [{'start': 'H:MM', 'end': 'H:MM'}]"""
+    return [{'start': format_minutes(s), 'end': format_minutes(e)} for s, e in intervals]
+
+
+def day_mask(slots, granularity=SLOT_GRANULARITY):
+    """available_slots の [{'start','end'}] を整数ビットセットに（ビットi＝i*粒度分から1マス空き）"""
+    mask = 0
+    for slot in slots or []:
+        start, end = to_minutes(slot.get('start')), to_minutes(slot.get('end'))
+        if start is None or end is None:
+            continue
+        first, last = -(-start // granularity), end // granularity
+        if last > first:
+            mask |= ((1 << (last - first)) - 1) << first
+    return mask
+
+
+def start_mask(mask, duration, granularity=SLOT_GRANULARITY):
+    """duration 分が収まる開始マスのビットセット（連続 k マスが空いている先頭ビット）"""
+    need = max(1, -(-int(duration) // granularity))
+    result, covered = mask, 1
+    # 倍々でシフト＆ANDし、log2(k) 回で「k マス連続」を求める
+    while covered < need:
+        step = min(covered, need - covered)
+        result &= result >> step
+        covered += step
+    return result
+
+
+def mask_times(mask, granularity=SLOT_GRANULARITY):
+    """ビットセットの立っているマスの開始時刻 ['H:MM', ...]"""
+    times = []
+    bit = 0
+    while mask:
+        if mask & 1:
+            times.append(format_minutes(bit * granularity))
+        mask >>= 1
+        bit += 1
+    return times
+
+
+def bookable_starts(masks, duration, granularity=SLOT_GRANULARITY):
+    """スタッフ別ビットセットのどれかで duration 分のメニューを開始できる時刻"""
+    combined = 0
+    for mask in masks:
+        combined |= start_mask(mask, duration, granularity)
+    return mask_times(combined, granularity)
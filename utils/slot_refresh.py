@@ -0,0 +1,66 @@
+"""古くなった日付の空き枠を裏で取り直す（タスクキューへの登録窓口）
+
+LIFFのリクエストからは enqueue() でタスク（kind='slot_refresh'）を登録するだけでブラウザは起動しない。
+実行はタスクワーカーが resource=SALONBOARD で行うので、キャンセル・スクレイピング等と同時には動かない。
+同じ日付は待機中・実行中に重複登録せず、完了後も SLOT_REFRESH_COOLDOWN 秒は再登録しない。
+"""
+import os
+import threading
+import time
+
+SLOT_REFRESH_KIND = 'slot_refresh'
+SLOT_REFRESH_COOLDOWN = int(os.getenv('SLOT_REFRESH_COOLDOWN', '300'))
+SLOT_REFRESH_TIMEOUT = int(os.getenv('SLOT_REFRESH_TIMEOUT', '180'))
+
+ACTIVE = ('queued', 'running')
+
+
+class SlotRefreshQueue:
+    """日付 → 登録したタスクIDを覚えておき、状態はタスクキューから引く"""
+
+    def __init__(self, task_queue, kind=SLOT_REFRESH_KIND, cooldown=SLOT_REFRESH_COOLDOWN):
+        self.task_queue = task_queue
+        self.kind = kind
+        self.cooldown = cooldown
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self.stats = {'enqueued': 0, 'skipped': 0}
+
+    def _task(self, date_str):
+        task_id = self._tasks.get(date_str)
+        return self.task_queue.get(task_id) if task_id else None
+
+    def enqueue(self, date_str):
+        """登録したら True（待機中・実行中・クールダウン中なら False）"""
+        with self._lock:
+            task = self._task(date_str)
+            if task and (task['status'] in ACTIVE
+                         or (task.get('finished_at') and time.time() - task['finished_at'] < self.cooldown)):
+                self.stats['skipped'] += 1
+                return False
+            # 他のgunicornワーカーが登録済みなら dedupe_key で同じタスクになる
+            task_id, created = self.task_queue.enqueue(self.kind, {'date': date_str},
+                                                       dedupe_key=f'{self.kind}:{date_str}')
+            self._tasks[date_str] = task_id
+            self.stats['enqueued' if created else 'skipped'] += 1
+        return created
+
+    def state(self, date_str):
+        with self._lock:
+            task = self._task(date_str)
+        return task['status'] if task and task['status'] in ACTIVE else None
+
+    def status(self):
+        with self._lock:
+            tasks = {date_str: self._task(date_str) for date_str in self._tasks}
+        by_status = {}
+        for date_str, task in sorted(tasks.items()):
+            if task:
+                by_status.setdefault(task['status'], []).append(date_str)
+        return {
+            'queued': by_status.get('queued', []),
+            'running': by_status.get('running', []),
+            'succeeded': len(by_status.get('succeeded', [])),
+            'failed': len(by_status.get('failed', [])),
+            **self.stats,
+        }
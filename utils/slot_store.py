@@ -0,0 +1,155 @@
+"""available_slots の日付別ブロブ（事前シリアライズ済みJSON）
+
+56日分を date=gte/lte の1クエリで取得し、1パスで日付ごとにまとめて
+日付単位のJSON文字列とETag、スタッフ別の空きビットセットを作っておく。
+LIFFカレンダーのレスポンスは連結するだけ（施術時間を指定されたら開始可能時刻だけ返す）。
+スクレイパーが available_slots を書き換えたら refresh() で作り直す。
+"""
+import json
+import os
+import re
+from datetime import datetime, timedelta, timezone
+
+from utils.slot_engine import bookable_starts, day_mask
+from utils.supabase_client import supabase
+from utils.table_cache import table_cache, make_etag
+
+RANGE_DAYS = 56
+SLOT_CACHE_TTL = int(os.getenv('SLOT_CACHE_TTL', '300'))
+SLOT_STALE_SECONDS = int(os.getenv('SLOT_STALE_SECONDS', '3600'))
+SLOT_COLUMNS = 'date,staff_id,staff_name,is_day_off,slots,updated_at'
+
+
+def parse_timestamp(value):
+    """Supabaseのtimestamptz文字列をdatetimeに（Python3.10のfromisoformatは小数部が3/6桁限定のため補正）"""
+    if not value:
+        return None
+    text = str(value).replace('Z', '+00:00')
+    text = re.sub(r'\.(\d+)', lambda m: '.' + m.group(1)[:6].ljust(6, '0'), text)
+    try:
+        dt = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def is_stale(blob, max_age=SLOT_STALE_SECONDS):
+    """行が無い、または最終更新から max_age 秒を超えていれば True"""
+    updated = parse_timestamp(blob.get('updated_at')) if blob else None
+    if updated is None:
+        return True
+    return (datetime.now(timezone.utc) - updated).total_seconds() > max_age
+
+
+def date_range(days=RANGE_DAYS, start=None):
+    """start（既定は今日）から days 日分の YYYYMMDD リスト"""
+    start = start or datetime.now()
+    return [(start + timedelta(days=i)).strftime('%Y%m%d') for i in range(days)]
+
+
+def in_scrape_window(date_str, days=RANGE_DAYS, today=None):
+    """スクレイピングで取得する範囲（今日〜今日+days日）の日付なら True"""
+    today = today or datetime.now()
+    return today.strftime('%Y%m%d') <= date_str <= (today + timedelta(days=days)).strftime('%Y%m%d')
+
+
+def build_day_blobs(rows, dates):
+    """行リストを1パスで日付別にまとめ、日付ごとのJSON文字列とETagを返す"""
+    by_date = {d: [] for d in dates}
+    masks = {d: [] for d in dates}
+    updated = {}
+    for r in rows:
+        d = str(r.get('date'))
+        day = by_date.get(d)
+        if day is None:
+            continue
+        day.append({
+            'staff_id': r.get('staff_id'),
+            'staff_name': r.get('staff_name'),
+            'is_day_off': r.get('is_day_off'),
+            'available_slots': r.get('slots') or []
+        })
+        if not r.get('is_day_off'):
+            masks[d].append(day_mask(r.get('slots')))
+        if r.get('updated_at'):
+            updated[d] = max(updated.get(d, ''), r['updated_at'])
+
+    blobs = {}
+    for d in dates:
+        payload = {'staff_schedules': by_date[d], 'updated_at': updated.get(d)}
+        blobs[d] = {
+            'json': json.dumps(payload, ensure_ascii=False, separators=(',', ':')),
+            'etag': make_etag(payload),
+            'updated_at': updated.get(d),
+            'masks': masks[d],
+        }
+    return blobs
+
+
+def _load(dates):
+    res = supabase.get(
+        f'available_slots?date=gte.{dates[0]}&date=lte.{dates[-1]}&select={SLOT_COLUMNS}&order=date.asc,staff_id.asc',
+        timeout=(3.05, 30)
+    )
+    if res.status_code != 200:
+        print(f"[SLOTS] 空き枠取得失敗: {res.status_code} - {res.text[:100]}", flush=True)
+        return None
+    return build_day_blobs(res.json(), dates)
+
+
+class SlotStore:
+    """日付別ブロブを table_cache 上に保持（キーは 'available_slots:<開始日>:<日数>'）"""
+
+    def __init__(self, days=RANGE_DAYS, ttl=SLOT_CACHE_TTL):
+        self.days = days
+        self.ttl = ttl
+        self._last_key = None
+
+    def blobs(self, days=None):
+        """{YYYYMMDD: {'json','etag','updated_at'}}（取得失敗時は None）"""
+        dates = date_range(days or self.days)
+        key = f'available_slots:{dates[0]}:{len(dates)}'
+        if self._last_key and self._last_key != key and len(dates) == self.days:
+            # 日付が変わったら前日分のブロブを捨てる
+            table_cache.invalidate(self._last_key)
+        if len(dates) == self.days:
+            self._last_key = key
+        entry = table_cache.get(key, lambda: _load(dates), self.ttl)
+        return entry.value if entry else None
+
+    def range_body(self, days=None):
+        """(JSON文字列, バージョン) を返す。バージョンは日付別ETagの合成"""
+        blobs = self.blobs(days)
+        if blobs is None:
+            return None, None
+        version = make_etag([(d, b['etag']) for d, b in blobs.items()])
+        parts = ','.join(f'"{d}":{b["json"]}' for d, b in blobs.items())
+        return f'{{"version":"{version}","dates":{{{parts}}}}}', version
+
+    def range_starts(self, duration, days=None):
+        """(JSON文字列, バージョン)：日付ごとに duration 分のメニューを開始できる時刻のリスト"""
+        blobs = self.blobs(days)
+        if blobs is None:
+            return None, None
+        starts = {d: bookable_starts(b['masks'], duration) for d, b in blobs.items()}
+        version = make_etag([[(d, b['etag']) for d, b in blobs.items()], duration])
+        body = json.dumps({'version': version, 'duration': duration, 'starts': starts},
+                          ensure_ascii=False, separators=(',', ':'))
+        return body, version
+
+    def day(self, date_str):
+        """1日分のブロブ（56日の範囲外は単日クエリ、取得失敗時は None）"""
+        blobs = self.blobs()
+        if blobs and date_str in blobs:
+            return blobs[date_str]
+        entry = table_cache.get(f'available_slots:{date_str}:1', lambda: _load([date_str]), self.ttl)
+        return entry.value[date_str] if entry else None
+
+    def refresh(self):
+        """スクレイパーの書き込み後に呼ぶ：破棄して即再構築"""
+        table_cache.invalidate('available_slots')
+        self._last_key = None
+        return self.blobs() is not None
+
+
+slot_store = SlotStore()
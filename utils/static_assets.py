@@ -0,0 +1,69 @@
+"""static/ 配下のファイルを内容ハッシュ付きのURLで配信する
+
+テンプレートでは {{ asset_url('liff/booking.js') }} → /assets/liff/booking.<hash>.js。
+URLが内容ごとに変わるので、ブラウザ・LINE内ブラウザには1年キャッシュ（immutable）させてよい。
+古いハッシュで来たリクエストには現在の内容をキャッシュなしで返す（デプロイ直後の開きっぱなしのページ用）。
+"""
+import hashlib
+import os
+import re
+import threading
+
+from flask import abort, send_from_directory
+from werkzeug.security import safe_join
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC_DIR = os.path.join(APP_DIR, 'static')
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+_FINGERPRINTED = re.compile(r'^(?P<stem>.+)\.(?P<digest>[0-9a-f]{10})(?P<ext>\.[A-Za-z0-9]+)$')
+
+
+class StaticAssets:
+    """ファイルごとの内容ハッシュ（更新時刻が変わった時だけ計算し直す）"""
+
+    def __init__(self, static_dir=STATIC_DIR):
+        self.static_dir = static_dir
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def digest(self, path):
+        full = safe_join(self.static_dir, path)
+        if full is None:
+            raise ValueError(f'static外のパス: {path}')
+        mtime = os.stat(full).st_mtime_ns
+        with self._lock:
+            cached = self._digests.get(path)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        with open(full, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()[:10]
+        with self._lock:
+            self._digests[path] = (mtime, digest)
+        return digest
+
+    def url(self, path):
+        stem, ext = os.path.splitext(path)
+        return f'/assets/{stem}.{self.digest(path)}{ext}'
+
+    def serve(self, filename):
+        """/assets/<filename> の応答（ハッシュが現在の内容と一致すれば長期キャッシュ）"""
+        match = _FINGERPRINTED.match(filename)
+        if not match:
+            abort(404)
+        path = match.group('stem') + match.group('ext')
+        try:
+            current = self.digest(path)
+        except (OSError, ValueError):
+            abort(404)
+        if current != match.group('digest'):
+            response = send_from_directory(self.static_dir, path, max_age=0)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        response = send_from_directory(self.static_dir, path, max_age=ASSET_MAX_AGE)
+        response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+        return response
+
+    def init_app(self, app):
+        app.add_url_rule('/assets/<path:filename>', 'assets', self.serve)
+        app.jinja_env.globals['asset_url'] = self.url
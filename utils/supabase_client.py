@@ -0,0 +1,130 @@
+"""Supabase REST（PostgREST）共通クライアント
+
+requests.Session のコネクションプールを全ルート・全ジョブで共有し、
+リクエストごとのTCP/TLSハンドシェイクを省く。タイムアウトとリトライ付き。
+"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (接続, 読み込み) タイムアウト秒
+DEFAULT_TIMEOUT = (
+    float(os.getenv('SUPABASE_CONNECT_TIMEOUT', '3.05')),
+    float(os.getenv('SUPABASE_READ_TIMEOUT', '15')),
+)
+POOL_MAXSIZE = int(os.getenv('SUPABASE_POOL_MAXSIZE', '16'))
+MAX_RETRIES = int(os.getenv('SUPABASE_MAX_RETRIES', '3'))
+
+
+class SupabaseClient:
+    """PostgREST用の軽量クライアント（スレッド間で共有可能）"""
+
+    def __init__(self, url=None, key=None, timeout=DEFAULT_TIMEOUT):
+        self._url = url
+        self._key = key
+        self.timeout = timeout
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        # load_dotenv() より先にimportされても動くよう、毎回環境変数を参照
+        return self._url or os.getenv('SUPABASE_URL')
+
+    @property
+    def key(self):
+        return self._key or os.getenv('SUPABASE_KEY')
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def _build_session(self):
+        # 冪等なメソッドのみリトライ（POSTのinsertは二重登録になるため対象外）
+        retry = Retry(
+            total=MAX_RETRIES,
+            connect=MAX_RETRIES,
+            read=MAX_RETRIES,
+            backoff_factor=0.3,
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD', 'PATCH', 'DELETE']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+        s = requests.Session()
+        s.mount('https://', adapter)
+        s.mount('http://', adapter)
+        return s
+
+    def headers(self, prefer=None, extra=None):
+        h = {
+            'apikey': self.key,
+            'Authorization': f'Bearer {self.key}',
+            'Content-Type': 'application/json',
+        }
+        if prefer:
+            h['Prefer'] = prefer
+        if extra:
+            h.update(extra)
+        return h
+
+    # ===== 低レベルAPI（requests.Response をそのまま返す） =====
+    def request(self, method, path, prefer=None, headers=None, timeout=None, **kwargs):
+        """path は 'customers?select=*' のようにテーブル名＋クエリ文字列"""
+        url = f'{self.url}/rest/v1/{path.lstrip("/")}'
+        return self.session.request(
+            method,
+            url,
+            headers=self.headers(prefer, headers),
+            timeout=timeout or self.timeout,
+            **kwargs
+        )
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def patch(self, path, **kwargs):
+        return self.request('PATCH', path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request('DELETE', path, **kwargs)
+
+    # ===== 型付きヘルパー =====
+    def select(self, table: str, query: str = 'select=*', **kwargs) -> list:
+        """SELECTして行リストを返す（失敗時は空リスト）"""
+        try:
+            res = self.get(f'{table}?{query}' if query else table, **kwargs)
+            if res.status_code == 200:
+                return res.json()
+            print(f"[SUPABASE] select {table} 失敗: {res.status_code} - {res.text[:100]}", flush=True)
+        except requests.RequestException as e:
+            print(f"[SUPABASE] select {table} エラー: {e}", flush=True)
+        return []
+
+    def insert(self, table: str, rows, prefer: str = None, **kwargs) -> requests.Response:
+        return self.post(table, json=rows, prefer=prefer, **kwargs)
+
+    def upsert(self, table: str, rows, on_conflict: str = None, prefer: str = 'resolution=merge-duplicates', **kwargs) -> requests.Response:
+        path = f'{table}?on_conflict={on_conflict}' if on_conflict else table
+        return self.post(path, json=rows, prefer=prefer, **kwargs)
+
+    def update(self, table: str, query: str, data: dict, prefer: str = None, **kwargs) -> requests.Response:
+        return self.patch(f'{table}?{query}', json=data, prefer=prefer, **kwargs)
+
+    def remove(self, table: str, query: str, **kwargs) -> requests.Response:
+        return self.delete(f'{table}?{query}', **kwargs)
+
+
+# プロセス内で共有するシングルトン
+supabase = SupabaseClient()
@@ -0,0 +1,109 @@
+"""読み取り中心テーブル用のプロセス内TTLキャッシュ
+
+salon_menus / salonboard_menus / salon_staff / message_templates など、
+1日1回程度しか変わらないテーブルを対象にする。書き込み側（cronジョブ・管理画面）は
+invalidate() で明示的に破棄する。ETagは内容のハッシュから生成する。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+from utils.supabase_client import supabase
+
+DEFAULT_TTL = int(os.getenv('TABLE_CACHE_TTL', '600'))
+
+CacheEntry = namedtuple('CacheEntry', ['value', 'etag', 'loaded_at', 'expires_at'])
+
+
+def make_etag(value):
+    """JSON化した内容からETagを作成"""
+    raw = json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:20]
+
+
+class TableCache:
+    """キー単位のTTL＋明示破棄キャッシュ（スレッドセーフ）"""
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _fresh(self, key):
+        entry = self._entries.get(key)
+        if entry and entry.expires_at > time.monotonic():
+            return entry
+        return None
+
+    def get(self, key, loader, ttl=None):
+        """キャッシュを返す。期限切れなら loader() で再取得（None は失敗扱いでキャッシュしない）"""
+        with self._lock:
+            entry = self._fresh(key)
+            if entry:
+                self.hits += 1
+                return entry
+        # 同じキーの同時ミスでSupabaseに殺到しないようキー単位で直列化
+        with self._key_lock(key):
+            with self._lock:
+                entry = self._fresh(key)
+                if entry:
+                    self.hits += 1
+                    return entry
+                self.misses += 1
+            value = loader()
+            if value is None:
+                return None
+            now = time.monotonic()
+            entry = CacheEntry(value, make_etag(value), time.time(), now + (ttl or self.ttl))
+            with self._lock:
+                self._entries[key] = entry
+            return entry
+
+    def invalidate(self, table=None):
+        """table 名（または 'table:xxx' 形式のキー）に一致するエントリを破棄。None で全破棄"""
+        with self._lock:
+            if table is None:
+                keys = list(self._entries)
+            else:
+                keys = [k for k in self._entries if k == table or k.startswith(f'{table}:')]
+            for k in keys:
+                del self._entries[k]
+            self.invalidations += 1
+        if keys:
+            print(f"[CACHE] 破棄: {', '.join(keys)}", flush=True)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else None,
+                'invalidations': self.invalidations,
+                'keys': {k: {'etag': e.etag, 'loaded_at': e.loaded_at} for k, e in self._entries.items()},
+            }
+
+
+table_cache = TableCache()
+
+
+def cached_select(key, path, ttl=None):
+    """Supabaseの結果をキャッシュ経由で取得（失敗時は None）"""
+    def loader():
+        res = supabase.get(path)
+        if res.status_code == 200:
+            return res.json()
+        print(f"[CACHE] {key} 取得失敗: {res.status_code}", flush=True)
+        return None
+    return table_cache.get(key, loader, ttl)
@@ -0,0 +1,397 @@
+"""SalonBoardを操作する裏処理の永続キュー（SQLite）
+
+キャンセル・日時変更・スクレイピング・電話番号補完を種類（kind）ごとに定義し、
+Webからは enqueue() で登録するだけ。実行はワーカー（task_worker.py か、TASK_WORKER=inline なら
+gunicorn のワーカー内スレッド）が claim() して行う。
+- 優先度：数字が小さいほど先。お客様のキャンセル・変更は定期スクレイピングより先に実行し、
+  preemptible な種類（スクレイピング）は実行中でも途中で譲ってキューに戻る
+- 排他：同じ resource（'salonboard' セッション）を使うタスクは同時に1件だけ
+- 再起動・ワーカー停止：実行中の行は heartbeat が TASK_LEASE 秒途絶えたら再実行（回数上限まで）か failed
+- 重複登録：dedupe_key が同じ待機中・実行中のタスクがあれば新しく登録しない
+
+状態は queued → running → succeeded / failed / cancelled。
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TASK_DB = os.getenv('TASK_DB', os.path.join(APP_DIR, 'data', 'tasks.db'))
+# heartbeat がこの秒数途絶えた実行中タスクは放棄されたとみなす
+TASK_LEASE = int(os.getenv('TASK_LEASE', '120'))
+TASK_POLL = float(os.getenv('TASK_POLL', '2'))
+# 完了したタスクを残す日数
+TASK_KEEP_DAYS = int(os.getenv('TASK_KEEP_DAYS', '14'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    resource TEXT,
+    dedupe_key TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 1,
+    run_after REAL NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL,
+    worker TEXT,
+    error TEXT,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_ready ON tasks (status, priority, run_after);
+CREATE INDEX IF NOT EXISTS tasks_dedupe ON tasks (dedupe_key, status);
+"""
+
+class Preempted(Exception):
+    """優先度の高いタスクに譲るためにハンドラーが中断した（キューに戻して後で再実行）"""
+
+
+class TaskQueue:
+    """タスクの種類定義と永続キュー（接続はスレッドごと、書き込みは BEGIN IMMEDIATE で直列化）"""
+
+    def __init__(self, path=TASK_DB, lease=TASK_LEASE):
+        self.path = path
+        self.lease = lease
+        self.kinds = OrderedDict()
+        self._local = threading.local()
+        self._ready = False
+
+    def _conn(self):
+        """スレッドごとの接続（DBファイル・テーブルは最初の接続時に作る。import 時には作らない）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if not self._ready:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            if not self._ready:
+                conn.executescript(SCHEMA)
+                self._ready = True
+            self._local.conn = conn
+        return conn
+
+    def _write(self, fn):
+        """fn(conn) を1トランザクションで実行（他プロセスの書き込みとも直列）"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = fn(conn)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return result
+
+    # ===== 種類の定義 =====
+    def task(self, kind, priority, resource=None, max_attempts=1, retry_delay=0, timeout=1800,
+             preemptible=False, invalidates=()):
+        """ハンドラー handler(payload, ctx) を kind として登録するデコレーター
+
+        timeout 秒を超えたらリトライせず failed にする。ハンドラーのスレッドは止められないので、
+        ワーカーは処理が終わるまで（resource を握ったまま）次を取り出さない。invalidates は成功後に破棄するキャッシュのテーブル名。
+        """
+        def register(handler):
+            self.kinds[kind] = {
+                'kind': kind, 'handler': handler, 'priority': priority, 'resource': resource,
+                'max_attempts': max_attempts, 'retry_delay': retry_delay, 'timeout': timeout,
+                'preemptible': preemptible, 'invalidates': tuple(invalidates),
+            }
+            return handler
+        return register
+
+    # ===== 登録（Web側） =====
+    def enqueue(self, kind, payload=None, dedupe_key=None, priority=None, delay=0):
+        """(タスクID, 新規登録したか) を返す。dedupe_key が同じ待機中・実行中タスクがあればそのID"""
+        spec = self.kinds[kind]
+        now = time.time()
+
+        def insert(conn):
+            if dedupe_key:
+                row = conn.execute(
+                    "SELECT id FROM tasks WHERE dedupe_key = ? AND status IN ('queued', 'running') "
+                    'ORDER BY id LIMIT 1', (dedupe_key,)).fetchone()
+                if row:
+                    return row['id'], False
+            cur = conn.execute(
+                'INSERT INTO tasks (kind, payload, priority, resource, dedupe_key, status, max_attempts, '
+                "run_after, created_at) VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (kind, json.dumps(payload or {}, ensure_ascii=False),
+                 spec['priority'] if priority is None else priority, spec['resource'], dedupe_key,
+                 spec['max_attempts'], now + delay, now))
+            return cur.lastrowid, True
+
+        task_id, created = self._write(insert)
+        print(f"[TASK] {'登録' if created else '登録済み'}: #{task_id} {kind} {dedupe_key or ''}", flush=True)
+        return task_id, created
+
+    def cancel(self, task_id):
+        """待機中のタスクを取り消す（実行中は取り消せない）"""
+        def update(conn):
+            return conn.execute(
+                "UPDATE tasks SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), task_id)).rowcount
+        return self._write(update) > 0
+
+    # ===== 実行（ワーカー側） =====
+    def _reap(self, conn, now):
+        """heartbeat が途絶えた実行中タスクを再実行待ちか failed に戻す"""
+        expired = now - self.lease
+        conn.execute(
+            "UPDATE tasks SET status = 'queued', worker = NULL, run_after = ?, error = 'ワーカー停止（再実行）' "
+            "WHERE status = 'running' AND heartbeat_at < ? AND attempts < max_attempts", (now, expired))
+        conn.execute(
+            "UPDATE tasks SET status = 'failed', finished_at = ?, error = 'ワーカー停止（再実行上限）' "
+            "WHERE status = 'running' AND heartbeat_at < ?", (now, expired))
+
+    def claim(self, worker, kinds=None):
+        """実行できる最優先のタスクを running にして返す（無ければ None）
+
+        同じ resource のタスクが実行中か、より優先度の高いタスクが（再実行待ちも含め）待っていれば飛ばして次を見る。
+        """
+        kinds = list(kinds or self.kinds)
+        now = time.time()
+
+        def pick(conn):
+            self._reap(conn, now)
+            busy = {r['resource'] for r in conn.execute(
+                "SELECT DISTINCT resource FROM tasks WHERE status = 'running' AND resource IS NOT NULL")}
+            waiting = {r['resource']: r['priority'] for r in conn.execute(
+                "SELECT resource, MIN(priority) AS priority FROM tasks WHERE status = 'queued' "
+                'AND resource IS NOT NULL GROUP BY resource')}
+            rows = conn.execute(
+                "SELECT * FROM tasks WHERE status = 'queued' AND run_after <= ? "
+                f"AND kind IN ({','.join('?' * len(kinds))}) ORDER BY priority, id LIMIT 50",
+                [now] + kinds).fetchall()
+            for row in rows:
+                if row['resource'] and (row['resource'] in busy or waiting[row['resource']] < row['priority']):
+                    continue
+                conn.execute(
+                    "UPDATE tasks SET status = 'running', attempts = attempts + 1, started_at = ?, "
+                    'heartbeat_at = ?, worker = ?, error = NULL WHERE id = ?', (now, now, worker, row['id']))
+                task = dict(row)
+                task['attempts'] += 1
+                task['payload'] = json.loads(task['payload'])
+                return task
+            return None
+
+        return self._write(pick) if kinds else None
+
+    def heartbeat(self, task_id, worker):
+        def update(conn):
+            conn.execute("UPDATE tasks SET heartbeat_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                         (time.time(), task_id, worker))
+        self._write(update)
+
+    def complete(self, task_id, result=None):
+        if result is not None:
+            result = json.dumps(result, ensure_ascii=False, default=str)[:1000]
+
+        def update(conn):
+            conn.execute("UPDATE tasks SET status = 'succeeded', finished_at = ?, result = ? WHERE id = ?",
+                         (time.time(), result, task_id))
+        self._write(update)
+
+    def fail(self, task_id, error, retry_delay=0, retry=True):
+        """回数上限までは retry_delay 秒後に再実行、上限（か retry=False）なら failed。再実行するなら True"""
+        now = time.time()
+
+        def update(conn):
+            row = conn.execute('SELECT attempts, max_attempts FROM tasks WHERE id = ?', (task_id,)).fetchone()
+            if retry and row and row['attempts'] < row['max_attempts']:
+                conn.execute("UPDATE tasks SET status = 'queued', worker = NULL, run_after = ?, error = ? WHERE id = ?",
+                             (now + retry_delay, error, task_id))
+                return True
+            conn.execute("UPDATE tasks SET status = 'failed', finished_at = ?, error = ? WHERE id = ?",
+                         (now, error, task_id))
+            return False
+        return self._write(update)
+
+    def requeue(self, task_id, reason):
+        """譲ったタスクをすぐ実行待ちに戻す（試行回数には数えない）"""
+        def update(conn):
+            conn.execute(
+                "UPDATE tasks SET status = 'queued', worker = NULL, attempts = attempts - 1, run_after = ?, "
+                'error = ? WHERE id = ?', (time.time(), reason, task_id))
+        self._write(update)
+
+    def should_yield(self, task):
+        """同じ resource で優先度の高いタスクが待っていれば True"""
+        if not task.get('resource'):
+            return False
+        row = self._conn().execute(
+            "SELECT 1 FROM tasks WHERE status = 'queued' AND resource = ? AND priority < ? AND run_after <= ? LIMIT 1",
+            (task['resource'], task['priority'], time.time())).fetchone()
+        return row is not None
+
+    def prune(self, keep_days=TASK_KEEP_DAYS):
+        def delete(conn):
+            return conn.execute(
+                "DELETE FROM tasks WHERE status NOT IN ('queued', 'running') AND finished_at < ?",
+                (time.time() - keep_days * 86400,)).rowcount
+        return self._write(delete)
+
+    # ===== 状態参照 =====
+    def busy(self, resource):
+        """resource を使うタスクが実行中なら True（heartbeat が途絶えたものは除く）"""
+        row = self._conn().execute(
+            "SELECT 1 FROM tasks WHERE status = 'running' AND resource = ? AND heartbeat_at >= ? LIMIT 1",
+            (resource, time.time() - self.lease)).fetchone()
+        return row is not None
+
+    @staticmethod
+    def _public(row):
+        """API用（payload には LINE ID 等が入るので返さない）"""
+        task = dict(row)
+        task.pop('payload', None)
+        if task.get('result'):
+            try:
+                task['result'] = json.loads(task['result'])
+            except ValueError:
+                pass
+        started, finished = task.get('started_at'), task.get('finished_at')
+        task['elapsed'] = round((finished or time.time()) - started, 1) if started and task['status'] != 'queued' else None
+        return task
+
+    def get(self, task_id):
+        row = self._conn().execute('SELECT * FROM tasks WHERE id = ?', (task_id,)).fetchone()
+        return self._public(row) if row else None
+
+    def recent(self, kind=None, status=None, limit=50):
+        sql, conditions, params = 'SELECT * FROM tasks', [], []
+        if kind:
+            conditions.append('kind = ?')
+            params.append(kind)
+        if status:
+            conditions.append('status = ?')
+            params.append(status)
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY id DESC LIMIT ?'
+        params.append(limit)
+        return [self._public(r) for r in self._conn().execute(sql, params)]
+
+    def counts(self):
+        """{kind: {status: 件数}}（待機中・実行中のみ）"""
+        counts = {}
+        for row in self._conn().execute(
+                "SELECT kind, status, COUNT(*) AS n FROM tasks WHERE status IN ('queued', 'running') GROUP BY kind, status"):
+            counts.setdefault(row['kind'], {})[row['status']] = row['n']
+        return counts
+
+
+class TaskContext:
+    """ハンドラーに渡す実行中タスクの情報（スクレイピング等の長い処理は should_yield() を見て譲る）"""
+
+    def __init__(self, queue, task):
+        self.queue = queue
+        self.task = task
+
+    def should_yield(self):
+        spec = self.queue.kinds[self.task['kind']]
+        return spec['preemptible'] and self.queue.should_yield(self.task)
+
+
+class TaskWorker:
+    """キューからタスクを取り出して実行するループ（1スレッド1タスク）"""
+
+    def __init__(self, queue, name=None, kinds=None, poll=TASK_POLL, on_invalidate=None):
+        self.queue = queue
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self.kinds = kinds
+        self.poll = poll
+        self.on_invalidate = on_invalidate   # 成功したタスクの invalidates を渡して呼ぶ（Webプロセスへの通知等）
+        self._stop = threading.Event()
+        self._last_prune = 0
+
+    def stop(self):
+        self._stop.set()
+
+    def run_forever(self):
+        print(f"[TASK] ワーカー開始: {self.name}（{', '.join(self.kinds or self.queue.kinds)}）", flush=True)
+        while not self._stop.is_set():
+            try:
+                if not self.run_once():
+                    self._stop.wait(self.poll)
+            except Exception as e:
+                print(f"[TASK] ワーカーエラー: {e}", flush=True)
+                self._stop.wait(self.poll)
+        print(f"[TASK] ワーカー停止: {self.name}", flush=True)
+
+    def start(self):
+        thread = threading.Thread(target=self.run_forever, name='task-worker', daemon=True)
+        thread.start()
+        return thread
+
+    def run_once(self):
+        """1件実行したら True（実行できるタスクが無ければ False）"""
+        if time.time() - self._last_prune > 3600:
+            self._last_prune = time.time()
+            self.queue.prune()
+        task = self.queue.claim(self.name, self.kinds)
+        if task is None:
+            return False
+        spec = self.queue.kinds[task['kind']]
+        label = f"#{task['id']} {task['kind']}（{task['attempts']}/{task['max_attempts']}回目）"
+        print(f"[TASK] 開始: {label}", flush=True)
+        outcome = {}
+
+        def target():
+            try:
+                outcome['result'] = spec['handler'](task['payload'], TaskContext(self.queue, task))
+            except Exception as e:
+                outcome['error'] = e
+
+        started = time.monotonic()
+        runner = threading.Thread(target=target, name=f"task-{task['kind']}", daemon=True)
+        runner.start()
+        # 実行中は heartbeat を更新し続ける（止まったらプロセスごと落ちたとみなされる）
+        while runner.is_alive() and time.monotonic() - started < spec['timeout']:
+            runner.join(min(self.queue.lease / 4, 15, spec['timeout'] - (time.monotonic() - started)))
+            if runner.is_alive():
+                self.queue.heartbeat(task['id'], self.name)
+        timed_out = runner.is_alive()
+        if timed_out:
+            # スレッドは止められないので、処理が終わるまで running のまま（resource を握ったまま）待つ。
+            # ここで次を取り出すと、同じ SalonBoard のセッションを2つの処理が同時に触る
+            print(f"[TASK] タイムアウト: {label}（{spec['timeout']}秒、処理の終了を待つ）", flush=True)
+            while runner.is_alive() and not self._stop.is_set():
+                runner.join(min(self.queue.lease / 4, 15))
+                if runner.is_alive():
+                    self.queue.heartbeat(task['id'], self.name)
+        elapsed = time.monotonic() - started
+
+        error = outcome.get('error')
+        if runner.is_alive():
+            # ワーカー停止中：heartbeat が途切れ、リース切れ後にプロセス終了とみなされる
+            print(f"[TASK] 停止: {label} は実行中のまま", flush=True)
+        elif timed_out:
+            self.queue.fail(task['id'], f"{spec['timeout']}秒を超過（{elapsed:.0f}秒で終了）", retry=False)
+            print(f"[TASK] タイムアウト: {label}（{elapsed:.1f}秒で終了）", flush=True)
+        elif isinstance(error, Preempted):
+            self.queue.requeue(task['id'], f'譲った: {error}')
+            print(f"[TASK] 優先タスクに譲った: {label}（{elapsed:.1f}秒）", flush=True)
+        elif error is not None or outcome.get('result') is False:
+            message = f'{type(error).__name__}: {error}' if error else '処理失敗'
+            retry = self.queue.fail(task['id'], message, spec['retry_delay'])
+            suffix = f"、{spec['retry_delay']}秒後に再実行" if retry else ''
+            print(f"[TASK] 失敗: {label}（{elapsed:.1f}秒）{message}{suffix}", flush=True)
+        else:
+            self.queue.complete(task['id'], outcome.get('result'))
+            print(f"[TASK] 完了: {label}（{elapsed:.1f}秒）", flush=True)
+            if spec['invalidates'] and self.on_invalidate:
+                try:
+                    self.on_invalidate(spec['invalidates'])
+                except Exception as e:
+                    print(f"[TASK] キャッシュ破棄通知エラー: {e}", flush=True)
+        return True